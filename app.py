@@ -33,14 +33,35 @@ except ImportError:
 
 # Import custom modules
 from auth import login_user, logout_user, register_user
-from models import init_database
+from frozen import thaw
+from models import (
+    get_all_users,
+    get_db,
+    get_temple_stats,
+    init_database,
+    is_read_only,
+)
+from prefetch import prefetch
+from revalidate import metrics as revalidate_metrics
+from singleflight import stats as single_flight_stats
+from temple_grid import dispatch_grid_clicks
+from utils import (
+    get_query_param,
+    navigate,
+    rerun,
+    set_query_params,
+    timed_render,
+    track_script_run,
+)
 from temple_pages import (
+    EMPTY_STATS,
     show_add_temple,
     show_admin_dashboard,
     show_edit_temple,
     show_home_page,
     show_temple_detail,
     show_temple_list,
+    show_temple_map,
 )
 
 # Load environment variables
@@ -54,9 +75,18 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Count executions per user action before doing any other work
+track_script_run()
+
 # Initialize database connection
 db = init_database()
-if db is None:
+if db is None and is_read_only():
+    # The circuit breaker is open: pages render from cached data
+    st.warning(
+        "⚠️ The database is not responding. Showing saved data in read-only mode; "
+        "changes can't be saved until it is back."
+    )
+elif db is None:
     st.warning("⚠️ Unable to connect to database.")
     mongodb_uri = os.getenv('MONGODB_URI', '')
     if 'mongodb+srv' in mongodb_uri:
@@ -144,6 +174,16 @@ if 'page' not in st.session_state:
     st.session_state.page = "home"
 if 'selected_temple' not in st.session_state:
     st.session_state.selected_temple = None
+if 'selected_temple_slug' not in st.session_state:
+    st.session_state.selected_temple_slug = None
+
+def route_from_query_params():
+    """Open the temple named in a shared ``?temple=<slug>`` link"""
+    slug = get_query_param('temple')
+    if slug and slug != st.session_state.selected_temple_slug:
+        st.session_state.page = "temple_detail"
+        st.session_state.selected_temple = None
+        st.session_state.selected_temple_slug = slug
 
 def show_header():
     """Display the application header with navigation"""
@@ -156,9 +196,7 @@ def show_header():
     with col3:
         if st.session_state.authenticated:
             st.markdown(f"<p style='color: black; text-align: right;'>Welcome, {st.session_state.user['name']}!</p>", unsafe_allow_html=True)
-            if st.button("Logout", key="logout_header"):
-                logout_user()
-                st.rerun()
+            st.button("Logout", key="logout_header", on_click=logout_user)
 
 def show_navigation():
     """Display navigation menu"""
@@ -166,7 +204,7 @@ def show_navigation():
         st.markdown("### Navigation")
         
         # Public menu items
-        public_menu = ["🏠 Home", "🛕 All Temples", "ℹ️ About", "❓ Help"]
+        public_menu = ["🏠 Home", "🛕 All Temples", "🗺️ Map", "ℹ️ About", "❓ Help"]
         
         # Admin menu items
         admin_menu = []
@@ -187,6 +225,7 @@ def show_navigation():
         page_mapping = {
             "🏠 Home": "home",
             "🛕 All Temples": "temples",
+            "🗺️ Map": "map",
             "ℹ️ About": "about",
             "❓ Help": "help",
             "📊 Admin Dashboard": "admin",
@@ -239,9 +278,13 @@ def show_navigation():
         else:
             # Fallback: Use regular Streamlit buttons
             for menu_item in all_menu_items:
-                if st.button(menu_item, key=f"nav_{menu_item}", use_container_width=True):
-                    st.session_state.page = page_mapping.get(menu_item, "home")
-                    st.rerun()
+                st.button(
+                    menu_item,
+                    key=f"nav_{menu_item}",
+                    use_container_width=True,
+                    on_click=navigate,
+                    args=(page_mapping.get(menu_item, "home"),)
+                )
             
             # Show current page indicator
             current_page = None
@@ -251,6 +294,39 @@ def show_navigation():
                     break
             if current_page:
                 st.info(f"Current page: {current_page}")
+        
+        if st.session_state.get('debug_mode', False):
+            st.caption(
+                f"🔁 Script runs for last action: {st.session_state.runs_this_action} "
+                f"(session total: {st.session_state.total_script_runs})"
+            )
+            for region, elapsed_ms in st.session_state.get('render_timings', {}).items():
+                st.caption(f"⏱️ {region}: {elapsed_ms:.1f} ms")
+            for query, elapsed_ms in st.session_state.get('query_timings', {}).items():
+                st.caption(f"🗄️ {query} query: {elapsed_ms:.1f} ms")
+            st.caption(
+                f"🤝 Reads shared with concurrent sessions: {single_flight_stats['followers']} "
+                f"of {single_flight_stats['leaders'] + single_flight_stats['followers']}"
+            )
+            for namespace, counters in revalidate_metrics().items():
+                st.caption(
+                    f"♻️ {namespace}: {counters['fresh']:.0f} fresh, {counters['stale']:.0f} stale "
+                    f"(up to {counters['max_stale_seconds']:.0f} s), {counters['miss']:.0f} waited, "
+                    f"{counters['refresh_errors']:.0f} failed refreshes"
+                )
+
+def submit_login():
+    """Form callback that logs the user in before the next script run"""
+    email = st.session_state.get('login_email', '')
+    password = st.session_state.get('login_password', '')
+    if not email or not password:
+        st.session_state.login_message = ("warning", "Please fill in all fields")
+    elif login_user(email, password):
+        st.session_state.login_message = None
+        st.session_state.login_password = ""
+        st.session_state.page = "home"
+    else:
+        st.session_state.login_message = ("error", "Invalid email or password")
 
 def show_login_page():
     """Display login page"""
@@ -259,27 +335,24 @@ def show_login_page():
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
         with st.form("login_form"):
-            email = st.text_input("Email", placeholder="Enter your email")
-            password = st.text_input("Password", type="password", placeholder="Enter your password")
+            st.text_input("Email", placeholder="Enter your email", key="login_email")
+            st.text_input("Password", type="password", placeholder="Enter your password", key="login_password")
             
             col_btn1, col_btn2 = st.columns(2)
             with col_btn1:
-                login_button = st.form_submit_button("Login", use_container_width=True)
+                st.form_submit_button("Login", use_container_width=True, on_click=submit_login)
             with col_btn2:
-                if st.form_submit_button("Go to Register", use_container_width=True):
-                    st.session_state.page = "register"
-                    st.rerun()
+                st.form_submit_button(
+                    "Go to Register",
+                    use_container_width=True,
+                    on_click=navigate,
+                    args=("register",)
+                )
             
-            if login_button:
-                if email and password:
-                    success = login_user(email, password)
-                    if success:
-                        st.success("Login successful!")
-                        st.rerun()
-                    else:
-                        st.error("Invalid email or password")
-                else:
-                    st.warning("Please fill in all fields")
+            message = st.session_state.pop('login_message', None)
+            if message:
+                level, text = message
+                getattr(st, level)(text)
 
 def show_register_page():
     """Display registration page"""
@@ -298,9 +371,12 @@ def show_register_page():
             with col_btn1:
                 register_button = st.form_submit_button("Register", use_container_width=True)
             with col_btn2:
-                if st.form_submit_button("Go to Login", use_container_width=True):
-                    st.session_state.page = "login"
-                    st.rerun()
+                st.form_submit_button(
+                    "Go to Login",
+                    use_container_width=True,
+                    on_click=navigate,
+                    args=("login",)
+                )
             
             if register_button:
                 if name and email and password and confirm_password:
@@ -311,7 +387,7 @@ def show_register_page():
                         if success:
                             st.success("Registration successful! Please login.")
                             st.session_state.page = "login"
-                            st.rerun()
+                            rerun()
                         else:
                             st.error("Email already exists or registration failed")
                 else:
@@ -527,6 +603,15 @@ def show_settings_page():
         st.error("Access denied. Admin privileges required.")
         return
     
+    # Statistics and the user list are fetched together up front
+    data = prefetch(
+        {
+            'stats': get_temple_stats,
+            'users': get_all_users
+        },
+        defaults={'stats': EMPTY_STATS, 'users': []}
+    )
+    
     # Application Information
     st.markdown("### 📊 Application Information")
     col1, col2, col3 = st.columns(3)
@@ -534,11 +619,13 @@ def show_settings_page():
     with col1:
         st.metric("App Version", "1.0.0")
     with col2:
-        db_status = init_database()
-        st.metric("Database Status", "Connected" if db_status is not None else "Disconnected")
+        db_status = get_db()
+        st.metric(
+            "Database Status",
+            "Connected" if db_status is not None else "Read-only" if is_read_only() else "Disconnected"
+        )
     with col3:
-        from models import get_temple_stats
-        stats = get_temple_stats()
+        stats = data['stats']
         st.metric("Total Records", stats['total_temples'] + stats['total_users'])
     
     st.markdown("---")
@@ -556,12 +643,8 @@ def show_settings_page():
 
                 from models import get_all_temples
                 temples = get_all_temples()
-                # Remove images for export to reduce size
-                export_data = []
-                for temple in temples:
-                    temple_copy = temple.copy()
-                    temple_copy.pop('images', None)  # Remove images
-                    export_data.append(temple_copy)
+                # Temples come without their images, which keeps the export small
+                export_data = [thaw(temple) for temple in temples]
                 
                 json_data = json.dumps(export_data, indent=2, default=str)
                 st.download_button(
@@ -589,8 +672,7 @@ def show_settings_page():
     # User Management
     st.markdown("### 👥 User Management")
     
-    from models import get_all_users
-    users = get_all_users()
+    users = data['users']
     
     if users:
         st.markdown(f"**Total Users:** {len(users)}")
@@ -623,7 +705,7 @@ def show_settings_page():
                                 from models import delete_user
                                 if delete_user(user['_id']):
                                     st.success("User deleted successfully!")
-                                    st.rerun()
+                                    rerun()
                                 else:
                                     st.error("Failed to delete user")
                             else:
@@ -636,13 +718,13 @@ def show_settings_page():
                             from models import update_user
                             if update_user(user['_id'], {'role': 'admin'}):
                                 st.success("User promoted to admin!")
-                                st.rerun()
+                                rerun()
                     elif user.get('_id') != st.session_state.user['id']:  # Can't demote self
                         if st.button(f"⬇️ Make User", key=f"demote_{user['_id']}"):
                             from models import update_user
                             if update_user(user['_id'], {'role': 'user'}):
                                 st.success("Admin demoted to user!")
-                                st.rerun()
+                                rerun()
     
     st.markdown("---")
     
@@ -679,9 +761,7 @@ def show_profile_page():
             st.markdown(f"**Role:** {st.session_state.user['role'].title()}")
             st.markdown(f"**Member Since:** {st.session_state.user.get('created_at', 'N/A')}")
             
-            if st.button("Logout", use_container_width=True):
-                logout_user()
-                st.rerun()
+            st.button("Logout", use_container_width=True, on_click=logout_user)
         
         with col2:
             st.markdown("### Account Settings")
@@ -708,9 +788,12 @@ def show_profile_page():
             
             if st.session_state.user['role'] == 'admin':
                 st.markdown("### Admin Actions")
-                if st.button("Go to Admin Dashboard", use_container_width=True):
-                    st.session_state.page = "admin"
-                    st.rerun()
+                st.button(
+                    "Go to Admin Dashboard",
+                    use_container_width=True,
+                    on_click=navigate,
+                    args=("admin",)
+                )
 
 def show_footer():
     """Display footer with acknowledgments"""
@@ -723,8 +806,12 @@ def show_footer():
     </div>
     """, unsafe_allow_html=True)
 
+@timed_render("full page")
 def main():
     """Main application entry point"""
+    route_from_query_params()
+    dispatch_grid_clicks()
+    
     try:
         # Display header
         st.markdown("<div class='header'>", unsafe_allow_html=True)
@@ -744,12 +831,17 @@ def main():
             show_home_page()
         elif st.session_state.page == "temples":
             show_temple_list()
+        elif st.session_state.page == "map":
+            show_temple_map()
         elif st.session_state.page == "temple_detail":
-            if st.session_state.selected_temple:
-                show_temple_detail(st.session_state.selected_temple)
+            if st.session_state.selected_temple or st.session_state.selected_temple_slug:
+                show_temple_detail(
+                    st.session_state.selected_temple,
+                    slug=st.session_state.selected_temple_slug
+                )
             else:
                 st.session_state.page = "temples"
-                st.rerun()
+                show_temple_list()
         elif st.session_state.page == "login":
             show_login_page()
         elif st.session_state.page == "register":
@@ -759,7 +851,7 @@ def main():
                 show_profile_page()
             else:
                 st.session_state.page = "login"
-                st.rerun()
+                show_login_page()
         elif st.session_state.page == "admin":
             if st.session_state.authenticated and st.session_state.user.get('role') == 'admin':
                 show_admin_dashboard()
@@ -778,7 +870,7 @@ def main():
                     show_edit_temple(st.session_state.selected_temple)
                 else:
                     st.session_state.page = "admin"
-                    st.rerun()
+                    show_admin_dashboard()
             else:
                 st.error("Access denied. Admin privileges required.")
                 st.session_state.page = "home"
@@ -795,9 +887,11 @@ def main():
     except Exception as e:
         st.error(f"An error occurred while loading the page: {str(e)}")
         st.info("Please try refreshing the page or go back to home.")
-        if st.button("🏠 Go to Home"):
-            st.session_state.page = "home"
-            st.rerun()
+        st.button("🏠 Go to Home", on_click=navigate, args=("home",))
+    
+    # Navigated away from a temple, so drop it from the URL
+    if st.session_state.page != "temple_detail" and get_query_param('temple'):
+        set_query_params()
     
     # Display footer on all pages
     show_footer()
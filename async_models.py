@@ -0,0 +1,88 @@
+"""
+Asyncio data access layer, alongside the synchronous functions in models.py
+
+Each read here is a coroutine wrapping the matching cached function in
+models.py, run in a worker thread, so pages can ``gather_queries`` their
+independent reads and have the round trips to MongoDB overlap instead of
+adding up. The threads come from the prefetch pool, which carries the
+session's script context into them, so ``st.error`` and
+``st.session_state`` work inside the wrapped functions.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import streamlit as st
+
+import models
+from circuit import CircuitOpenError
+from prefetch import DEFAULT_DEADLINE_SECONDS, submit
+
+async def run_in_thread(query: Callable[[], Any]) -> Any:
+    """Run a synchronous read in a worker thread and await its result"""
+    return await asyncio.wrap_future(submit(query))
+
+async def get_temple_stats_async() -> Dict:
+    """Async ``get_temple_stats``"""
+    return await run_in_thread(models.get_temple_stats)
+
+async def get_featured_temples_async(n: int = 6) -> List[Dict]:
+    """Async ``get_featured_temples``"""
+    return await run_in_thread(lambda: models.get_featured_temples(n))
+
+async def count_temple_images_async() -> int:
+    """Async ``count_temple_images``"""
+    return await run_in_thread(models.count_temple_images)
+
+async def get_temple_facets_async() -> Dict:
+    """Async ``get_temple_facets``"""
+    return await run_in_thread(models.get_temple_facets)
+
+async def search_temples_async(query: str) -> List[Dict]:
+    """Async ``search_temples``"""
+    return await run_in_thread(lambda: models.search_temples(query))
+
+async def get_all_users_async() -> List[Dict]:
+    """Async ``get_all_users`` (passwords removed)"""
+    return await run_in_thread(models.get_all_users)
+
+async def _timed(name: str, query: Awaitable, deadline: float, timings: Dict[str, float]) -> Any:
+    started = time.perf_counter()
+    try:
+        return await asyncio.wait_for(query, deadline)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"timed out after {deadline:g} s") from None
+    finally:
+        timings[name] = (time.perf_counter() - started) * 1000
+
+def gather_queries(queries: Dict[str, Awaitable], defaults: Optional[Dict[str, Any]] = None,
+                   deadline: float = DEFAULT_DEADLINE_SECONDS) -> Dict[str, Any]:
+    """Run named queries concurrently and return their results by name.
+
+    Call from the script thread. A query still running after ``deadline``
+    seconds is abandoned (it finishes in the background). A failed or
+    abandoned query is reported with ``st.error`` and replaced by its entry
+    in ``defaults`` (or None), so one slow or broken query does not blank the
+    page. Each query's duration in milliseconds is recorded in
+    ``st.session_state.query_timings``.
+    """
+    defaults = defaults or {}
+    names = list(queries)
+    timings = st.session_state.setdefault('query_timings', {})
+
+    async def run_all():
+        return await asyncio.gather(
+            *(_timed(name, queries[name], deadline, timings) for name in names),
+            return_exceptions=True
+        )
+
+    results = {}
+    for name, result in zip(names, asyncio.run(run_all())):
+        if isinstance(result, Exception):
+            # Read-only mode is announced once for the whole page
+            if not isinstance(result, CircuitOpenError):
+                st.error(f"Error loading {name.replace('_', ' ')}: {result}")
+            result = defaults.get(name)
+        results[name] = result
+    return results
@@ -52,6 +52,7 @@ def logout_user():
     st.session_state.token = None
     st.session_state.page = "home"
     st.session_state.selected_temple = None
+    st.session_state.selected_temple_slug = None
 
 def register_user(name: str, email: str, password: str, role: str = "user") -> bool:
     """Register a new user"""
@@ -135,6 +136,8 @@ def init_session_state():
         st.session_state.page = "home"
     if 'selected_temple' not in st.session_state:
         st.session_state.selected_temple = None
+    if 'selected_temple_slug' not in st.session_state:
+        st.session_state.selected_temple_slug = None
 
 def clear_session():
     """Clear all session data"""
@@ -0,0 +1,87 @@
+"""
+Benchmark: nearby temples via $geoNear on the 2dsphere index vs a Python scan
+
+Seeds a scratch database with random temples, times ``models.find_temples_near``
+against reading every temple's coordinates and computing distances in Python,
+and checks both return the same temples in the same order. Needs a real
+MongoDB ($geoNear is not available in mongomock):
+
+    python -m benchmarks.nearby --uri mongodb://localhost:27017/ --temples 20000
+"""
+
+import argparse
+import random
+import statistics
+import time
+from typing import Callable, List, Tuple
+
+from locations import geo_point, haversine_km
+
+def naive_nearby(db, lat: float, lon: float, radius_km: float, limit: int) -> List[str]:
+    """Ids of the ``limit`` nearest temples, computed in Python from coordinates only"""
+    nearby = []
+    for temple in db.temples.find({"geo": {"$exists": True}}, {"geo": 1}):
+        temple_lon, temple_lat = temple['geo']['coordinates']
+        distance_km = haversine_km(lat, lon, temple_lat, temple_lon)
+        if distance_km <= radius_km:
+            nearby.append((distance_km, str(temple['_id'])))
+    return [temple_id for _, temple_id in sorted(nearby)[:limit]]
+
+def seed(db, count: int, rng: random.Random) -> None:
+    """Random temples across India, a tenth of them without coordinates"""
+    temples = []
+    for n in range(count):
+        temple = {"name": f"Temple {n}", "location": "India", "images": []}
+        if rng.random() > 0.1:
+            temple["geo"] = geo_point(rng.uniform(8, 35), rng.uniform(68, 97))
+        temples.append(temple)
+    db.temples.insert_many(temples)
+
+def median_ms(query: Callable, repeats: int) -> Tuple[float, object]:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = query()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+def compare(db, lat: float, lon: float, radius_km: float, limit: int, repeats: int = 5) -> dict:
+    """Median timings of both approaches and whether their results match"""
+    from models import nearby_temples_pipeline
+    indexed_ms, indexed = median_ms(
+        lambda: [str(t['_id']) for t in db.temples.aggregate(nearby_temples_pipeline(lat, lon, radius_km, limit))],
+        repeats
+    )
+    scan_ms, scanned = median_ms(lambda: naive_nearby(db, lat, lon, radius_km, limit), repeats)
+    return {"indexed_ms": indexed_ms, "scan_ms": scan_ms, "match": indexed == scanned}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--database", default="alayatales_bench")
+    parser.add_argument("--temples", type=int, default=20000)
+    parser.add_argument("--radius-km", type=float, default=200)
+    parser.add_argument("--limit", type=int, default=6)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    from pymongo import MongoClient
+    from schema import sync_indexes
+
+    client = MongoClient(args.uri)
+    client.drop_database(args.database)
+    db = client[args.database]
+    try:
+        seed(db, args.temples, random.Random(0))
+        sync_indexes(db)
+        result = compare(db, 20.5937, 78.9629, args.radius_km, args.limit, args.repeats)
+    finally:
+        client.drop_database(args.database)
+    print(
+        f"{args.temples} temples, {args.limit} nearest within {args.radius_km:g} km: "
+        f"$geoNear {result['indexed_ms']:.1f} ms, Python scan {result['scan_ms']:.1f} ms, "
+        f"results {'match' if result['match'] else 'DIFFER'}"
+    )
+
+if __name__ == "__main__":
+    main()
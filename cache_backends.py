@@ -0,0 +1,323 @@
+"""
+Storage backends for shared read caches
+
+``revalidate.stale_while_revalidate`` keeps its results in one of these, so
+the same decorator can cache in this process (``memory``), in files shared
+by every process on the machine (``disk``) or in a Redis-protocol server
+shared by every replica (Redis, Valkey, KeyDB, Dragonfly...). Pick one with
+``CACHE_BACKEND``: ``memory``, ``disk`` / ``disk:/path/to/dir`` or a
+``redis://`` URL.
+
+Every backend stores bytes from ``serialize``; Redis asks for images as raw
+bytes (a quarter smaller over the network and in the server's memory), the
+local backends keep them as text (no base64 to decode and re-encode on every
+hit). Each namespace (one per
+cached function) has its own entry limit, evicts its least recently used
+entries on its own and can be cleared without touching the others.
+"""
+
+import base64
+import hashlib
+import os
+import pickle
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from circuit import CircuitBreaker
+
+# Redis is optional; only needed for CACHE_BACKEND=redis://...
+try:
+    import redis
+    HAS_REDIS = True
+    REDIS_ERRORS = (redis.RedisError, OSError)
+except ImportError:
+    HAS_REDIS = False
+    REDIS_ERRORS = (OSError,)
+
+# Data URLs at least this long are stored as raw bytes instead of base64 text
+BINARY_THRESHOLD = 1024
+FRAME_MAGIC = b"ATC1"
+
+class _Binary:
+    """A base64 data URL held as decoded bytes while serialized"""
+    __slots__ = ("mime", "data")
+
+    def __init__(self, mime: str, data):
+        self.mime = mime
+        self.data = data
+
+    def __reduce_ex__(self, protocol):
+        # Protocol 5 hands the bytes to the buffer callback: they are framed
+        # as they are instead of being copied into the pickle stream
+        return _Binary, (self.mime, pickle.PickleBuffer(self.data))
+
+def _pack(value: Any) -> Any:
+    if isinstance(value, str):
+        if len(value) >= BINARY_THRESHOLD and value.startswith("data:") and ";base64," in value[:100]:
+            header, data = value.split(",", 1)
+            return _Binary(header[5:-7], base64.b64decode(data))
+        return value
+    if isinstance(value, dict):
+        return {key: _pack(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_pack(item) for item in value]
+    if isinstance(value, tuple):
+        return tuple(_pack(item) for item in value)
+    return value
+
+def _unpack(value: Any) -> Any:
+    if isinstance(value, _Binary):
+        return f"data:{value.mime};base64,{base64.b64encode(value.data).decode()}"
+    if isinstance(value, dict):
+        return {key: _unpack(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_unpack(item) for item in value]
+    if isinstance(value, tuple):
+        return tuple(_unpack(item) for item in value)
+    return value
+
+def serialize(value: Any, binary: bool = False) -> bytes:
+    """Pickle ``value``; with ``binary`` its data URL images become raw
+    out-of-band buffers.
+
+    Frame: magic, buffer count, pickle length, buffer lengths, the pickle,
+    then the buffers. Images are already compressed, so nothing is zipped.
+    """
+    buffers: List[pickle.PickleBuffer] = []
+    payload = pickle.dumps(_pack(value) if binary else value, protocol=5, buffer_callback=buffers.append)
+    raws = [buffer.raw() for buffer in buffers]
+    header = FRAME_MAGIC + struct.pack(f"<II{len(raws)}Q", len(raws), len(payload), *(len(raw) for raw in raws))
+    return b"".join([header, payload, *raws])
+
+def deserialize(data: bytes) -> Any:
+    view = memoryview(data)
+    if bytes(view[:4]) != FRAME_MAGIC:
+        raise ValueError("not a cache frame")
+    count, payload_length = struct.unpack_from("<II", view, 4)
+    lengths = struct.unpack_from(f"<{count}Q", view, 12)
+    offset = 12 + 8 * count
+    payload = view[offset:offset + payload_length]
+    offset += payload_length
+    buffers = []
+    for length in lengths:
+        # Slices of the frame, not copies
+        buffers.append(view[offset:offset + length])
+        offset += length
+    value = pickle.loads(payload, buffers=buffers)
+    # Without buffers there are no images to turn back into text
+    return _unpack(value) if buffers else value
+
+class MemoryBackend:
+    """Per-process LRU per namespace"""
+    binary = False
+
+    def __init__(self):
+        self.namespaces: Dict[str, "OrderedDict[str, tuple]"] = {}
+        self.lock = threading.Lock()
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        with self.lock:
+            entries = self.namespaces.get(namespace)
+            entry = entries.get(key) if entries else None
+            if entry is None:
+                return None
+            if entry[1] < time.time():
+                del entries[key]
+                return None
+            entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: float, max_entries: int) -> None:
+        with self.lock:
+            entries = self.namespaces.setdefault(namespace, OrderedDict())
+            entries[key] = (value, time.time() + ttl)
+            entries.move_to_end(key)
+            while len(entries) > max_entries:
+                entries.popitem(last=False)
+
+    def clear(self, namespace: str) -> None:
+        with self.lock:
+            self.namespaces.pop(namespace, None)
+
+class DiskBackend:
+    """One file per entry, in a directory per namespace, shared by local processes.
+
+    Files are written to a temporary name and renamed into place, so readers
+    never see half an entry. Reads refresh the file's access time used for
+    LRU eviction.
+    """
+    binary = False
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, namespace: str, key: str) -> str:
+        folder = os.path.join(self.directory, hashlib.sha1(namespace.encode()).hexdigest()[:16])
+        return os.path.join(folder, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        path = self._path(namespace, key)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+        except OSError:
+            return None
+        (expires_at,) = struct.unpack_from("<d", data)
+        if expires_at < time.time():
+            return None
+        now = time.time()
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        return data[8:]
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: float, max_entries: int) -> None:
+        path = self._path(namespace, key)
+        folder = os.path.dirname(path)
+        os.makedirs(folder, exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(struct.pack("<d", time.time() + ttl))
+            file.write(value)
+        os.replace(temporary, path)
+        self._evict(folder, max_entries)
+
+    def _evict(self, folder: str, max_entries: int) -> None:
+        entries = []
+        for entry in os.scandir(folder):
+            if not entry.name.endswith(".tmp"):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    pass
+        if len(entries) <= max_entries:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self, namespace: str) -> None:
+        folder = os.path.dirname(self._path(namespace, ""))
+        if os.path.isdir(folder):
+            for entry in os.scandir(folder):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+class RedisBackend:
+    """Shared by every replica through a Redis-protocol server.
+
+    Each namespace keeps a sorted set of its keys by last use, trimmed to
+    its entry limit, and a generation number that ``clear`` increments, so
+    clearing a namespace is one command. Entries carry the generation they
+    were written in and count as misses once it is out of date, so a read is
+    a single pipelined round trip: the generation, the entry and its LRU
+    touch together.
+
+    A failed command opens ``breaker``: until a trial command succeeds, reads
+    and writes go to a per-process ``MemoryBackend`` straight away instead of
+    each waiting for the socket timeout.
+    """
+    binary = True
+
+    def __init__(self, url: str, prefix: str = "alayatales:cache", client=None):
+        if client is None:
+            if not HAS_REDIS:
+                raise ImportError("CACHE_BACKEND is a redis:// URL but the redis package is not installed")
+            client = redis.Redis.from_url(url, socket_timeout=1.0, socket_connect_timeout=1.0)
+        self.client = client
+        self.prefix = prefix
+        self.breaker = CircuitBreaker("redis", failure_threshold=1, reset_timeout=30.0)
+        self.fallback = MemoryBackend()
+        # Last generation seen per namespace, so writes need not look it up;
+        # generations only grow, so an old one just makes the entry a miss
+        self.generations: Dict[str, int] = {}
+        # Namespaces cleared while the server was unreachable, cleared there
+        # too once it is back
+        self.pending_clears = set()
+
+    def _call(self, command, fallback):
+        """``command()`` against the server, or ``fallback()`` while it is unreachable"""
+        if not self.breaker.allow():
+            return fallback()
+        try:
+            for namespace in list(self.pending_clears):
+                self.client.incr(self._generation_key(namespace))
+                self.pending_clears.discard(namespace)
+            result = command()
+        except REDIS_ERRORS:
+            self.breaker.record_failure()
+            return fallback()
+        self.breaker.record_success()
+        return result
+
+    def _generation_key(self, namespace: str) -> str:
+        return f"{self.prefix}:{namespace}:generation"
+
+    def _keys(self, namespace: str, key: str) -> tuple:
+        base = f"{self.prefix}:{namespace}"
+        return f"{base}:{hashlib.sha1(key.encode()).hexdigest()}", f"{base}:lru"
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        def command():
+            entry_key, lru_key = self._keys(namespace, key)
+            pipeline = self.client.pipeline(transaction=False)
+            pipeline.get(self._generation_key(namespace))
+            pipeline.get(entry_key)
+            # XX only refreshes keys already in the set, so misses add nothing
+            pipeline.zadd(lru_key, {entry_key: time.time()}, xx=True)
+            generation, entry, _ = pipeline.execute()
+            generation = self.generations[namespace] = int(generation or 0)
+            if entry is None or struct.unpack_from("<Q", entry)[0] != generation:
+                return None
+            return memoryview(entry)[8:]
+
+        return self._call(command, lambda: self.fallback.get(namespace, key))
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: float, max_entries: int) -> None:
+        def command():
+            entry_key, lru_key = self._keys(namespace, key)
+            if namespace not in self.generations:
+                self.generations[namespace] = int(self.client.get(self._generation_key(namespace)) or 0)
+            entry = struct.pack("<Q", self.generations[namespace]) + value
+            pipeline = self.client.pipeline(transaction=False)
+            pipeline.set(entry_key, entry, ex=max(1, int(ttl)))
+            pipeline.zadd(lru_key, {entry_key: time.time()})
+            pipeline.expire(lru_key, max(1, int(ttl)))
+            pipeline.zrange(lru_key, 0, -max_entries - 1)
+            evicted = pipeline.execute()[-1]
+            if evicted:
+                pipeline = self.client.pipeline(transaction=False)
+                pipeline.delete(*evicted)
+                pipeline.zrem(lru_key, *evicted)
+                pipeline.execute()
+
+        self._call(command, lambda: self.fallback.set(namespace, key, value, ttl, max_entries))
+
+    def clear(self, namespace: str) -> None:
+        self.fallback.clear(namespace)
+        self.generations.pop(namespace, None)
+
+        def command():
+            self.client.incr(self._generation_key(namespace))
+
+        self._call(command, lambda: self.pending_clears.add(namespace))
+
+def create_backend(spec: str):
+    """Backend for a ``CACHE_BACKEND`` setting"""
+    spec = (spec or "memory").strip()
+    if spec.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(spec)
+    if spec == "disk" or spec.startswith("disk:"):
+        return DiskBackend(spec[5:] or os.path.join(".cache", "alayatales"))
+    if spec == "memory":
+        return MemoryBackend()
+    raise ValueError(f"Unknown CACHE_BACKEND: {spec}")
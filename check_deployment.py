@@ -263,7 +263,7 @@ def check_dependencies_compatibility():
     if "pandas==2.1.3" in requirements:
         print("  ✅ Pandas version is compatible")
     
-    if "streamlit==1.28.2" in requirements:
+    if "streamlit>=1.37.1" in requirements:
         print("  ✅ Streamlit version specified")
     
     # Check for pymongo with srv support
@@ -0,0 +1,111 @@
+"""
+Circuit breaker for the database
+
+After ``failure_threshold`` consecutive failed operations the circuit opens
+and callers are told straight away that the database is unavailable, instead
+of each one waiting for its own timeout. After ``reset_timeout`` seconds one
+trial is let through (half-open) and every other caller is still refused
+until it resolves: a success closes the circuit again, a failure re-opens it.
+A trial that never reports back is given up after another ``reset_timeout``,
+and the next caller gets to try.
+
+``BreakerListener`` feeds a breaker from pymongo's monitoring events, so every
+command the driver runs counts without wrapping each query.
+"""
+
+import threading
+import time
+
+from pymongo import monitoring
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+# Server error codes that mean the server is slow or unavailable, as opposed
+# to a bad query: time limits, shutdowns and elections
+UNHEALTHY_ERROR_CODES = {50, 89, 91, 189, 262, 10107, 11600, 11602, 13435, 13436}
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of querying while the circuit is open"""
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        # When the half-open trial was handed out, None while there is none
+        self.trial_at = None
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self.lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self.opened_at is None:
+            return CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return OPEN
+
+    def allow(self) -> bool:
+        """Whether an operation may be attempted now. While half-open only
+        the caller that gets the trial is allowed; it must report the outcome
+        with ``record_success`` or ``record_failure``"""
+        with self.lock:
+            state = self._state()
+            if state == CLOSED:
+                return True
+            if state == OPEN:
+                return False
+            now = time.monotonic()
+            if self.trial_at is not None and now - self.trial_at < self.reset_timeout:
+                return False
+            self.trial_at = now
+            return True
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_at = None
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            # A failed half-open trial re-opens at once and restarts the wait
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+            self.trial_at = None
+
+    def trip(self) -> None:
+        """Open the circuit now, e.g. when the first connection attempt fails"""
+        with self.lock:
+            self.failures = max(self.failures, self.failure_threshold)
+            self.opened_at = time.monotonic()
+            self.trial_at = None
+
+class BreakerListener(monitoring.CommandListener, monitoring.ServerHeartbeatListener):
+    """Counts failed commands and heartbeats against a breaker.
+
+    Only commands count as successes: a server that answers heartbeats but
+    times out on queries is still unhealthy.
+    """
+
+    def __init__(self, breaker: CircuitBreaker):
+        self.breaker = breaker
+
+    def started(self, event) -> None:
+        pass
+
+    def succeeded(self, event) -> None:
+        if isinstance(event, monitoring.CommandSucceededEvent):
+            self.breaker.record_success()
+
+    def failed(self, event) -> None:
+        failure = getattr(event, "failure", None)
+        # Heartbeat and network failures carry an exception, not a server reply
+        if not isinstance(failure, dict) or "errtype" in failure or failure.get("code") in UNHEALTHY_ERROR_CODES:
+            self.breaker.record_failure()
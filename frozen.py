@@ -0,0 +1,34 @@
+"""
+Read-only views of data shared by every session
+
+``st.cache_data`` pickles its value and hands every rerun a fresh copy, which
+for temple documents with base64 images means copying megabytes per rerun.
+Results cached with ``st.cache_resource`` are not copied, so they are frozen
+first: dicts become ``MappingProxyType`` views and lists become tuples. Every
+session then reads one copy, and an attempt to modify it raises
+``TypeError`` instead of silently changing what other sessions see.
+``thaw`` returns an ordinary, editable copy.
+"""
+
+from types import MappingProxyType
+from typing import Any
+
+def freeze(value: Any) -> Any:
+    """Deeply immutable version of a document or list of documents"""
+    if isinstance(value, (dict, MappingProxyType)):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(freeze(item) for item in value)
+    return value
+
+def thaw(value: Any) -> Any:
+    """Editable copy of a frozen value: dicts, lists and sets"""
+    if isinstance(value, MappingProxyType):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    if isinstance(value, frozenset):
+        return {thaw(item) for item in value}
+    return value
@@ -0,0 +1,25 @@
+"""
+Browser geolocation, read through a small custom Streamlit component
+
+The page asks for the visitor's position only after they click the button
+(``frontend/geolocation/index.html``); the last reading is returned on every
+later run.
+"""
+
+import os
+from typing import Dict, Optional
+
+import streamlit.components.v1 as components
+
+_geolocation = components.declare_component(
+    "geolocation",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend", "geolocation")
+)
+
+def browser_location(key: str, label: str = "📍 Use my location") -> Optional[Dict]:
+    """Render a button that reads the browser's position.
+
+    Returns ``{'lat', 'lon', 'accuracy'}`` (accuracy in metres) once the
+    visitor has shared their location, otherwise None.
+    """
+    return _geolocation(label=label, key=key, default=None)
@@ -0,0 +1,207 @@
+"""
+On-disk cache of processed images
+
+Temple images stored as base64 data URLs, and resized variants of them, are
+written as files named after a hash of the source image and the variant, so
+a restarted process, or any other process on the machine, serves them
+without decoding and resizing again. Kept under the app's ``static/``
+folder, the files are served by URL. Files are written to a temporary name
+and renamed into place, read through ``mmap`` and evicted least recently
+used first once the cache outgrows its byte budget.
+"""
+
+import base64
+import hashlib
+import io
+import mmap
+import os
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+from PIL import Image
+
+# Eviction brings the cache down to this share of its budget, so it does not
+# rescan the directory on every write once full
+LOW_WATERMARK = 0.9
+
+# Variant name -> (bounding box in pixels, JPEG quality). Cards are 200px
+# high; twice that keeps them sharp on high-density screens
+IMAGE_VARIANTS: Dict[str, Tuple[Tuple[int, int], int]] = {
+    "card": ((600, 400), 75),
+}
+
+# The "original" variant keeps the uploaded bytes, so its file extension
+# follows their type; only types a static server labels as images qualify
+MIME_EXTENSIONS = {"image/jpeg": "jpg", "image/png": "png", "image/gif": "gif", "image/webp": "webp"}
+
+class ImageCache:
+    """Processed image bytes by source content hash and variant, bounded by total size"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # Bytes stored, counted once from the directory and then kept up to
+        # date by this process; a rescan during eviction corrects it for
+        # files written by other processes
+        self.total_bytes: Optional[int] = None
+
+    @staticmethod
+    def content_hash(data) -> str:
+        return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+    @staticmethod
+    def relative_path(digest: str, variant: str, extension: str = "jpg") -> str:
+        return os.path.join(digest[:2], f"{digest}.{variant}.{extension}")
+
+    def _path(self, digest: str, variant: str, extension: str = "jpg") -> str:
+        return os.path.join(self.directory, self.relative_path(digest, variant, extension))
+
+    def get(self, digest: str, variant: str, extension: str = "jpg") -> Optional[memoryview]:
+        """Read-only view of a cached variant, mapped rather than read into memory"""
+        path = self._path(digest, variant, extension)
+        try:
+            with open(path, "rb") as file:
+                if os.fstat(file.fileno()).st_size == 0:
+                    return memoryview(b"")
+                # The mapping stays valid after the file is closed, and after
+                # eviction removes it, for as long as the view is referenced
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            # Reads count as use for LRU eviction
+            os.utime(path)
+        except OSError:
+            pass
+        return memoryview(mapped)
+
+    def put(self, digest: str, variant: str, data: bytes, extension: str = "jpg") -> None:
+        path = self._path(digest, variant, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(data)
+        os.replace(temporary, path)
+        with self.lock:
+            if self.total_bytes is None:
+                self.total_bytes = sum(size for _, size, _ in self._files())
+            else:
+                self.total_bytes += len(data)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def get_or_create(self, data, variant: str, make: Callable[[bytes], bytes]) -> memoryview:
+        """Cached ``make(data)``, computed and stored on the first request"""
+        digest = self.content_hash(data)
+        cached = self.get(digest, variant)
+        if cached is not None:
+            return cached
+        processed = make(data)
+        try:
+            self.put(digest, variant, processed)
+        except OSError:
+            # A full or read-only disk only costs the cache
+            pass
+        return memoryview(processed)
+
+    def ensure(self, data, variant: str, extension: str, make: Callable[[bytes], bytes]) -> str:
+        """Path, relative to the cache directory, of the cached ``make(data)``,
+        written first if it is not there yet"""
+        digest = self.content_hash(data)
+        relative_path = self.relative_path(digest, variant, extension)
+        if not self.touch(relative_path):
+            self.put(digest, variant, make(data), extension)
+        return relative_path
+
+    def touch(self, relative_path: str) -> bool:
+        """Count a cached file as used for LRU eviction; False if it is gone"""
+        try:
+            os.utime(os.path.join(self.directory, relative_path))
+            return True
+        except OSError:
+            return False
+
+    def _files(self):
+        """(mtime, size, path) of every cached file"""
+        if not os.path.isdir(self.directory):
+            return []
+        files = []
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def _evict(self) -> None:
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * LOW_WATERMARK
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                # Another process evicted it first
+                total -= size
+            except OSError:
+                pass
+        self.total_bytes = total
+
+def resize_variant(data: bytes, variant: str) -> bytes:
+    """Image bytes fitted into the variant's box and saved as JPEG"""
+    box, quality = IMAGE_VARIANTS[variant]
+    image = Image.open(io.BytesIO(data))
+    if image.width <= box[0] and image.height <= box[1] and image.format == "JPEG":
+        # Already small enough; re-encoding would only lose quality
+        return bytes(data)
+    image.thumbnail(box, Image.Resampling.LANCZOS)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=quality, optimize=True)
+    return output.getvalue()
+
+def image_bytes(image: str) -> bytes:
+    """Decoded bytes of a data URL image"""
+    return base64.b64decode(image.split(",", 1)[1])
+
+def is_data_image(image: str) -> bool:
+    return image.startswith("data:image") and ";base64," in image[:100]
+
+def variant_file(cache: ImageCache, image: str, variant: str = "original") -> Optional[str]:
+    """Cache-relative path of a variant of a data URL image, written on first
+    use; None for other images (links) and ones that cannot be stored"""
+    if not is_data_image(image):
+        return None
+    if variant == "original":
+        extension = MIME_EXTENSIONS.get(image[5:image.index(";")])
+        if extension is None:
+            return None
+        make = bytes
+    else:
+        extension, make = "jpg", lambda raw: resize_variant(raw, variant)
+    try:
+        return cache.ensure(image_bytes(image), variant, extension, make)
+    except Exception:
+        return None
+
+def variant_data_url(cache: ImageCache, image: str, variant: str) -> str:
+    """Data URL of a variant of a data URL image; other images (links) and
+    images that cannot be processed are returned unchanged"""
+    if not is_data_image(image):
+        return image
+    try:
+        data = cache.get_or_create(image_bytes(image), variant, lambda raw: resize_variant(raw, variant))
+    except Exception:
+        return image
+    return f"data:image/jpeg;base64,{base64.b64encode(data).decode()}"
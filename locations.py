@@ -0,0 +1,239 @@
+"""
+Parsing of free-text temple locations into city / state / country
+
+Locations are typed by hand ("Madurai, TN", "madras", "New Delhi"), so they are
+matched against a small normalization dictionary when a temple is written.
+The structured fields are indexed; ``region_path`` ("india/tamil nadu/madurai/")
+lets a whole state or country be selected with an index range instead of a regex.
+"""
+
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_COUNTRY = "India"
+EARTH_RADIUS_KM = 6371.0088
+
+# Web Mercator (slippy map) tiles, as used by the map page
+MAX_MERCATOR_LAT = 85.05112878
+MIN_MAP_ZOOM = 3
+MAX_MAP_ZOOM = 16
+
+# Canonical name -> accepted spellings (compared case-insensitively)
+COUNTRIES: Dict[str, List[str]] = {
+    "India": ["india", "bharat", "in"],
+    "Nepal": ["nepal"],
+    "Sri Lanka": ["sri lanka", "srilanka", "ceylon"],
+    "Bangladesh": ["bangladesh"],
+    "Bhutan": ["bhutan"],
+    "Cambodia": ["cambodia"],
+    "Indonesia": ["indonesia"],
+    "Malaysia": ["malaysia"],
+    "Singapore": ["singapore"],
+    "Thailand": ["thailand"],
+    # "UK" is left to Uttarakhand
+    "United Kingdom": ["united kingdom", "england"],
+    "United States": ["united states", "usa", "us", "united states of america"],
+    "Canada": ["canada"],
+    "Australia": ["australia"],
+}
+
+STATES: Dict[str, List[str]] = {
+    "Andhra Pradesh": ["andhra pradesh", "ap", "andhra"],
+    "Arunachal Pradesh": ["arunachal pradesh", "arunachal"],
+    "Assam": ["assam"],
+    "Bihar": ["bihar"],
+    "Chhattisgarh": ["chhattisgarh", "chattisgarh", "cg"],
+    "Goa": ["goa"],
+    "Gujarat": ["gujarat", "gj"],
+    "Haryana": ["haryana", "hr"],
+    "Himachal Pradesh": ["himachal pradesh", "himachal", "hp"],
+    "Jharkhand": ["jharkhand"],
+    "Karnataka": ["karnataka", "ka"],
+    "Kerala": ["kerala", "kl"],
+    "Madhya Pradesh": ["madhya pradesh", "mp"],
+    "Maharashtra": ["maharashtra", "mh"],
+    "Manipur": ["manipur"],
+    "Meghalaya": ["meghalaya"],
+    "Mizoram": ["mizoram"],
+    "Nagaland": ["nagaland"],
+    "Odisha": ["odisha", "orissa", "od"],
+    "Punjab": ["punjab", "pb"],
+    "Rajasthan": ["rajasthan", "rj"],
+    "Sikkim": ["sikkim"],
+    "Tamil Nadu": ["tamil nadu", "tamilnadu", "tn"],
+    "Telangana": ["telangana", "ts", "tg"],
+    "Tripura": ["tripura"],
+    "Uttar Pradesh": ["uttar pradesh", "up"],
+    "Uttarakhand": ["uttarakhand", "uttaranchal", "uk"],
+    "West Bengal": ["west bengal", "wb", "bengal"],
+    "Andaman and Nicobar Islands": ["andaman and nicobar islands", "andaman and nicobar", "andaman"],
+    "Chandigarh": ["chandigarh"],
+    "Dadra and Nagar Haveli and Daman and Diu": ["dadra and nagar haveli and daman and diu", "daman and diu"],
+    "Delhi": ["delhi", "nct of delhi", "dl"],
+    "Jammu and Kashmir": ["jammu and kashmir", "jammu & kashmir", "j&k", "jk"],
+    "Ladakh": ["ladakh"],
+    "Lakshadweep": ["lakshadweep"],
+    "Puducherry": ["puducherry", "pondicherry", "pondy"],
+}
+
+# Canonical city -> (state, accepted spellings); lets "Madras" or "Tirupati"
+# on their own still land in the right state
+CITIES: Dict[str, tuple] = {
+    "New Delhi": ("Delhi", ["new delhi"]),
+    "Mumbai": ("Maharashtra", ["mumbai", "bombay"]),
+    "Chennai": ("Tamil Nadu", ["chennai", "madras"]),
+    "Kolkata": ("West Bengal", ["kolkata", "calcutta"]),
+    "Bengaluru": ("Karnataka", ["bengaluru", "bangalore"]),
+    "Mysuru": ("Karnataka", ["mysuru", "mysore"]),
+    "Udupi": ("Karnataka", ["udupi"]),
+    "Hampi": ("Karnataka", ["hampi"]),
+    "Hyderabad": ("Telangana", ["hyderabad"]),
+    "Tirupati": ("Andhra Pradesh", ["tirupati", "tirumala"]),
+    "Srisailam": ("Andhra Pradesh", ["srisailam"]),
+    "Madurai": ("Tamil Nadu", ["madurai"]),
+    "Thanjavur": ("Tamil Nadu", ["thanjavur", "tanjore"]),
+    "Rameswaram": ("Tamil Nadu", ["rameswaram", "rameshwaram"]),
+    "Kanchipuram": ("Tamil Nadu", ["kanchipuram", "kanchi", "conjeevaram"]),
+    "Thiruvananthapuram": ("Kerala", ["thiruvananthapuram", "trivandrum"]),
+    "Guruvayur": ("Kerala", ["guruvayur", "guruvayoor"]),
+    "Kochi": ("Kerala", ["kochi", "cochin"]),
+    "Amritsar": ("Punjab", ["amritsar"]),
+    "Puri": ("Odisha", ["puri"]),
+    "Bhubaneswar": ("Odisha", ["bhubaneswar", "bhubaneshwar"]),
+    "Konark": ("Odisha", ["konark", "konarak"]),
+    "Varanasi": ("Uttar Pradesh", ["varanasi", "benares", "banaras", "kashi"]),
+    "Ayodhya": ("Uttar Pradesh", ["ayodhya"]),
+    "Mathura": ("Uttar Pradesh", ["mathura"]),
+    "Vrindavan": ("Uttar Pradesh", ["vrindavan", "brindavan"]),
+    "Prayagraj": ("Uttar Pradesh", ["prayagraj", "allahabad"]),
+    "Haridwar": ("Uttarakhand", ["haridwar", "hardwar"]),
+    "Rishikesh": ("Uttarakhand", ["rishikesh"]),
+    "Kedarnath": ("Uttarakhand", ["kedarnath"]),
+    "Badrinath": ("Uttarakhand", ["badrinath"]),
+    "Ujjain": ("Madhya Pradesh", ["ujjain"]),
+    "Khajuraho": ("Madhya Pradesh", ["khajuraho"]),
+    "Omkareshwar": ("Madhya Pradesh", ["omkareshwar"]),
+    "Dwarka": ("Gujarat", ["dwarka", "dwaraka"]),
+    "Somnath": ("Gujarat", ["somnath"]),
+    "Ahmedabad": ("Gujarat", ["ahmedabad"]),
+    "Shirdi": ("Maharashtra", ["shirdi"]),
+    "Nashik": ("Maharashtra", ["nashik", "nasik"]),
+    "Pushkar": ("Rajasthan", ["pushkar"]),
+    "Jaipur": ("Rajasthan", ["jaipur"]),
+    "Bodh Gaya": ("Bihar", ["bodh gaya", "bodhgaya"]),
+    "Katra": ("Jammu and Kashmir", ["katra"]),
+    "Guwahati": ("Assam", ["guwahati", "gauhati"]),
+}
+
+def _lookup(table: Dict[str, List[str]]) -> Dict[str, str]:
+    return {alias: canonical for canonical, aliases in table.items() for alias in aliases}
+
+_COUNTRY_LOOKUP = _lookup(COUNTRIES)
+_STATE_LOOKUP = _lookup(STATES)
+_CITY_LOOKUP = _lookup({city: aliases for city, (_, aliases) in CITIES.items()})
+
+def _key(text: str) -> str:
+    return re.sub(r'\s+', ' ', text).strip().casefold()
+
+def region_path(*levels: Optional[str]) -> Optional[str]:
+    """Index key of a region, from the country down, e.g. "india/tamil nadu/".
+
+    Every place inside a region has that region's path as a prefix.
+    """
+    levels = [_key(level) for level in levels if level]
+    return "".join(f"{level}/" for level in levels) or None
+
+def region_filter(path: str) -> Dict:
+    """MongoDB filter for every temple inside a region, served by the
+    ``region_path`` index as a range rather than a regex"""
+    # "0" sorts right after "/", so this is every path starting with ``path``
+    return {"region_path": {"$gte": path, "$lt": path[:-1] + "0"}}
+
+def geo_point(lat: float, lon: float) -> Dict:
+    """GeoJSON point for the ``geo`` 2dsphere index (longitude comes first)"""
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError("Latitude must be between -90 and 90 and longitude between -180 and 180")
+    return {"type": "Point", "coordinates": [lon, lat]}
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points, in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+def lat_lon_to_tile(lat: float, lon: float, zoom: int) -> Tuple[float, float]:
+    """Fractional x/y tile coordinates of a point at ``zoom``"""
+    n = 2 ** zoom
+    lat = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, lat))
+    x = (lon + 180) / 360 * n
+    y = (1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n
+    return x, y
+
+def tile_to_lat_lon(x: float, y: float, zoom: int) -> Tuple[float, float]:
+    """Latitude/longitude of fractional tile coordinates (inverse of ``lat_lon_to_tile``)"""
+    n = 2 ** zoom
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    return lat, x / n * 360 - 180
+
+def tile_bounds(zoom: int, x: int, y: int) -> Dict[str, float]:
+    """West/east/north/south edges of a tile, in degrees"""
+    north, west = tile_to_lat_lon(x, y, zoom)
+    south, east = tile_to_lat_lon(x + 1, y + 1, zoom)
+    return {"west": west, "east": east, "north": north, "south": south}
+
+def viewport_tiles(lat: float, lon: float, zoom: int,
+                   columns: int = 3, rows: int = 2) -> List[Tuple[int, int, int]]:
+    """``(zoom, x, y)`` of the tiles covering a ``columns`` x ``rows`` tile
+    viewport centred on a point"""
+    n = 2 ** zoom
+    center_x, center_y = lat_lon_to_tile(lat, lon, zoom)
+    first_x, first_y = math.floor(center_x - columns / 2), math.floor(center_y - rows / 2)
+    tiles = []
+    for y in range(max(first_y, 0), min(first_y + rows + 1, n)):
+        for x in range(first_x, first_x + columns + 1):
+            # Longitude wraps around, latitude does not
+            if (zoom, x % n, y) not in tiles:
+                tiles.append((zoom, x % n, y))
+    return tiles
+
+def normalize_location(location: str) -> Dict[str, Optional[str]]:
+    """Parse a free-text location into its indexed fields.
+
+    Recognized countries, states and cities are replaced by their canonical
+    names ("Madras, TN" -> Chennai, Tamil Nadu, India). Unrecognized parts
+    are kept as typed. ``location_key`` identifies the place regardless of
+    how it was written.
+    """
+    parts = [re.sub(r'\s+', ' ', part).strip() for part in (location or '').split(',')]
+    parts = [part for part in parts if part]
+
+    def take(lookup: Dict[str, str]) -> Optional[str]:
+        # A lone part that is also a known city is kept for the city
+        if parts and _key(parts[-1]) in lookup and (len(parts) > 1 or _key(parts[-1]) not in _CITY_LOOKUP):
+            return lookup[_key(parts.pop())]
+        return None
+
+    city = None
+    country = take(_COUNTRY_LOOKUP)
+    state = take(_STATE_LOOKUP)
+    if state is None and len(parts) > 1 and _key(parts[-1]) not in _CITY_LOOKUP:
+        # Unrecognized state, e.g. outside India
+        state = parts.pop()
+    if parts:
+        # Anything before the city (a street or locality) is not indexed
+        city = _CITY_LOOKUP.get(_key(parts[-1]), parts[-1])
+        if state is None and city in CITIES:
+            state = CITIES[city][0]
+
+    if country is None and state in STATES:
+        country = DEFAULT_COUNTRY
+
+    return {
+        'location_key': ", ".join(_key(part) for part in (city, state, country) if part) or None,
+        'city': city,
+        'state': state,
+        'country': country,
+        'region_path': region_path(country, state, city)
+    }
@@ -3,14 +3,32 @@ Database models and MongoDB connection
 """
 
 import os
-from datetime import datetime
-from typing import List, Dict, Optional
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime, time
+from functools import lru_cache
+from time import monotonic, sleep
+from typing import Any, List, Dict, Mapping, Optional, Sequence
+from zoneinfo import ZoneInfo
 from pymongo import MongoClient
-from pymongo.errors import DuplicateKeyError
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
 from bson import ObjectId
 from bson.errors import InvalidId
 import streamlit as st
 from dotenv import load_dotenv
+from cache_backends import create_backend
+from circuit import CLOSED, HALF_OPEN, BreakerListener, CircuitBreaker, CircuitOpenError
+from frozen import freeze
+from image_cache import ImageCache, image_bytes, is_data_image, variant_data_url, variant_file
+from locations import geo_point, normalize_location, region_path, tile_bounds, viewport_tiles
+from revalidate import set_backend, stale_while_revalidate
+from schema import MigrationInProgress, set_each
+from search import FIELD_SEPARATOR, FuzzyIndex, SearchCache, normalize_query, phonetic_key, search_keys, tokenize
+from singleflight import single_flight
+from snapshot import SnapshotStore, refresh_snapshot
+from utils import generate_slug
 
 # Load environment variables
 load_dotenv()
@@ -24,17 +42,73 @@ def get_config(key: str, default: str = None) -> str:
         # Fall back to environment variables (for local development)
         return os.getenv(key, default)
 
+# Where cached public reads are kept: "memory" (this process), "disk" or
+# "disk:/path" (every process on this machine) or a redis:// URL (every replica)
+CACHE_BACKEND = get_config('CACHE_BACKEND', 'memory')
+try:
+    set_backend(create_backend(CACHE_BACKEND))
+except (ImportError, ValueError) as e:
+    print(f"Cache backend '{CACHE_BACKEND}' unavailable, caching in memory: {e}")
+
+# Every operation gets this deadline (the driver also sends it to the server
+# as maxTimeMS), so a slow cluster fails fast instead of hanging the page
+DB_TIMEOUT_MS = int(get_config('DB_TIMEOUT_MS', '3000'))
+DB_SERVER_SELECTION_TIMEOUT_MS = 2000
+
+# Opened by repeated timeouts or network errors; while open, reads are served
+# from caches and writes are refused (read-only mode)
+db_breaker = CircuitBreaker("mongodb", failure_threshold=3, reset_timeout=30.0)
+
+def is_read_only() -> bool:
+    """Whether the database is unavailable and the app is serving cached data"""
+    return db_breaker.state != CLOSED
+
 # MongoDB connection
 @st.cache_resource
-def get_database_connection():
-    """Create and return MongoDB connection"""
+def _connect():
+    """Create a MongoDB client and check the server answers.
+
+    A client that cannot reach the server raises instead of being cached, so
+    it is created again when the circuit breaker next allows a trial.
+    """
     mongodb_uri = get_config('MONGODB_URI', 'mongodb://localhost:27017/')
     try:
-        client = MongoClient(mongodb_uri, serverSelectionTimeoutMS=5000)
+        client = MongoClient(
+            mongodb_uri,
+            serverSelectionTimeoutMS=DB_SERVER_SELECTION_TIMEOUT_MS,
+            timeoutMS=DB_TIMEOUT_MS,
+            event_listeners=[BreakerListener(db_breaker)]
+        )
+    except Exception as e:
+        st.error(f"❌ MongoDB Configuration Error: {e}")
+        return None
+    try:
         # Test the connection
         client.admin.command('ping')
+    except Exception:
+        client.close()
+        raise
+    return client
+
+def get_database_connection():
+    """Return the MongoDB connection, or None while the server is unreachable.
+    
+    While the circuit breaker is open this returns None without waiting on the
+    network; once it is half-open the one caller given the trial pings the
+    server, and its outcome closes or re-opens the circuit.
+    """
+    if not db_breaker.allow():
+        return None
+    trial = db_breaker.state == HALF_OPEN
+    try:
+        client = _connect()
+        if client is not None and trial:
+            client.admin.command('ping')
+            db_breaker.record_success()
         return client
     except Exception as e:
+        db_breaker.trip()
+        mongodb_uri = get_config('MONGODB_URI', 'mongodb://localhost:27017/')
         st.error(f"❌ MongoDB Connection Error: {e}")
         if "mongodb+srv" in mongodb_uri:
             st.error("Failed to connect to MongoDB Atlas. Please check:")
@@ -47,31 +121,187 @@ def get_database_connection():
             st.info("For Streamlit Cloud: Use MongoDB Atlas")
         return None
 
+# While another process migrates, check again after this long instead of
+# on every script run
+SCHEMA_RETRY_SECONDS = 30.0
+_schema_retry_at = [0.0]
+
+@st.cache_resource
+def ensure_schema(db_name: str) -> int:
+    """Bring the database schema up to date once per process.
+    
+    Cached, so reruns skip straight past it; failures are not cached and are
+    retried. If another process holds the migration lock this does not wait
+    for it: it raises ``MigrationInProgress`` at once.
+    """
+    from schema import migrate
+    return migrate(get_database_connection()[db_name], wait_seconds=0)
+
 def init_database():
-    """Initialize database and create indexes"""
+    """Get the database, making sure its schema has been bootstrapped"""
     client = get_database_connection()
     if client is None:
         return None
     
     try:
-        db = client[get_config('DB_NAME', 'alayatales')]
-        
-        # Create indexes
-        db.users.create_index("email", unique=True)
-        db.temples.create_index("name")
-        
-        return db
+        db_name = get_config('DB_NAME', 'alayatales')
+        if monotonic() < _schema_retry_at[0]:
+            st.warning("Database upgrade in progress; some features may be unavailable for a moment.")
+        else:
+            try:
+                ensure_schema(db_name)
+            except MigrationInProgress:
+                # Another process is upgrading the schema; serve with the
+                # current one and check again in a while
+                _schema_retry_at[0] = monotonic() + SCHEMA_RETRY_SECONDS
+                st.warning("Database upgrade in progress; some features may be unavailable for a moment.")
+        if SNAPSHOT_REFRESH_SECONDS > 0:
+            start_snapshot_refresher(SNAPSHOT_PATH, SNAPSHOT_REFRESH_SECONDS)
+        return client[db_name]
     except Exception as e:
         st.error(f"Database initialization error: {e}")
         return None
 
 def get_db():
-    """Get database instance"""
+    """Get database instance, or None while it is unreachable"""
     client = get_database_connection()
     if client is None:
         return None
     return client[get_config('DB_NAME', 'alayatales')]
 
+def require_db():
+    """Get database instance for a read that must not fall back silently"""
+    db = get_db()
+    if db is None:
+        raise CircuitOpenError("database unavailable")
+    return db
+
+# Local copy of the public temple data, read while MongoDB is unavailable
+SNAPSHOT_PATH = get_config('SNAPSHOT_PATH', 'snapshots/alayatales.sqlite3')
+SNAPSHOT_REFRESH_SECONDS = int(get_config('SNAPSHOT_REFRESH_SECONDS', '300'))
+
+@st.cache_resource
+def _snapshot_store(path: str) -> SnapshotStore:
+    return SnapshotStore(path)
+
+def from_snapshot(read, default):
+    """Answer a read from the snapshot file, or ``default`` if there is none"""
+    if not os.path.exists(SNAPSHOT_PATH):
+        return default
+    try:
+        return read(_snapshot_store(SNAPSHOT_PATH))
+    except sqlite3.Error:
+        return default
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def app_path(path: str) -> str:
+    """Absolute path of a configured path; relative ones are taken from the
+    app directory, not from wherever ``streamlit run`` was launched"""
+    return os.path.abspath(os.path.join(APP_DIR, path))
+
+# Streamlit serves files under this folder at app/static/ (enableStaticServing)
+STATIC_DIR = os.path.join(APP_DIR, 'static')
+
+# Decoded and resized images, kept on disk across restarts, shared by local
+# processes and, inside STATIC_DIR, served to browsers by URL
+IMAGE_CACHE_DIR = app_path(get_config('IMAGE_CACHE_DIR', os.path.join('static', 'images')))
+IMAGE_CACHE_MAX_MB = int(get_config('IMAGE_CACHE_MAX_MB', '256'))
+
+@st.cache_resource
+def get_image_cache() -> ImageCache:
+    return ImageCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_MB * 1024 * 1024)
+
+def static_image_url(relative_path: str) -> Optional[str]:
+    """URL of a file in the image cache, or None when the cache is not served"""
+    static_path = os.path.relpath(os.path.join(IMAGE_CACHE_DIR, relative_path), STATIC_DIR)
+    if static_path.startswith(os.pardir):
+        return None
+    # Absolute, so it also resolves from inside component iframes
+    base = (st.get_option('server.baseUrlPath') or '').strip('/')
+    return f"{'/' + base if base else ''}/app/static/{static_path.replace(os.sep, '/')}"
+
+def image_src(image: str, variant: str = "original") -> str:
+    """Where the browser should load a temple image from.
+    
+    Data URL images are written once to the image cache and linked by URL, so
+    pages carry a short link and ``loading="lazy"`` really defers the
+    download. Links are returned unchanged; if the cache is not served or the
+    image cannot be stored, the (resized) data URL is returned instead.
+    """
+    relative_path = variant_file(get_image_cache(), image, variant)
+    url = static_image_url(relative_path) if relative_path else None
+    if url:
+        return url
+    return image if variant == "original" else variant_data_url(get_image_cache(), image, variant)
+
+# Card file of each image by content hash, most recently used last. Only the
+# short paths are kept, so reruns redrawing the same cards skip resizing and
+# storing them without holding on to the images
+CARD_FILES_MAX = 1024
+_card_files: "OrderedDict[str, str]" = OrderedDict()
+# Content hash of each temple's card image by (temple id, updated_at), so
+# reruns redrawing the same cards skip decoding and hashing the image too;
+# any edit bumps updated_at and so misses
+_card_digests: "OrderedDict[tuple, str]" = OrderedDict()
+_card_files_lock = threading.Lock()
+
+def _remember(entries: OrderedDict, key: Any, value: str) -> None:
+    with _card_files_lock:
+        entries[key] = value
+        while len(entries) > CARD_FILES_MAX:
+            entries.popitem(last=False)
+
+def card_image(image: str, temple: Optional[Dict] = None) -> str:
+    """Where the browser should load a temple image resized for its card from.
+
+    Pass the ``temple`` the image is the first of to skip hashing the image
+    while that temple is unchanged.
+    """
+    if not is_data_image(image):
+        return image
+    cache = get_image_cache()
+    identity = (str(temple['_id']), temple['updated_at']) if temple and temple.get('updated_at') else None
+    with _card_files_lock:
+        digest = _card_digests.get(identity) if identity else None
+        if digest is not None:
+            _card_digests.move_to_end(identity)
+    if digest is None:
+        try:
+            digest = ImageCache.content_hash(image_bytes(image))
+        except Exception:
+            return image
+        if identity:
+            _remember(_card_digests, identity, digest)
+    with _card_files_lock:
+        relative_path = _card_files.get(digest)
+        if relative_path is not None:
+            _card_files.move_to_end(digest)
+    # A file evicted from the image cache is written again
+    if relative_path is None or not cache.touch(relative_path):
+        relative_path = variant_file(cache, image, "card")
+        if relative_path is None:
+            return variant_data_url(cache, image, "card")
+        _remember(_card_files, digest, relative_path)
+    return static_image_url(relative_path) or variant_data_url(cache, image, "card")
+
+@st.cache_resource
+def start_snapshot_refresher(path: str, interval: float) -> threading.Thread:
+    """Keep the snapshot file in step with MongoDB from a background thread"""
+    def refresh_forever():
+        while True:
+            db = get_db()
+            if db is not None:
+                try:
+                    refresh_snapshot(db, path)
+                except Exception as e:
+                    print(f"Snapshot refresh failed: {e}")
+            sleep(interval)
+
+    thread = threading.Thread(target=refresh_forever, name="alayatales-snapshot", daemon=True)
+    thread.start()
+    return thread
+
 def is_valid_object_id(oid: str) -> bool:
     """Check if string is a valid ObjectId"""
     try:
@@ -100,6 +330,47 @@ def validate_document_size(document: Dict) -> bool:
     
     return True
 
+def unique_temple_slug(db, name: str, exclude_id: Optional[str] = None) -> str:
+    """Build a slug for a temple name that no other temple is using"""
+    base = generate_slug(name or '') or 'temple'
+    
+    # Anchored prefix regex so the lookup stays on the slug index
+    query = {"slug": {"$regex": f"^{re.escape(base)}(-[0-9]+)?$"}}
+    if exclude_id and is_valid_object_id(exclude_id):
+        query["_id"] = {"$ne": ObjectId(exclude_id)}
+    taken = {doc['slug'] for doc in db.temples.find(query, {"slug": 1})}
+    
+    if base not in taken:
+        return base
+    suffix = 2
+    while f"{base}-{suffix}" in taken:
+        suffix += 1
+    return f"{base}-{suffix}"
+
+def backfill_temple_slugs(db) -> int:
+    """Assign slugs to temples created before slugs existed"""
+    updated = 0
+    for _ in range(3):
+        # Slugs are picked locally against every slug in use, then written in batches
+        taken = {doc['slug'] for doc in db.temples.find({"slug": {"$type": "string"}}, {"slug": 1})}
+        
+        def next_slug(temple: Dict) -> Dict:
+            base = generate_slug(temple.get('name') or '') or 'temple'
+            slug, suffix = base, 2
+            while slug in taken:
+                slug, suffix = f"{base}-{suffix}", suffix + 1
+            taken.add(slug)
+            return {"slug": slug}
+        
+        try:
+            updated += set_each(db.temples, db.temples.find({"slug": {"$exists": False}}, {"name": 1}), next_slug)
+            break
+        except BulkWriteError as e:
+            # A temple created meanwhile claimed one of the slugs; the rest
+            # of the batch was written, retry whatever is still missing
+            updated += e.details.get("nModified", 0)
+    return updated
+
 # Temple Model Functions
 def create_temple(temple_data: Dict) -> Optional[str]:
     """Create a new temple"""
@@ -114,6 +385,8 @@ def create_temple(temple_data: Dict) -> Optional[str]:
         # Ensure timings is properly formatted
         if 'timings' not in temple_data:
             temple_data['timings'] = []
+        # Queryable copy of the opening hours
+        temple_data['open_intervals'] = timing_intervals(temple_data['timings'])
         
         # Ensure images is a list
         if 'images' not in temple_data:
@@ -121,29 +394,68 @@ def create_temple(temple_data: Dict) -> Optional[str]:
         elif not isinstance(temple_data['images'], list):
             temple_data['images'] = [temple_data['images']]
         
+        # Per-image width/height/LQIP, aligned with images
+        if 'image_meta' not in temple_data:
+            temple_data['image_meta'] = []
+        
+        # Indexed location fields used for filtering and facet counts
+        temple_data.update(normalize_location(temple_data.get('location', '')))
+        # Phonetic keys for spelling- and script-independent search
+        temple_data['search_keys'] = search_keys(temple_data.get('name', ''), temple_data.get('location', ''))
+        
         # Validate document size before inserting
         if not validate_document_size(temple_data):
             return None
         
-        result = db.temples.insert_one(temple_data)
-        return str(result.inserted_id)
+        # Retry on slug collisions caused by concurrent inserts of the same name
+        for attempt in range(3):
+            temple_data['slug'] = unique_temple_slug(db, temple_data.get('name', ''))
+            try:
+                result = db.temples.insert_one(temple_data)
+                clear_temple_caches()
+                return str(result.inserted_id)
+            except DuplicateKeyError:
+                temple_data.pop('_id', None)
+                if attempt == 2:
+                    raise
     except Exception as e:
         st.error(f"Error creating temple: {e}")
         return None
 
-def get_all_temples() -> List[Dict]:
-    """Get all temples"""
+# Every temple without its images, which are what makes documents large;
+# image_count says how many each has
+ALL_TEMPLES_PIPELINE = [
+    {"$addFields": {"image_count": {"$size": {"$ifNull": ["$images", []]}}}},
+    {"$project": {"images": 0}}
+]
+
+# One frozen copy for the current temple epoch, referenced by every session
+# instead of being copied into each rerun like st.cache_data would
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _shared_all_temples(epoch: int) -> Sequence[Mapping]:
+    temples = list(require_db().temples.aggregate(ALL_TEMPLES_PIPELINE))
+    # Convert ObjectId to string
+    for temple in temples:
+        temple['_id'] = str(temple['_id'])
+    return freeze(temples)
+
+def get_all_temples() -> Sequence[Mapping]:
+    """Get all temples, without images, shared read-only by every session.
+
+    ``image_count`` holds the number of images; fetch a temple by id for
+    the images themselves. Temples are ``MappingProxyType`` views with
+    tuples for lists; changing them raises ``TypeError``. Use
+    ``frozen.thaw`` for an editable copy.
+    """
     try:
-        db = get_db()
-        temples = list(db.temples.find())
-        # Convert ObjectId to string
-        for temple in temples:
-            temple['_id'] = str(temple['_id'])
-        return temples
+        return _shared_all_temples(get_collection_epoch("temples"))
+    except CircuitOpenError:
+        return freeze(from_snapshot(lambda snapshot: snapshot.all_temples(), []))
     except Exception as e:
         st.error(f"Error fetching temples: {e}")
-        return []
+        return ()
 
+@single_flight
 def get_temple_by_id(temple_id: str) -> Optional[Dict]:
     """Get temple by ID"""
     try:
@@ -155,8 +467,10 @@ def get_temple_by_id(temple_id: str) -> Optional[Dict]:
             
         db = get_db()
         if db is None:
-            st.error("Database connection failed")
-            return None
+            temple = from_snapshot(lambda snapshot: snapshot.temple(temple_id=temple_id), None)
+            if temple is None:
+                st.error("Database connection failed")
+            return temple
             
         # Debug information
         if st.session_state.get('debug_mode', False):
@@ -177,6 +491,21 @@ def get_temple_by_id(temple_id: str) -> Optional[Dict]:
             st.error(f"Debug: Exception details: {str(e)}")
         return None
 
+@single_flight
+def get_temple_by_slug(slug: str) -> Optional[Dict]:
+    """Get temple by its URL slug (single indexed lookup)"""
+    try:
+        db = get_db()
+        if db is None:
+            return from_snapshot(lambda snapshot: snapshot.temple(slug=slug), None)
+        temple = db.temples.find_one({"slug": slug})
+        if temple:
+            temple['_id'] = str(temple['_id'])
+        return temple
+    except Exception as e:
+        st.error(f"Error fetching temple: {e}")
+        return None
+
 def update_temple(temple_id: str, update_data: Dict) -> bool:
     """Update temple"""
     try:
@@ -188,12 +517,22 @@ def update_temple(temple_id: str, update_data: Dict) -> bool:
         
         # Remove _id if present in update data
         update_data.pop('_id', None)
+        # Slugs stay stable across edits so shared links keep working
+        update_data.pop('slug', None)
+        if 'location' in update_data:
+            update_data.update(normalize_location(update_data['location']))
+        if 'timings' in update_data:
+            update_data['open_intervals'] = timing_intervals(update_data['timings'])
         
         # Get current temple data to validate final document size
         current_temple = db.temples.find_one({"_id": ObjectId(temple_id)})
         if current_temple:
             # Merge current data with updates for size validation
             merged_data = {**current_temple, **update_data}
+            if 'name' in update_data or 'location' in update_data:
+                update_data['search_keys'] = merged_data['search_keys'] = search_keys(
+                    merged_data.get('name', ''), merged_data.get('location', '')
+                )
             if not validate_document_size(merged_data):
                 return False
         
@@ -201,6 +540,7 @@ def update_temple(temple_id: str, update_data: Dict) -> bool:
             {"_id": ObjectId(temple_id)},
             {"$set": update_data}
         )
+        clear_temple_caches()
         return result.modified_count > 0
     except Exception as e:
         st.error(f"Error updating temple: {e}")
@@ -211,29 +551,435 @@ def delete_temple(temple_id: str) -> bool:
     try:
         db = get_db()
         result = db.temples.delete_one({"_id": ObjectId(temple_id)})
+        clear_temple_caches()
         return result.deleted_count > 0
     except Exception as e:
         st.error(f"Error deleting temple: {e}")
         return False
 
+def phonetic_filter(query: str) -> Dict:
+    """MongoDB filter for temples whose name or location has every word of the query,
+    in any spelling or script ("Shree Meenatchi" matches "श्री मीनाक्षी")"""
+    keys = sorted({phonetic_key(word) for word in tokenize(query)})
+    return {"search_keys": {"$all": keys}} if keys else {"_id": None}
+
+# Fields a search query is matched against as plain text
+SEARCH_TEXT_FIELDS = ("name", "location", "description")
+
+def text_search_filter(query: str) -> Dict:
+    """MongoDB filter for temples containing the query text in a searchable field"""
+    pattern = re.escape(query)
+    return {"$or": [{field: {"$regex": pattern, "$options": "i"}} for field in SEARCH_TEXT_FIELDS]}
+
+def search_filter(query: str) -> Dict:
+    """MongoDB filter matching a search query against name, location or description"""
+    return {"$or": text_search_filter(query)["$or"] + [phonetic_filter(query)]}
+
+@st.cache_resource
+def get_search_cache() -> SearchCache:
+    """Search results shared by every session of this process"""
+    return SearchCache()
+
+def _search_row(temple: Dict) -> tuple:
+    text = FIELD_SEPARATOR.join(str(temple.get(field) or "").lower() for field in SEARCH_TEXT_FIELDS)
+    return str(temple['_id']), text
+
+@single_flight
+def search_temple_ids(query: str) -> List[str]:
+    """Ids of the temples matching a search query.
+
+    Results are cached per normalized query until the next temple write. A
+    query that extends a cached one is narrowed down from the cached text
+    instead of regex-scanning the collection again; only its phonetic keys
+    are looked up, through their index.
+    """
+    query = normalize_query(query)
+    if not query:
+        return []
+    db = require_db()
+    cache = get_search_cache()
+    epoch = get_collection_epoch("temples")
+    ids = cache.get(epoch, query)
+    if ids is not None:
+        return ids
+
+    rows = cache.refine(epoch, query)
+    if rows is None:
+        projection = {field: 1 for field in SEARCH_TEXT_FIELDS}
+        rows = [_search_row(temple) for temple in db.temples.find(text_search_filter(query), projection)]
+    phonetic_ids = [str(temple['_id']) for temple in db.temples.find(phonetic_filter(query), {"_id": 1})]
+    ids = list(dict.fromkeys([temple_id for temple_id, _ in rows] + phonetic_ids))
+    cache.put(epoch, query, ids, rows)
+    return ids
+
+def _temples_by_ids(db, ids: List[str], projection: Optional[Dict] = None) -> List[Dict]:
+    """Temples with the given ids, in the same order"""
+    cursor = db.temples.find({"_id": {"$in": [ObjectId(id) for id in ids]}}, projection)
+    temples = {str(temple['_id']): temple for temple in cursor}
+    ordered = []
+    for temple_id in ids:
+        if temple_id in temples:
+            temples[temple_id]['_id'] = temple_id
+            ordered.append(temples[temple_id])
+    return ordered
+
+def search_ids_filter(query: str) -> Dict:
+    """MongoDB filter selecting the temples ``search_temple_ids`` finds.
+
+    Paged lists filter with this instead of ``search_filter`` so they share
+    the search cache with the home page search. When the database is
+    unavailable the plain search filter is returned (it is answered from the
+    snapshot).
+    """
+    try:
+        ids = search_temple_ids(query)
+    except (CircuitOpenError, PyMongoError):
+        return search_filter(query)
+    return {"_id": {"$in": [ObjectId(id) for id in ids]}}
+
 def search_temples(query: str) -> List[Dict]:
     """Search temples by name or location"""
+    try:
+        ids = search_temple_ids(query)
+        return _temples_by_ids(require_db(), ids) if ids else []
+    except CircuitOpenError:
+        return from_snapshot(lambda snapshot: snapshot.search(query), [])
+    except Exception as e:
+        st.error(f"Error searching temples: {e}")
+        return []
+
+# Built once per collection epoch and shared by every session; the previous
+# epoch's index is kept until the new one replaces it
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _cached_fuzzy_index(epoch: int) -> FuzzyIndex:
+    cursor = require_db().temples.find({}, {"name": 1, "location": 1})
+    return FuzzyIndex(
+        (str(temple['_id']), temple.get('name', ''), temple.get('location', ''))
+        for temple in cursor
+    )
+
+def fuzzy_temple_ids(query: str, limit: int = 20) -> List[str]:
+    """Ids of temples whose name or location roughly matches ``query``, best first"""
+    return _cached_fuzzy_index(get_collection_epoch("temples")).search(query, limit)
+
+def fuzzy_search_filter(query: str, limit: int = 100) -> Optional[Dict]:
+    """MongoDB filter for the ``limit`` closest fuzzy matches of a search query.
+    
+    None when the fuzzy index cannot be built because the database is
+    unavailable; keep the plain search filter then (it is answered from the
+    snapshot).
+    """
+    try:
+        ids = fuzzy_temple_ids(query, limit)
+    except (CircuitOpenError, PyMongoError):
+        return None
+    return {"_id": {"$in": [ObjectId(id) for id in ids]}}
+
+def fuzzy_search_temples(query: str, limit: int = 20) -> List[Dict]:
+    """Typo-tolerant search over temple names and locations, best matches first"""
+    try:
+        ids = fuzzy_temple_ids(query, limit)
+        return _temples_by_ids(require_db(), ids, TEMPLE_CARD_PROJECTION) if ids else []
+    except CircuitOpenError:
+        return from_snapshot(lambda snapshot: snapshot.search(query, limit), [])
+    except Exception as e:
+        st.error(f"Error searching temples: {e}")
+        return []
+
+# Only what a temple card shows; the first image is enough for the thumbnail
+TEMPLE_CARD_PROJECTION = {
+    "name": 1,
+    "slug": 1,
+    "location": 1,
+    "description": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "images": {"$slice": 1},
+    "image_meta": {"$slice": 1}
+}
+
+TEMPLE_SORTS = {
+    "Name": [("name", 1)],
+    "Location": [("location", 1)],
+    "Recently Added": [("created_at", -1)]
+}
+
+# Public pages serve the last good result at once and refresh it in the
+# background: (soft TTL, hard TTL) in seconds per kind of data
+TEMPLE_LIST_TTLS = (30, 600)
+STATS_TTLS = (60, 3600)
+HIGHLIGHT_TTLS = (300, 3600)
+
+@stale_while_revalidate("temple list", *TEMPLE_LIST_TTLS, max_entries=64)
+@single_flight
+def _temples_page(filters: Dict, sort_by: str, skip: int, limit: int) -> List[Dict]:
+    cursor = require_db().temples.find(filters, TEMPLE_CARD_PROJECTION)
+    cursor = cursor.sort(TEMPLE_SORTS.get(sort_by, TEMPLE_SORTS["Name"]) + [("_id", 1)])
+    temples = list(cursor.skip(skip).limit(limit))
+    for temple in temples:
+        temple['_id'] = str(temple['_id'])
+    return temples
+
+def get_temples_page(filters: Optional[Dict] = None, sort_by: str = "Name",
+                     skip: int = 0, limit: int = 12) -> List[Dict]:
+    """Get one window of temple cards, sorted and limited on the server"""
+    try:
+        return _temples_page(filters or {}, sort_by, skip, limit)
+    except CircuitOpenError:
+        return from_snapshot(lambda snapshot: snapshot.temples_page(filters, sort_by, skip, limit), [])
+    except Exception as e:
+        st.error(f"Error fetching temples: {e}")
+        return []
+
+def nearby_temples_pipeline(lat: float, lon: float, radius_km: float, limit: int) -> List[Dict]:
+    """Nearest temple cards first, each with its ``distance_m``"""
+    return [
+        {"$geoNear": {
+            "near": geo_point(lat, lon),
+            "key": "geo",
+            "distanceField": "distance_m",
+            "maxDistance": radius_km * 1000,
+            "spherical": True
+        }},
+        {"$limit": limit},
+        {"$project": {
+            "name": 1,
+            "slug": 1,
+            "location": 1,
+            "description": 1,
+            "created_at": 1,
+            "updated_at": 1,
+            "distance_m": 1,
+            "images": {"$slice": ["$images", 1]},
+            "image_meta": {"$slice": ["$image_meta", 1]}
+        }}
+    ]
+
+@single_flight
+def find_temples_near(lat: float, lon: float, radius_km: float = 50, limit: int = 6) -> List[Dict]:
+    """Get temple cards within ``radius_km`` of a point, nearest first.
+
+    Served by the ``geo`` 2dsphere index; temples without coordinates are
+    never returned. Each card gets a ``distance_km``.
+    """
     try:
         db = get_db()
-        temples = list(db.temples.find({
-            "$or": [
-                {"name": {"$regex": query, "$options": "i"}},
-                {"location": {"$regex": query, "$options": "i"}},
-                {"description": {"$regex": query, "$options": "i"}}
-            ]
-        }))
+        if db is None:
+            return []
+        temples = list(db.temples.aggregate(nearby_temples_pipeline(lat, lon, radius_km, limit)))
         for temple in temples:
             temple['_id'] = str(temple['_id'])
+            temple['distance_km'] = temple.pop('distance_m') / 1000
         return temples
     except Exception as e:
-        st.error(f"Error searching temples: {e}")
+        st.error(f"Error finding nearby temples: {e}")
+        return []
+
+# Clusters per tile side; a 256 px tile is split into 64 px cells
+TILE_CLUSTER_CELLS = 4
+
+def tile_clusters_pipeline(zoom: int, x: int, y: int) -> List[Dict]:
+    """Temples in one map tile grouped into grid cells, with counts and centroids"""
+    bounds = tile_bounds(zoom, x, y)
+    cell_width = (bounds["east"] - bounds["west"]) / TILE_CLUSTER_CELLS
+    cell_height = (bounds["north"] - bounds["south"]) / TILE_CLUSTER_CELLS
+    lon = {"$arrayElemAt": ["$geo.coordinates", 0]}
+    lat = {"$arrayElemAt": ["$geo.coordinates", 1]}
+    
+    # Polygon edges are geodesics, not parallels, so the indexed match uses a
+    # padded polygon and the exact tile edges are applied afterwards
+    pad_lon, pad_lat = cell_width * 2, cell_height * 2
+    west, east = max(bounds["west"] - pad_lon, -180), min(bounds["east"] + pad_lon, 180)
+    south, north = max(bounds["south"] - pad_lat, -89), min(bounds["north"] + pad_lat, 89)
+    polygon = {"type": "Polygon", "coordinates": [[
+        [west, south], [east, south], [east, north], [west, north], [west, south]
+    ]]}
+    
+    return [
+        {"$match": {"geo": {"$geoWithin": {"$geometry": polygon}}}},
+        {"$match": {
+            "geo.coordinates.0": {"$gte": bounds["west"], "$lt": bounds["east"]},
+            "geo.coordinates.1": {"$gte": bounds["south"], "$lt": bounds["north"]}
+        }},
+        {"$group": {
+            "_id": {
+                "x": {"$floor": {"$divide": [{"$subtract": [lon, bounds["west"]]}, cell_width]}},
+                "y": {"$floor": {"$divide": [{"$subtract": [bounds["north"], lat]}, cell_height]}}
+            },
+            "count": {"$sum": 1},
+            "lat": {"$avg": lat},
+            "lon": {"$avg": lon},
+            # Enough to link a cell holding a single temple
+            "temple_id": {"$first": "$_id"},
+            "name": {"$first": "$name"},
+            "slug": {"$first": "$slug"}
+        }}
+    ]
+
+@st.cache_data(max_entries=4096, show_spinner=False)
+def _cached_tile_clusters(zoom: int, x: int, y: int, epoch: int) -> List[Dict]:
+    clusters = []
+    for cell in require_db().temples.aggregate(tile_clusters_pipeline(zoom, x, y)):
+        cluster = {"lat": cell["lat"], "lon": cell["lon"], "count": cell["count"]}
+        if cell["count"] == 1:
+            cluster.update({"_id": str(cell["temple_id"]), "name": cell.get("name"), "slug": cell.get("slug")})
+        clusters.append(cluster)
+    return clusters
+
+def get_map_clusters(lat: float, lon: float, zoom: int) -> List[Dict]:
+    """Get temple clusters for the map viewport centred on a point.
+
+    Each cluster has ``lat``/``lon`` (centroid) and ``count``; single-temple
+    clusters also carry the temple's ``_id``, ``name`` and ``slug``. The
+    result size depends on the viewport, not on the number of temples.
+    Clusters are cached per tile until the next temple write.
+    """
+    try:
+        epoch = get_collection_epoch("temples")
+        clusters = []
+        for tile in viewport_tiles(lat, lon, zoom):
+            clusters.extend(_cached_tile_clusters(*tile, epoch))
+        return clusters
+    except Exception as e:
+        st.error(f"Error loading map: {e}")
+        return []
+
+@stale_while_revalidate("temple count", *TEMPLE_LIST_TTLS, max_entries=256)
+@single_flight
+def _count_temples(filters: Dict) -> int:
+    return require_db().temples.count_documents(filters)
+
+def count_temples(filters: Optional[Dict] = None) -> int:
+    """Count temples matching a filter"""
+    try:
+        return _count_temples(filters or {})
+    except CircuitOpenError:
+        return from_snapshot(lambda snapshot: snapshot.count_temples(filters), 0)
+    except Exception as e:
+        st.error(f"Error counting temples: {e}")
+        return 0
+
+# Write counters per collection; caches of derived data are keyed by them so
+# a write in any process invalidates every process's copy
+EPOCH_COLLECTION = "_epochs"
+
+# Last epoch read per collection; while the database is unreachable, caches
+# keyed by it keep serving what they hold
+_last_epochs: Dict[str, int] = {}
+
+@single_flight
+def get_collection_epoch(name: str) -> int:
+    """Get the write counter of a collection"""
+    try:
+        doc = require_db()[EPOCH_COLLECTION].find_one({"_id": name})
+    except (CircuitOpenError, PyMongoError):
+        if name in _last_epochs:
+            return _last_epochs[name]
+        raise
+    _last_epochs[name] = doc.get("epoch", 0) if doc else 0
+    return _last_epochs[name]
+
+def bump_collection_epoch(db, name: str) -> None:
+    db[EPOCH_COLLECTION].update_one({"_id": name}, {"$inc": {"epoch": 1}}, upsert=True)
+
+# Facet name -> the location fields it groups by, from the country down
+TEMPLE_FACET_LEVELS = {
+    "countries": ("country",),
+    "states": ("country", "state"),
+    "cities": ("country", "state", "city")
+}
+
+# Every location facet in a single aggregation
+TEMPLE_FACETS_PIPELINE = [
+    {"$project": {"country": 1, "state": 1, "city": 1}},
+    {"$facet": {
+        **{
+            name: [
+                {"$match": {levels[-1]: {"$nin": [None, ""]}}},
+                {"$group": {"_id": {level: f"${level}" for level in levels}, "count": {"$sum": 1}}}
+            ]
+            for name, levels in TEMPLE_FACET_LEVELS.items()
+        },
+        "total": [{"$count": "count"}]
+    }}
+]
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _cached_temple_facets(epoch: int) -> Dict:
+    result = next(require_db().temples.aggregate(TEMPLE_FACETS_PIPELINE), {})
+    facets = {"total": result["total"][0]["count"] if result.get("total") else 0}
+    for name, levels in TEMPLE_FACET_LEVELS.items():
+        items = []
+        for item in result.get(name, []):
+            values = [item["_id"].get(level) for level in levels]
+            # Cities read better with their state ("Madurai, Tamil Nadu")
+            label = ", ".join(value for value in values[:0:-1] if value) or values[0]
+            items.append({"value": region_path(*values), "label": label, "count": item["count"]})
+        facets[name] = sorted(items, key=lambda item: (-item["count"], item["label"]))
+    return facets
+
+def get_temple_facets() -> Dict:
+    """Get distinct countries, states and cities with their temple counts.
+
+    Each facet is a list of ``{'value', 'label', 'count'}`` sorted by count,
+    where ``value`` is the region path to pass to ``locations.region_filter``.
+    Cached until the next temple write.
+    """
+    try:
+        return _cached_temple_facets(get_collection_epoch("temples"))
+    except Exception as e:
+        st.error(f"Error fetching locations: {e}")
+        return {"total": 0, "countries": [], "states": [], "cities": []}
+
+# Featured/recent lists are shared by every session; writes clear them so this
+# process shows changes immediately, other processes within the soft TTL
+def _recent_cards(db, filters: Dict, n: int) -> List[Dict]:
+    cursor = db.temples.find(filters, TEMPLE_CARD_PROJECTION).sort([("created_at", -1), ("_id", 1)])
+    temples = list(cursor.limit(n))
+    for temple in temples:
+        temple['_id'] = str(temple['_id'])
+    return temples
+
+@stale_while_revalidate("featured temples", *HIGHLIGHT_TTLS)
+def _cached_featured_temples(n: int) -> List[Dict]:
+    db = require_db()
+    # Curated temples first, topped up with the newest ones
+    temples = _recent_cards(db, {"featured": True}, n)
+    if len(temples) < n:
+        temples += _recent_cards(db, {"featured": {"$ne": True}}, n - len(temples))
+    return temples
+
+@stale_while_revalidate("recent temples", *HIGHLIGHT_TTLS)
+def _cached_recent_temples(n: int) -> List[Dict]:
+    return _recent_cards(require_db(), {}, n)
+
+def get_featured_temples(n: int = 6) -> List[Dict]:
+    """Get up to ``n`` temple cards for the home page, curated ones first"""
+    try:
+        return _cached_featured_temples(n)
+    except CircuitOpenError:
+        return from_snapshot(lambda snapshot: snapshot.recent_temples(n, featured_first=True), [])
+    except Exception as e:
+        st.error(f"Error fetching featured temples: {e}")
         return []
 
+def get_recent_temples(n: int = 5) -> List[Dict]:
+    """Get the ``n`` most recently added temple cards"""
+    try:
+        return _cached_recent_temples(n)
+    except CircuitOpenError:
+        return from_snapshot(lambda snapshot: snapshot.recent_temples(n), [])
+    except Exception as e:
+        st.error(f"Error fetching recent temples: {e}")
+        return []
+
+def clear_temple_caches() -> None:
+    """Invalidate cached temple data after a write"""
+    for cached in (_cached_featured_temples, _cached_recent_temples, _temples_page, _count_temples,
+                   _temple_stats, _count_temple_images):
+        cached.clear()
+    bump_collection_epoch(get_db(), "temples")
+
 # User Model Functions
 def create_user(user_data: Dict) -> Optional[str]:
     """Create a new user"""
@@ -296,6 +1042,7 @@ def update_user(user_id: str, update_data: Dict) -> bool:
         st.error(f"Error updating user: {e}")
         return False
 
+@single_flight
 def get_all_users() -> List[Dict]:
     """Get all users (admin function)"""
     try:
@@ -321,6 +1068,75 @@ def delete_user(user_id: str) -> bool:
         return False
 
 # Temple Timing Helper Functions
+MINUTES_PER_DAY = 24 * 60
+
+# Formats found in stored timings, the first one is what the forms write
+TIMING_FORMATS = ["%I:%M %p", "%I:%M%p", "%I %p", "%H:%M", "%H.%M"]
+
+# (opening key, closing key) of each daily session in a schedule
+TIMING_SESSIONS = [("morningOpening", "morningClosing"), ("eveningOpening", "eveningClosing")]
+
+@lru_cache(maxsize=4096)
+def parse_clock(text: str) -> Optional[int]:
+    """Minutes since midnight for a time string such as "06:00 AM" (cached)"""
+    text = (text or '').strip().upper()
+    for timing_format in TIMING_FORMATS:
+        try:
+            parsed = datetime.strptime(text, timing_format)
+        except ValueError:
+            continue
+        return parsed.hour * 60 + parsed.minute
+    return None
+
+def clock_time(text: str, default: str) -> time:
+    """``datetime.time`` for a stored time string, falling back to ``default``"""
+    minutes = parse_clock(text)
+    if minutes is None:
+        minutes = parse_clock(default)
+    return time(minutes // 60, minutes % 60)
+
+def timing_schedules(timings) -> List[Dict]:
+    """Stored timings as a list of schedules (older documents hold a single dict)"""
+    if isinstance(timings, dict):
+        return [timings]
+    return timings or []
+
+def timing_intervals(timings: List[Dict]) -> List[Dict]:
+    """Opening hours as ``{'open', 'close'}`` minutes-since-midnight intervals.
+    
+    Sessions past midnight are split in two; unparseable sessions are skipped.
+    """
+    intervals = []
+    for timing in timing_schedules(timings):
+        for open_key, close_key in TIMING_SESSIONS:
+            opens, closes = parse_clock(timing.get(open_key)), parse_clock(timing.get(close_key))
+            if opens is None or closes is None or opens == closes:
+                continue
+            if closes > opens:
+                intervals.append({"open": opens, "close": closes})
+            else:
+                intervals.append({"open": opens, "close": MINUTES_PER_DAY})
+                intervals.append({"open": 0, "close": closes})
+    return intervals
+
+def open_at_filter(minute: int) -> Dict:
+    """MongoDB filter for temples open at a minute of the day"""
+    return {"open_intervals": {"$elemMatch": {"open": {"$lte": minute}, "close": {"$gt": minute}}}}
+
+def current_minute() -> int:
+    """Minute of the day in the temples' timezone (``TEMPLE_TIMEZONE``)"""
+    now = datetime.now(ZoneInfo(get_config('TEMPLE_TIMEZONE', 'Asia/Kolkata')))
+    return now.hour * 60 + now.minute
+
+def is_open_at(temple: Dict, minute: int) -> Optional[bool]:
+    """Whether a temple is open at a minute of the day (None if its hours are unknown)"""
+    intervals = temple.get('open_intervals')
+    if intervals is None:
+        intervals = timing_intervals(temple.get('timings', []))
+    if not intervals:
+        return None
+    return any(interval['open'] <= minute < interval['close'] for interval in intervals)
+
 def format_timing(timing: Dict) -> str:
     """Format timing dictionary to readable string"""
     morning = f"{timing.get('morningOpening', 'N/A')} - {timing.get('morningClosing', 'N/A')}"
@@ -350,44 +1166,55 @@ def parse_timing_string(timing_str: str) -> Dict:
         }
 
 # Statistics Functions (for admin dashboard)
+IMAGE_COUNT_PIPELINE = [
+    {"$group": {"_id": None, "count": {"$sum": {"$size": {"$ifNull": ["$images", []]}}}}}
+]
+
+@stale_while_revalidate("stats", *STATS_TTLS)
+@single_flight
+def _temple_stats() -> Dict:
+    db = require_db()
+    return {
+        "total_temples": db.temples.count_documents({}),
+        "total_users": db.users.count_documents({}),
+        "admin_users": db.users.count_documents({"role": "admin"})
+    }
+
 def get_temple_stats() -> Dict:
     """Get temple statistics"""
     try:
-        db = get_db()
-        if db is None:
-            return {
-                "total_temples": 0,
-                "total_users": 0,
-                "admin_users": 0,
-                "temples_by_location": []
-            }
-            
-        total_temples = db.temples.count_documents({})
-        total_users = db.users.count_documents({})
-        admin_users = db.users.count_documents({"role": "admin"})
-        
-        # Get temples by location
-        temples_by_location = list(db.temples.aggregate([
-            {"$group": {"_id": "$location", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": 5}
-        ]))
-        
+        return _temple_stats()
+    except CircuitOpenError:
+        # The snapshot only holds temples
         return {
-            "total_temples": total_temples,
-            "total_users": total_users,
-            "admin_users": admin_users,
-            "temples_by_location": temples_by_location
+            "total_temples": from_snapshot(lambda snapshot: snapshot.count_temples(), 0),
+            "total_users": 0,
+            "admin_users": 0
         }
     except Exception as e:
         st.error(f"Error fetching statistics: {e}")
         return {
             "total_temples": 0,
             "total_users": 0,
-            "admin_users": 0,
-            "temples_by_location": []
+            "admin_users": 0
         }
 
+@stale_while_revalidate("image count", *STATS_TTLS)
+@single_flight
+def _count_temple_images() -> int:
+    result = list(require_db().temples.aggregate(IMAGE_COUNT_PIPELINE))
+    return result[0]['count'] if result else 0
+
+def count_temple_images() -> int:
+    """Count images across all temples without loading them"""
+    try:
+        return _count_temple_images()
+    except CircuitOpenError:
+        return from_snapshot(lambda snapshot: snapshot.image_count(), 0)
+    except Exception as e:
+        st.error(f"Error counting images: {e}")
+        return 0
+
 def create_sample_temples() -> bool:
     """Create sample temples for testing"""
     try:
@@ -403,6 +1230,7 @@ def create_sample_temples() -> bool:
             {
                 "name": "Golden Temple",
                 "location": "Amritsar, Punjab",
+                "geo": geo_point(31.6200, 74.8765),
                 "description": "The Golden Temple, also known as Harmandir Sahib, is a gurdwara located in the city of Amritsar, Punjab, India. It is the holiest gurdwara and the most important pilgrimage site of Sikhism.",
                 "images": ["https://via.placeholder.com/400x300?text=Golden+Temple"],
                 "created_at": datetime.utcnow(),
@@ -411,6 +1239,7 @@ def create_sample_temples() -> bool:
             {
                 "name": "Meenakshi Temple",
                 "location": "Madurai, Tamil Nadu",
+                "geo": geo_point(9.9195, 78.1193),
                 "description": "Meenakshi Temple is a historic Hindu temple located on the southern bank of the Vaigai River in the temple city of Madurai, Tamil Nadu, India.",
                 "images": ["https://via.placeholder.com/400x300?text=Meenakshi+Temple"],
                 "created_at": datetime.utcnow(),
@@ -419,6 +1248,7 @@ def create_sample_temples() -> bool:
             {
                 "name": "Lotus Temple",
                 "location": "New Delhi",
+                "geo": geo_point(28.5535, 77.2588),
                 "description": "The Lotus Temple, located in Delhi, India, is a Baháʼí House of Worship that was dedicated in December 1986. Notable for its flowerlike shape, it has become a prominent attraction in the city.",
                 "images": ["https://via.placeholder.com/400x300?text=Lotus+Temple"],
                 "created_at": datetime.utcnow(),
@@ -426,8 +1256,17 @@ def create_sample_temples() -> bool:
             }
         ]
         
-        result = db.temples.insert_many(sample_temples)
-        return len(result.inserted_ids) > 0
+        inserted = 0
+        for temple in sample_temples:
+            temple.update(normalize_location(temple['location']))
+            temple['search_keys'] = search_keys(temple['name'], temple['location'])
+            # One at a time, so each slug sees the ones inserted before it
+            temple['slug'] = unique_temple_slug(db, temple['name'])
+            db.temples.insert_one(temple)
+            inserted += 1
+        
+        clear_temple_caches()
+        return inserted > 0
         
     except Exception as e:
         st.error(f"Error creating sample temples: {e}")
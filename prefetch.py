@@ -0,0 +1,90 @@
+"""
+Prefetching of independent page queries
+
+Pages declare the data they need up front as named queries and ``prefetch``
+starts them all at once, so their database round trips overlap instead of
+adding up. Each query is a callable run on a shared thread pool.
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from circuit import CircuitOpenError
+
+PREFETCH_WORKERS = 8
+DEFAULT_DEADLINE_SECONDS = 10.0
+
+Query = Callable[[], Any]
+
+@st.cache_resource
+def get_executor() -> ThreadPoolExecutor:
+    """Thread pool shared by all sessions"""
+    return ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="alayatales-prefetch")
+
+def submit(query: Query) -> Future:
+    """Start ``query`` on the shared pool with the calling session's context"""
+    # Model functions report errors with st.error and read st.session_state;
+    # both need the calling session's context in the worker thread
+    ctx = get_script_run_ctx()
+
+    def run() -> Any:
+        thread = threading.current_thread()
+        add_script_run_ctx(thread, ctx)
+        try:
+            return query()
+        finally:
+            # Workers are shared, don't leak this session into the next query
+            add_script_run_ctx(thread, None)
+
+    return get_executor().submit(run)
+
+def prefetch(queries: Dict[str, Query], defaults: Optional[Dict[str, Any]] = None,
+             deadline: float = DEFAULT_DEADLINE_SECONDS) -> Dict[str, Any]:
+    """Run named queries in parallel and return their results by name.
+
+    Queries still running after ``deadline`` seconds are cancelled (queued
+    work is dropped; running queries finish in the background).
+    A failed or cancelled query is reported with ``st.error`` and replaced by
+    its entry in ``defaults`` (or None). Each query's duration in milliseconds
+    is recorded in ``st.session_state.query_timings``.
+    """
+    defaults = defaults or {}
+    started = time.perf_counter()
+    elapsed: Dict[str, float] = {}
+
+    futures = {}
+    for name, query in queries.items():
+        future = submit(query)
+        # Runs in the worker thread as soon as this query finishes
+        future.add_done_callback(
+            lambda _, name=name: elapsed.setdefault(name, (time.perf_counter() - started) * 1000)
+        )
+        futures[name] = future
+
+    _, pending = wait(futures.values(), timeout=deadline)
+    for future in pending:
+        future.cancel()
+
+    results = {}
+    timings = st.session_state.setdefault('query_timings', {})
+    for name, future in futures.items():
+        if future in pending:
+            error = f"timed out after {deadline:g} s"
+            timings[name] = deadline * 1000
+        else:
+            error = future.exception()
+            timings[name] = elapsed.get(name, (time.perf_counter() - started) * 1000)
+
+        if error:
+            # Read-only mode is announced once for the whole page
+            if not isinstance(error, CircuitOpenError):
+                st.error(f"Error loading {name.replace('_', ' ')}: {error}")
+            results[name] = defaults.get(name)
+        else:
+            results[name] = future.result()
+    return results
@@ -0,0 +1,147 @@
+"""
+Stale-while-revalidate caching for public reads
+
+A result younger than its soft TTL is served as is. Between the soft and the
+hard TTL the last good result is still served immediately, and a background
+thread fetches a new one for the next caller. Only results older than the
+hard TTL (or missing) make the caller wait for the database. A failed
+background refresh keeps the old result until its hard TTL runs out; after
+that, if the database still fails, the expired result is served rather than
+nothing.
+
+Results live in the backend set with ``set_backend`` (see
+``cache_backends``), so with a disk or Redis backend every process and
+replica shares them and a fresh deploy starts warm.
+"""
+
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+from cache_backends import MemoryBackend, deserialize, serialize
+
+REFRESH_WORKERS = 2
+
+# Results are kept this long past their hard TTL, to be served while the
+# database is down
+EXPIRED_GRACE_SECONDS = 24 * 3600
+
+_executor = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix="alayatales-revalidate")
+_backend = MemoryBackend()
+
+def set_backend(backend) -> None:
+    """Store every namespace's results in ``backend`` from now on"""
+    global _backend
+    _backend = backend
+
+# Namespace -> counters: fresh/stale/miss calls, expired results served
+# because the database failed, refreshes and failed refreshes, backend
+# errors, and how far past its soft TTL the stalest served result was (seconds)
+_metrics: Dict[str, Dict[str, float]] = {}
+_metrics_lock = threading.Lock()
+
+def _count(namespace: str, counter: str, amount: float = 1) -> None:
+    with _metrics_lock:
+        counters = _metrics.setdefault(namespace, {
+            "fresh": 0, "stale": 0, "miss": 0, "expired": 0, "refreshes": 0, "refresh_errors": 0,
+            "backend_errors": 0, "max_stale_seconds": 0.0
+        })
+        if counter == "max_stale_seconds":
+            counters[counter] = max(counters[counter], amount)
+        else:
+            counters[counter] += amount
+
+def metrics() -> Dict[str, Dict[str, float]]:
+    """Snapshot of the counters of every namespace"""
+    with _metrics_lock:
+        return {namespace: dict(counters) for namespace, counters in _metrics.items()}
+
+def stale_while_revalidate(namespace: str, soft_ttl: float, hard_ttl: float,
+                           max_entries: int = 128) -> Callable:
+    """Cache a read function's results per arguments with soft and hard TTLs.
+
+    The function must raise on failure rather than return a fallback, so a
+    failure is never cached as a good result. Every caller gets its own copy.
+    At most ``max_entries`` results of this namespace are kept. The decorated
+    function gains ``clear()`` to drop every cached result.
+    """
+    def decorator(func: Callable) -> Callable:
+        refreshing = set()
+        lock = threading.Lock()
+        # Bumped by clear(), so a refresh started before it cannot store
+        # a result read before the write that caused it
+        generation = [0]
+
+        def load(key: str):
+            """(result, fetched at) from the backend, or None"""
+            try:
+                data = _backend.get(namespace, key)
+                return deserialize(data) if data is not None else None
+            except Exception:
+                # An unreachable cache is a miss, not an error
+                _count(namespace, "backend_errors")
+                return None
+
+        def store(key: str, result, started_generation: int) -> None:
+            if started_generation != generation[0]:
+                return
+            try:
+                data = serialize((result, time.time()), binary=_backend.binary)
+                _backend.set(namespace, key, data, hard_ttl + EXPIRED_GRACE_SECONDS, max_entries)
+            except Exception:
+                _count(namespace, "backend_errors")
+
+        def refresh(key: str, args: tuple, kwargs: dict, started_generation: int) -> None:
+            try:
+                store(key, func(*args, **kwargs), started_generation)
+                _count(namespace, "refreshes")
+            except Exception:
+                _count(namespace, "refresh_errors")
+            finally:
+                with lock:
+                    refreshing.discard(key)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = repr((args, sorted(kwargs.items())))
+            started_generation = generation[0]
+            entry = load(key)
+            age = time.time() - entry[1] if entry else None
+
+            if age is not None and age < soft_ttl:
+                _count(namespace, "fresh")
+                return entry[0]
+            if age is not None and age < hard_ttl:
+                _count(namespace, "stale")
+                _count(namespace, "max_stale_seconds", age - soft_ttl)
+                with lock:
+                    start_refresh = key not in refreshing
+                    refreshing.add(key)
+                if start_refresh:
+                    _executor.submit(refresh, key, args, kwargs, started_generation)
+                return entry[0]
+
+            _count(namespace, "miss")
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                # Database unavailable: an outdated result beats none at all
+                if entry is None:
+                    raise
+                _count(namespace, "expired")
+                return entry[0]
+            store(key, result, started_generation)
+            return result
+
+        def clear() -> None:
+            generation[0] += 1
+            try:
+                _backend.clear(namespace)
+            except Exception:
+                _count(namespace, "backend_errors")
+
+        wrapper.clear = clear
+        return wrapper
+    return decorator
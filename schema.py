@@ -0,0 +1,287 @@
+"""
+Versioned database schema: a declarative index manifest plus one-time migrations
+
+Migrations are applied once per deployment and recorded in the ``_schema``
+collection, so regular page loads only need to compare version numbers.
+"""
+
+import contextvars
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+SCHEMA_COLLECTION = "_schema"
+VERSION_DOC_ID = "version"
+LOCK_DOC_ID = "migration_lock"
+LOCK_TTL = timedelta(minutes=5)
+# Long backfills renew the lock between batches, at most this often
+LOCK_RENEW_SECONDS = LOCK_TTL.total_seconds() / 5
+
+# Backfills write this many documents per round trip
+BATCH_SIZE = 500
+
+class MigrationInProgress(RuntimeError):
+    """Another process held the migration lock for longer than we waited"""
+
+# Set by ``migrate`` while it holds the lock, so batched backfills can keep
+# it from expiring halfway through a long step
+_lock_keeper: contextvars.ContextVar = contextvars.ContextVar("lock_keeper", default=None)
+
+def keep_lock() -> None:
+    """Renew the migration lock held by this thread, if any and when due"""
+    keeper = _lock_keeper.get()
+    if keeper is not None:
+        keeper()
+
+# Every index the application relies on, each tagged with the migration that
+# creates it. Adding one requires a new migration entry below so existing
+# deployments pick the change up.
+INDEX_MANIFEST: List[Dict] = [
+    {
+        "collection": "users",
+        "keys": [("email", ASCENDING)],
+        "options": {"unique": True},
+        "since": 1,
+    },
+    {
+        "collection": "temples",
+        "keys": [("name", ASCENDING)],
+        "options": {},
+        "since": 1,
+    },
+    {
+        # Slugs are optional on legacy documents, so only index the ones that exist
+        "collection": "temples",
+        "keys": [("slug", ASCENDING)],
+        "options": {"unique": True, "partialFilterExpression": {"slug": {"$type": "string"}}},
+        "since": 1,
+    },
+    {
+        # Recent temples: sorted by creation date and limited on the server
+        "collection": "temples",
+        "keys": [("created_at", DESCENDING)],
+        "options": {},
+        "since": 4,
+    },
+    {
+        # Curated featured temples are few, so keep their index small
+        "collection": "temples",
+        "keys": [("featured", ASCENDING), ("created_at", DESCENDING)],
+        "options": {"partialFilterExpression": {"featured": True}},
+        "since": 4,
+    },
+    {
+        "collection": "temples",
+        "keys": [("location_key", ASCENDING)],
+        "options": {},
+        "since": 6,
+    },
+    {
+        # Region filter on the temple list: a state or country is a key range
+        "collection": "temples",
+        "keys": [("region_path", ASCENDING)],
+        "options": {},
+        "since": 8,
+    },
+    {
+        # Nearby search; temples without coordinates are left out of the index
+        "collection": "temples",
+        "keys": [("geo", GEOSPHERE)],
+        "options": {},
+        "since": 9,
+    },
+    {
+        # "Open at" filter: both bounds of one interval via $elemMatch
+        "collection": "temples",
+        "keys": [("open_intervals.open", ASCENDING), ("open_intervals.close", ASCENDING)],
+        "options": {},
+        "since": 11,
+    },
+    {
+        # Cross-script search: one multikey lookup per phonetic key
+        "collection": "temples",
+        "keys": [("search_keys", ASCENDING)],
+        "options": {},
+        "since": 13,
+    },
+]
+
+def sync_indexes(db, version: Optional[int] = None) -> None:
+    """Create the manifest's indexes, or only those of migration ``version``
+    (no-op for indexes that already exist)"""
+    for index in INDEX_MANIFEST:
+        if version is None or index["since"] == version:
+            db[index["collection"]].create_index(index["keys"], **index["options"])
+
+def index_step(version: int) -> Callable:
+    """Migration that creates the indexes introduced by ``version``"""
+    def create_indexes(db) -> None:
+        sync_indexes(db, version)
+    return create_indexes
+
+def set_each(collection, documents, compute: Callable[[Dict], Dict]) -> int:
+    """``$set`` ``compute(document)`` on every document, BATCH_SIZE per round trip"""
+    batch = []
+    written = 0
+    for document in documents:
+        batch.append(UpdateOne({"_id": document["_id"]}, {"$set": compute(document)}))
+        if len(batch) >= BATCH_SIZE:
+            written += collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+            keep_lock()
+    if batch:
+        written += collection.bulk_write(batch, ordered=False).modified_count
+    return written
+
+def backfill_slugs(db) -> None:
+    """Give legacy temples a URL slug"""
+    from models import backfill_temple_slugs
+    backfill_temple_slugs(db)
+
+def backfill_locations(db, filters: Optional[Dict] = None) -> None:
+    """Derive the normalized location fields of existing temples"""
+    from locations import normalize_location
+    if filters is None:
+        filters = {"location_key": {"$exists": False}}
+    set_each(db.temples, db.temples.find(filters, {"location": 1}),
+             lambda temple: normalize_location(temple.get('location', '')))
+
+def reparse_locations(db) -> None:
+    """Re-derive every temple's location fields with the current dictionary"""
+    backfill_locations(db, {})
+
+def backfill_open_intervals(db) -> None:
+    """Convert existing timing strings into queryable opening intervals"""
+    from models import timing_intervals
+    set_each(db.temples, db.temples.find({"open_intervals": {"$exists": False}}, {"timings": 1}),
+             lambda temple: {"open_intervals": timing_intervals(temple.get('timings', []))})
+
+def backfill_search_keys(db) -> None:
+    """Compute phonetic search keys for existing temples"""
+    from search import search_keys
+    set_each(db.temples, db.temples.find({"search_keys": {"$exists": False}}, {"name": 1, "location": 1}),
+             lambda temple: {"search_keys": search_keys(temple.get('name', ''), temple.get('location', ''))})
+
+def backfill_image_meta(db) -> None:
+    """Store width/height and a low-quality placeholder for existing base64 images"""
+    from utils import image_placeholder_from_data_url
+    set_each(db.temples, db.temples.find({"image_meta": {"$exists": False}}, {"images": 1}), lambda temple: {
+        "image_meta": [
+            image_placeholder_from_data_url(image) if image.startswith('data:image') else None
+            for image in temple.get('images', [])
+        ]
+    })
+
+# Ordered (version, description, migration) entries. Never edit or reorder
+# applied entries; append a new one instead.
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, "Create base indexes", index_step(1)),
+    (2, "Add unique temple slugs", backfill_slugs),
+    (3, "Compute image sizes and placeholders", backfill_image_meta),
+    (4, "Index recent and featured temples", index_step(4)),
+    (5, "Normalize temple locations", backfill_locations),
+    (6, "Index normalized locations", index_step(6)),
+    (7, "Parse locations into city, state and country", reparse_locations),
+    (8, "Index location regions", index_step(8)),
+    (9, "Index temple coordinates", index_step(9)),
+    (10, "Store opening hours as minute intervals", backfill_open_intervals),
+    (11, "Index opening hours", index_step(11)),
+    (12, "Compute phonetic search keys", backfill_search_keys),
+    (13, "Index phonetic search keys", index_step(13)),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(db) -> int:
+    """Return the schema version recorded for this database"""
+    doc = db[SCHEMA_COLLECTION].find_one({"_id": VERSION_DOC_ID}, {"version": 1})
+    return doc.get("version", 0) if doc else 0
+
+def _acquire_lock(db, owner: str) -> bool:
+    """Take the migration lock unless another process holds an unexpired one"""
+    now = datetime.utcnow()
+    try:
+        db[SCHEMA_COLLECTION].update_one(
+            {"_id": LOCK_DOC_ID, "expires_at": {"$lt": now}},
+            {"$set": {"owner": owner, "expires_at": now + LOCK_TTL}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        # The lock document exists and has not expired
+        return False
+
+def _renew_lock(db, owner: str) -> None:
+    """Push our lock's expiry back; raises if another process has taken it"""
+    result = db[SCHEMA_COLLECTION].update_one(
+        {"_id": LOCK_DOC_ID, "owner": owner},
+        {"$set": {"expires_at": datetime.utcnow() + LOCK_TTL}}
+    )
+    if result.matched_count == 0:
+        raise MigrationInProgress("the migration lock expired and was taken by another process")
+
+def _release_lock(db, owner: str) -> None:
+    db[SCHEMA_COLLECTION].delete_one({"_id": LOCK_DOC_ID, "owner": owner})
+
+def migrate(db, wait_seconds: float = 30.0) -> int:
+    """Apply pending migrations and return the resulting schema version.
+
+    Only one process migrates at a time; others wait for it to finish, and
+    raise ``MigrationInProgress`` if it takes longer than ``wait_seconds``
+    rather than report a version the database has not reached yet.
+    """
+    version = get_schema_version(db)
+    if version >= SCHEMA_VERSION:
+        return version
+
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    deadline = time.monotonic() + wait_seconds
+    while not _acquire_lock(db, owner):
+        if time.monotonic() > deadline:
+            raise MigrationInProgress(
+                f"schema version {get_schema_version(db)} of {SCHEMA_VERSION}; another process is migrating"
+            )
+        time.sleep(0.5)
+        version = get_schema_version(db)
+        if version >= SCHEMA_VERSION:
+            return version
+
+    renewed_at = [time.monotonic()]
+
+    def renew(force: bool = False) -> None:
+        if force or time.monotonic() - renewed_at[0] >= LOCK_RENEW_SECONDS:
+            _renew_lock(db, owner)
+            renewed_at[0] = time.monotonic()
+
+    keeper = _lock_keeper.set(renew)
+    try:
+        # Re-read under the lock in case another process finished meanwhile
+        version = get_schema_version(db)
+        for number, description, migration in MIGRATIONS:
+            if number <= version:
+                continue
+            renew(force=True)
+            migration(db)
+            db[SCHEMA_COLLECTION].update_one(
+                {"_id": VERSION_DOC_ID},
+                {
+                    "$set": {"version": number, "updated_at": datetime.utcnow()},
+                    "$push": {"history": {
+                        "version": number,
+                        "description": description,
+                        "applied_at": datetime.utcnow(),
+                        "applied_by": owner
+                    }}
+                },
+                upsert=True
+            )
+            version = number
+        return version
+    finally:
+        _lock_keeper.reset(keeper)
+        _release_lock(db, owner)
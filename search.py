@@ -0,0 +1,330 @@
+"""
+Typo-tolerant temple search
+
+``FuzzyIndex`` keeps the words of every temple name and location in memory,
+with a trigram index over the distinct words. A query word is compared (with a
+bounded edit distance) only against the words that share enough trigrams with
+it, so lookups stay in the milliseconds however many temples there are.
+Descriptions are not indexed.
+
+Names written in an Indic script are transliterated to Latin letters first,
+and ``search_keys`` reduces words to phonetic keys ("Shree", "Sri" and "శ్రీ"
+all become "sri") that are stored on each temple and indexed, so spelling
+variants and other scripts match with one index lookup.
+"""
+
+import re
+import unicodedata
+import heapq
+import threading
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Name matches rank above location matches with the same edit distance
+NAME_FIELD, LOCATION_FIELD = 0, 1
+
+# Cost of matching a word that the query word only starts (typing in progress)
+PREFIX_COST = 0.5
+
+# Brahmic scripts share one layout (inherited from ISCII): the same letter
+# sits at the same offset in each script's Unicode block
+INDIC_BLOCKS = {
+    0x0900: "Devanagari", 0x0980: "Bengali", 0x0A00: "Gurmukhi", 0x0A80: "Gujarati",
+    0x0B00: "Oriya", 0x0B80: "Tamil", 0x0C00: "Telugu", 0x0C80: "Kannada", 0x0D00: "Malayalam",
+}
+INDIC_VOWELS = {
+    0x05: "a", 0x06: "aa", 0x07: "i", 0x08: "ii", 0x09: "u", 0x0A: "uu", 0x0B: "ri", 0x0C: "li",
+    0x0D: "e", 0x0E: "e", 0x0F: "e", 0x10: "ai", 0x11: "o", 0x12: "o", 0x13: "o", 0x14: "au",
+}
+INDIC_CONSONANTS = {
+    0x15: "k", 0x16: "kh", 0x17: "g", 0x18: "gh", 0x19: "n",
+    0x1A: "ch", 0x1B: "chh", 0x1C: "j", 0x1D: "jh", 0x1E: "n",
+    0x1F: "t", 0x20: "th", 0x21: "d", 0x22: "dh", 0x23: "n",
+    0x24: "t", 0x25: "th", 0x26: "d", 0x27: "dh", 0x28: "n", 0x29: "n",
+    0x2A: "p", 0x2B: "ph", 0x2C: "b", 0x2D: "bh", 0x2E: "m",
+    0x2F: "y", 0x30: "r", 0x31: "r", 0x32: "l", 0x33: "l", 0x34: "zh", 0x35: "v",
+    0x36: "sh", 0x37: "sh", 0x38: "s", 0x39: "h",
+}
+# Dependent vowel signs (matras) replace a consonant's inherent "a"
+INDIC_VOWEL_SIGNS = {
+    0x3E: "aa", 0x3F: "i", 0x40: "ii", 0x41: "u", 0x42: "uu", 0x43: "ri", 0x44: "rri",
+    0x45: "e", 0x46: "e", 0x47: "e", 0x48: "ai", 0x49: "o", 0x4A: "o", 0x4B: "o", 0x4C: "au",
+}
+INDIC_VIRAMA = 0x4D
+INDIC_ANUSVARA, INDIC_VISARGA, INDIC_CANDRABINDU = 0x02, 0x03, 0x01
+LABIALS = range(0x2A, 0x2F)
+
+def _indic_offset(char: str) -> Optional[int]:
+    block = ord(char) & ~0x7F
+    return ord(char) - block if block in INDIC_BLOCKS else None
+
+def transliterate(text: str) -> str:
+    """Romanize Indic-script letters ("శ్రీ" -> "shrii"); other text is unchanged"""
+    text = unicodedata.normalize("NFC", text or "")
+    output = []
+    pending_vowel = False  # the last consonant still carries its inherent "a"
+    for i, char in enumerate(text):
+        offset = _indic_offset(char)
+        if offset is None:
+            if pending_vowel:
+                output.append("a")
+            output.append(char)
+            pending_vowel = False
+            continue
+
+        if offset in INDIC_CONSONANTS:
+            if pending_vowel:
+                output.append("a")
+            output.append(INDIC_CONSONANTS[offset])
+            pending_vowel = True
+        elif offset in INDIC_VOWEL_SIGNS:
+            output.append(INDIC_VOWEL_SIGNS[offset])
+            pending_vowel = False
+        elif offset == INDIC_VIRAMA:
+            pending_vowel = False
+        else:
+            if pending_vowel:
+                output.append("a")
+            pending_vowel = False
+            if offset in INDIC_VOWELS:
+                output.append(INDIC_VOWELS[offset])
+            elif offset == INDIC_ANUSVARA:
+                # Pronounced as the nasal of the following consonant
+                following = _indic_offset(text[i + 1]) if i + 1 < len(text) else None
+                output.append("m" if following in LABIALS or following is None else "n")
+            elif offset == INDIC_CANDRABINDU:
+                output.append("n")
+            elif offset == INDIC_VISARGA:
+                output.append("h")
+            elif 0x66 <= offset <= 0x6F:
+                output.append(str(offset - 0x66))
+            # Nukta, accents and length marks carry no sound of their own
+    if pending_vowel:
+        output.append("a")
+    return "".join(output)
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a search box query: lowercase with single spaces"""
+    return " ".join((query or "").split()).lower()
+
+def normalize_text(text: str) -> str:
+    """Romanize, lowercase, strip accents and punctuation, collapse spaces"""
+    text = unicodedata.normalize("NFKD", transliterate(text))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return re.sub(r"[\W_]+", " ", text.casefold()).strip()
+
+def tokenize(text: str) -> List[str]:
+    return normalize_text(text).split()
+
+# Applied in order to a romanized word; each folds spellings that sound alike
+PHONETIC_RULES = [
+    (re.compile(r"y$"), "i"),                    # Swamy / Swami
+    (re.compile(r"tch"), "ksh"),                 # Tamil spells ksh as tch: Meenatchi
+    (re.compile(r"ee|ii|ie"), "i"),
+    (re.compile(r"oo|uu"), "u"),
+    (re.compile(r"aa"), "a"),
+    (re.compile(r"zh"), "l"),                    # Tamizh / Tamil
+    (re.compile(r"(?<=[kgcjtdpbs])h"), ""),      # aspirates: bh, dh, kh, sh, th ...
+    (re.compile(r"[cjzx]|s"), "s"),              # ch / j / s / sh as written in Tamil
+    (re.compile(r"g"), "k"),                     # Tamil and Malayalam spell
+    (re.compile(r"d"), "t"),                     # voiced and unvoiced stops
+    (re.compile(r"b"), "p"),                     # with one letter
+    (re.compile(r"w"), "v"),
+    (re.compile(r"q"), "k"),
+    (re.compile(r"(?<=.)a"), ""),                # Rama / Ram, Haramandira / Harmandir
+    (re.compile(r"(.)\1+"), r"\1"),              # Amman / Aman
+]
+
+def phonetic_key(word: str) -> str:
+    """Spelling- and script-independent key for one normalized word"""
+    for pattern, replacement in PHONETIC_RULES:
+        word = pattern.sub(replacement, word)
+    return word
+
+def search_keys(*texts: str) -> List[str]:
+    """Distinct phonetic keys of every word in ``texts``, stored for indexed search"""
+    return sorted({phonetic_key(word) for text in texts for word in tokenize(text)})
+
+def trigrams(word: str) -> Set[str]:
+    padded = f"${word}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def max_edits(word: str) -> int:
+    """Edit distance allowed for a query word: more for longer words"""
+    if len(word) <= 3:
+        return 0
+    if len(word) <= 6:
+        return 1
+    return 2
+
+def bounded_levenshtein(a: str, b: str, limit: int) -> Optional[int]:
+    """Edit distance between ``a`` and ``b``, or None if it exceeds ``limit``"""
+    if abs(len(a) - len(b)) > limit:
+        return None
+    # Only cells within ``limit`` of the diagonal can stay under the limit
+    over = limit + 1
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i, char_a in enumerate(a, 1):
+        current = [i if i <= limit else over] + [over] * len(b)
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != b[j - 1]),
+                over
+            )
+        # Every path through this row already costs more than allowed
+        if min(current) > limit:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= limit else None
+
+class FuzzyIndex:
+    """In-memory fuzzy index over temple names and locations"""
+
+    def __init__(self, documents: Iterable[Tuple[str, str, str]]):
+        """Build the index from ``(temple_id, name, location)`` tuples"""
+        self.ids: List[str] = []
+        self.names: List[str] = []
+        # word -> {document number: best field the word appears in}
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        for number, (temple_id, name, location) in enumerate(documents):
+            self.ids.append(temple_id)
+            self.names.append(normalize_text(name))
+            for field, text in ((LOCATION_FIELD, location), (NAME_FIELD, name)):
+                for word in tokenize(text):
+                    self.postings[word][number] = field
+
+        self.vocabulary = sorted(self.postings)
+        self.trigram_words: Dict[str, List[str]] = defaultdict(list)
+        for word in self.vocabulary:
+            for trigram in trigrams(word):
+                self.trigram_words[trigram].append(word)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _word_matches(self, query_word: str) -> Dict[str, float]:
+        """Indexed words close to ``query_word``, with their match cost"""
+        limit = max_edits(query_word)
+        matches: Dict[str, float] = {}
+
+        # Words the query word starts ("meen" -> "meenakshi")
+        start = bisect_left(self.vocabulary, query_word)
+        for word in self.vocabulary[start:]:
+            if not word.startswith(query_word):
+                break
+            matches[word] = 0 if word == query_word else PREFIX_COST
+
+        if limit:
+            # A word within ``limit`` edits shares all but 3 * limit trigrams
+            query_trigrams = trigrams(query_word)
+            needed = len(query_trigrams) - 3 * limit
+            shared: Dict[str, int] = defaultdict(int)
+            for trigram in query_trigrams:
+                for word in self.trigram_words.get(trigram, ()):
+                    shared[word] += 1
+            for word, count in shared.items():
+                if count < needed or word in matches:
+                    continue
+                distance = bounded_levenshtein(query_word, word, limit)
+                if distance is not None:
+                    matches[word] = distance
+        return matches
+
+    def search(self, query: str, limit: int = 20) -> List[str]:
+        """Temple ids matching every word of ``query``, best matches first"""
+        word_matches = [self._word_matches(word) for word in tokenize(query)]
+        if not word_matches:
+            return []
+        # Start from the rarest query word so later words only check survivors
+        word_matches.sort(key=lambda matches: sum(len(self.postings[word]) for word in matches))
+
+        # document number -> (total cost, worst field)
+        scores: Dict[int, Tuple[float, int]] = {}
+        for word, cost in word_matches[0].items():
+            for number, field in self.postings[word].items():
+                if number not in scores or (cost, field) < scores[number]:
+                    scores[number] = (cost, field)
+
+        for matches in word_matches[1:]:
+            postings = [(self.postings[word], cost) for word, cost in matches.items()]
+            narrowed = {}
+            for number, (total, worst) in scores.items():
+                best = min(
+                    ((cost, documents[number]) for documents, cost in postings if number in documents),
+                    default=None
+                )
+                if best:
+                    narrowed[number] = (total + best[0], max(worst, best[1]))
+            scores = narrowed
+            if not scores:
+                return []
+
+        ranked = heapq.nsmallest(limit, scores.items(), key=lambda item: (item[1], self.names[item[0]]))
+        return [self.ids[number] for number, _ in ranked]
+
+# Joins the searchable fields of a cached row; never part of a query
+FIELD_SEPARATOR = "\x00"
+
+class SearchCache:
+    """Process-wide LRU of search results for the current collection epoch.
+
+    Each entry holds the ids a normalized query matched and, when the match
+    set is small enough, the searchable text of those temples. A query that
+    extends a cached one ("meen" -> "meena") can only match a subset of its
+    temples, so it is answered by filtering that text instead of the database.
+    """
+
+    def __init__(self, max_entries: int = 256, max_rows: int = 500):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.epoch = None
+        self.entries: "OrderedDict[str, Tuple[List[str], Optional[List[Tuple[str, str]]]]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.refinements = self.misses = 0
+
+    def _check_epoch(self, epoch: int) -> None:
+        # Results from before a write are never served again
+        if epoch != self.epoch:
+            self.entries.clear()
+            self.epoch = epoch
+
+    def get(self, epoch: int, query: str) -> Optional[List[str]]:
+        """Ids matched by exactly this query, if cached"""
+        with self.lock:
+            self._check_epoch(epoch)
+            entry = self.entries.get(query)
+            if entry is None:
+                return None
+            self.entries.move_to_end(query)
+            self.hits += 1
+            return entry[0]
+
+    def refine(self, epoch: int, query: str) -> Optional[List[Tuple[str, str]]]:
+        """Rows of the longest cached prefix of ``query`` that contain ``query``"""
+        with self.lock:
+            self._check_epoch(epoch)
+            for end in range(len(query) - 1, 0, -1):
+                entry = self.entries.get(query[:end])
+                if entry is not None and entry[1] is not None:
+                    self.entries.move_to_end(query[:end])
+                    rows = entry[1]
+                    break
+            else:
+                self.misses += 1
+                return None
+            self.refinements += 1
+        return [row for row in rows if query in row[1]]
+
+    def put(self, epoch: int, query: str, ids: List[str], rows: Optional[List[Tuple[str, str]]]) -> None:
+        with self.lock:
+            self._check_epoch(epoch)
+            # Broad queries ("a") would pin most of the collection in memory
+            if rows is not None and len(rows) > self.max_rows:
+                rows = None
+            self.entries[query] = (ids, rows)
+            self.entries.move_to_end(query)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
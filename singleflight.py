@@ -0,0 +1,55 @@
+"""
+Single-flight coalescing of identical reads
+
+When many sessions ask for the same data at the same moment (a cache just
+expired, the app was just deployed), ``single_flight`` lets the first call
+run and makes the concurrent identical calls wait for its result instead of
+sending their own copy of the query to MongoDB.
+"""
+
+import copy
+import functools
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable
+
+_lock = threading.Lock()
+_in_flight: Dict[Hashable, Future] = {}
+
+# Calls that ran the query themselves / waited for another call's result
+stats = {"leaders": 0, "followers": 0}
+
+def single_flight(func: Callable) -> Callable:
+    """Share one in-flight call among concurrent calls with the same arguments.
+
+    Followers get a deep copy of the leader's result, so callers can still
+    modify what they get back. Exceptions are re-raised in every caller.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # Arguments are often dicts (filters), so key on their repr
+        key = (func.__module__, func.__qualname__, repr(args), repr(sorted(kwargs.items())))
+        with _lock:
+            future = _in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = _in_flight[key] = Future()
+                stats["leaders"] += 1
+            else:
+                stats["followers"] += 1
+
+        if not leader:
+            return copy.deepcopy(future.result())
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with _lock:
+                del _in_flight[key]
+    return wrapper
@@ -0,0 +1,408 @@
+"""
+Read-only SQLite snapshot of the public temple data
+
+``refresh_snapshot`` copies temple cards, full details and decoded image
+blobs from MongoDB into a local SQLite file, with an FTS5 index for search.
+The first run writes the whole file (atomically, through a temporary file);
+later runs only copy temples updated since the last one and drop deleted
+ones, or rewrite it all after a schema migration. The file is in WAL mode,
+so refreshes and readers don't block each other. ``SnapshotStore`` reads it back in the shapes ``models`` returns, so
+public pages keep working when MongoDB is down, in demos without a database
+and on edge replicas that only ship the file.
+
+Run ``python snapshot.py`` to export or refresh the configured snapshot.
+"""
+
+import base64
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from schema import get_schema_version
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS temples (
+    id TEXT PRIMARY KEY,
+    slug TEXT,
+    name TEXT,
+    location TEXT,
+    region_path TEXT,
+    featured INTEGER,
+    created_at TEXT,
+    updated_at TEXT,
+    image_count INTEGER,
+    card TEXT,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS temples_slug ON temples (slug);
+CREATE INDEX IF NOT EXISTS temples_name ON temples (name, id);
+CREATE INDEX IF NOT EXISTS temples_location ON temples (location, id);
+CREATE INDEX IF NOT EXISTS temples_created ON temples (created_at DESC, id);
+CREATE INDEX IF NOT EXISTS temples_region ON temples (region_path);
+CREATE TABLE IF NOT EXISTS images (
+    temple_id TEXT,
+    position INTEGER,
+    mime TEXT,
+    data BLOB,
+    PRIMARY KEY (temple_id, position)
+) WITHOUT ROWID;
+-- Rows share their rowid with the temple they index
+CREATE VIRTUAL TABLE IF NOT EXISTS temples_fts USING fts5(
+    name, location, description, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+# Mirrors models.TEMPLE_SORTS
+SNAPSHOT_SORTS = {
+    "Name": "name, id",
+    "Location": "location, id",
+    "Recently Added": "created_at DESC, id",
+}
+
+# Checked at most this often for a replaced snapshot file
+REOPEN_CHECK_SECONDS = 1.0
+
+# How long a reader waits for a lock, e.g. while a checkpoint runs
+BUSY_TIMEOUT_SECONDS = 5.0
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    return str(value)
+
+def _decode(document: Dict) -> Any:
+    if set(document) == {"$date"}:
+        return datetime.fromisoformat(document["$date"])
+    return document
+
+def _sort_value(value: Any) -> str:
+    return value.isoformat() if isinstance(value, datetime) else str(value or "")
+
+def _dumps(document: Dict) -> str:
+    return json.dumps(document, default=_encode, ensure_ascii=False)
+
+def _loads(text: str) -> Dict:
+    return json.loads(text, object_hook=_decode)
+
+def _split_image(image: str) -> tuple:
+    """(mime type, bytes) of a data URL; other images (links) are kept as text"""
+    if image.startswith("data:") and ";base64," in image:
+        header, data = image.split(",", 1)
+        return header[5:].split(";")[0], base64.b64decode(data)
+    return "url", image.encode()
+
+def _join_image(mime: str, data: bytes) -> str:
+    if mime == "url":
+        return data.decode()
+    return f"data:{mime};base64,{base64.b64encode(data).decode()}"
+
+def _write_temples(connection: sqlite3.Connection, temples, replace: bool = True) -> int:
+    written = 0
+    for temple in temples:
+        temple_id = str(temple.pop("_id"))
+        images = temple.pop("images", None) or []
+        if not isinstance(images, list):
+            images = [images]
+        image_meta = temple.get("image_meta") or []
+        card = {
+            "name": temple.get("name", ""),
+            "slug": temple.get("slug"),
+            "location": temple.get("location", ""),
+            "description": temple.get("description", ""),
+            "created_at": temple.get("created_at"),
+            "updated_at": temple.get("updated_at"),
+            "image_meta": image_meta[:1],
+        }
+        if replace:
+            _delete_temple(connection, temple_id)
+        cursor = connection.execute(
+            "INSERT INTO temples VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                temple_id, temple.get("slug"), card["name"], card["location"],
+                temple.get("region_path"), int(bool(temple.get("featured"))),
+                _sort_value(temple.get("created_at")), _sort_value(temple.get("updated_at")),
+                len(images), _dumps(card), _dumps(temple)
+            )
+        )
+        connection.executemany(
+            "INSERT INTO images VALUES (?, ?, ?, ?)",
+            [(temple_id, position, *_split_image(image)) for position, image in enumerate(images)]
+        )
+        connection.execute(
+            "INSERT INTO temples_fts (rowid, name, location, description) VALUES (?, ?, ?, ?)",
+            (cursor.lastrowid, card["name"], card["location"], card["description"])
+        )
+        written += 1
+    return written
+
+def _delete_temple(connection: sqlite3.Connection, temple_id: str) -> None:
+    row = connection.execute("SELECT rowid FROM temples WHERE id = ?", (temple_id,)).fetchone()
+    if row:
+        connection.execute("DELETE FROM temples_fts WHERE rowid = ?", row)
+        connection.execute("DELETE FROM temples WHERE rowid = ?", row)
+    connection.execute("DELETE FROM images WHERE temple_id = ?", (temple_id,))
+
+def _set_meta(connection: sqlite3.Connection, **values) -> None:
+    connection.executemany(
+        "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+        [(key, _dumps(value)) for key, value in values.items()]
+    )
+
+def _write_snapshot(connection: sqlite3.Connection, db, started: datetime) -> int:
+    count = _write_temples(connection, db.temples.find(), replace=False)
+    _set_meta(connection, synced_at=started, exported_at=started, schema_version=get_schema_version(db))
+    return count
+
+def export_snapshot(db, path: str) -> int:
+    """Write a complete snapshot of ``db`` to ``path``; returns the temple count.
+
+    A new file is written through a temporary file. An existing one is
+    rewritten in place in a single transaction: it is in WAL mode, so readers
+    keep reading the previous contents until it commits, and replacing the
+    file under them would leave its write-ahead log behind.
+    """
+    started = datetime.utcnow()
+    if os.path.exists(path):
+        connection = sqlite3.connect(path, timeout=30)
+        try:
+            # Files written before snapshots used WAL are switched over here
+            connection.execute("PRAGMA journal_mode=WAL")
+            with connection:
+                connection.execute("DELETE FROM temples_fts")
+                connection.execute("DELETE FROM temples")
+                connection.execute("DELETE FROM images")
+                return _write_snapshot(connection, db, started)
+        finally:
+            connection.close()
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(temporary):
+        os.remove(temporary)
+    connection = sqlite3.connect(temporary)
+    try:
+        # Refreshes then never block readers, nor readers a refresh
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+        with connection:
+            count = _write_snapshot(connection, db, started)
+    finally:
+        connection.close()
+    # Readers switch to the new file on their next lookup
+    os.replace(temporary, path)
+    return count
+
+def refresh_snapshot(db, path: str) -> int:
+    """Bring the snapshot at ``path`` up to date; returns the temples written.
+
+    Only temples updated since the last refresh are copied. Deleted temples
+    are looked for only when the counts show that some are missing. After a
+    schema migration the whole snapshot is rewritten, since backfills change
+    documents without touching their ``updated_at``.
+    """
+    if not os.path.exists(path):
+        return export_snapshot(db, path)
+
+    started = datetime.utcnow()
+    connection = sqlite3.connect(path, timeout=30)
+    try:
+        meta = dict(connection.execute("SELECT key, value FROM meta").fetchall())
+        if _loads(meta.get("schema_version", "0")) != get_schema_version(db):
+            return export_snapshot(db, path)
+        synced_at = _loads(meta["synced_at"]) if "synced_at" in meta else datetime.min
+        with connection:
+            # Temples written while this runs are copied again next time,
+            # since the next refresh starts from when this one started
+            written = _write_temples(connection, db.temples.find({"updated_at": {"$gte": synced_at}}))
+            (stored,) = connection.execute("SELECT COUNT(*) FROM temples").fetchone()
+            if stored != db.temples.count_documents({}):
+                live = {str(temple["_id"]) for temple in db.temples.find({}, {"_id": 1})}
+                for (temple_id,) in connection.execute("SELECT id FROM temples").fetchall():
+                    if temple_id not in live:
+                        _delete_temple(connection, temple_id)
+            _set_meta(connection, synced_at=started)
+    finally:
+        connection.close()
+    return written
+
+# Text columns of the full-text index, matched by words rather than by regex
+FTS_COLUMNS = ("name", "location", "description")
+
+def _combine(operator: str, clauses: List[tuple]) -> tuple:
+    if not clauses:
+        return "1", ()
+    sql = f" {operator} ".join(f"({clause})" for clause, _ in clauses)
+    return sql, tuple(parameter for _, parameters in clauses for parameter in parameters)
+
+def _fts_clause(column: str, pattern: str) -> tuple:
+    # Search filters escape the query for $regex; the index matches the
+    # words it contains as prefixes, like ``SnapshotStore.search``
+    words = re.findall(r"\w+", re.sub(r"\\(.)", r"\1", pattern).lower())
+    if not words:
+        return "0", ()
+    match = f"{column} : (" + " ".join(f'"{word}"*' for word in words) + ")"
+    return "rowid IN (SELECT rowid FROM temples_fts WHERE temples_fts MATCH ?)", (match,)
+
+def _field_clause(field: str, condition: Any) -> Optional[tuple]:
+    """SQL for one field of a filter built by ``models``"""
+    if field in ("$and", "$or"):
+        clauses = [_sql_filter(part) for part in condition]
+        if None in clauses:
+            return None
+        if field == "$or" and not clauses:
+            return "0", ()
+        return _combine("AND" if field == "$and" else "OR", clauses)
+    if not isinstance(condition, dict):
+        return ("0", ()) if field == "_id" and condition is None else None
+    operators = set(condition)
+    if field == "region_path" and operators == {"$gte", "$lt"}:
+        return "region_path >= ? AND region_path < ?", (condition["$gte"], condition["$lt"])
+    if field in FTS_COLUMNS and "$regex" in operators and operators <= {"$regex", "$options"}:
+        return _fts_clause(field, condition["$regex"])
+    if field == "_id" and operators == {"$in"}:
+        ids = [str(value) for value in condition["$in"]]
+        if not ids:
+            return "0", ()
+        return f"id IN ({', '.join('?' * len(ids))})", tuple(ids)
+    if field == "search_keys" and operators == {"$all"}:
+        # Phonetic keys are only kept in the full document
+        keys = tuple(condition["$all"])
+        exists = "EXISTS (SELECT 1 FROM json_each(detail, '$.search_keys') WHERE value = ?)"
+        return _combine("AND", [(exists, (key,)) for key in keys])
+    if field == "open_intervals" and operators == {"$elemMatch"}:
+        bounds = condition["$elemMatch"]
+        if set(bounds) == {"open", "close"} and set(bounds["open"]) == {"$lte"} and set(bounds["close"]) == {"$gt"}:
+            return (
+                "EXISTS (SELECT 1 FROM json_each(detail, '$.open_intervals') "
+                "WHERE json_extract(value, '$.open') <= ? AND json_extract(value, '$.close') > ?)",
+                (bounds["open"]["$lte"], bounds["close"]["$gt"])
+            )
+    return None
+
+def _sql_filter(filters: Dict) -> Optional[tuple]:
+    """(WHERE clause, parameters) for the MongoDB filters the temple list
+    builds: regions, text and phonetic search, fuzzy matches and opening
+    hours, combined with ``$and`` and ``$or``; None for anything else"""
+    clauses = [_field_clause(field, condition) for field, condition in filters.items()]
+    if None in clauses:
+        return None
+    return _combine("AND", clauses)
+
+class SnapshotStore:
+    """Read-only access to a snapshot file, one connection per thread"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        local = self.local
+        now = time.monotonic()
+        if getattr(local, "connection", None) is not None and now - local.checked_at < REOPEN_CHECK_SECONDS:
+            return local.connection
+        # Reopen when a full export has replaced the file
+        inode = os.stat(self.path).st_ino
+        if getattr(local, "connection", None) is None or local.inode != inode:
+            if getattr(local, "connection", None) is not None:
+                local.connection.close()
+            local.connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=BUSY_TIMEOUT_SECONDS)
+            local.inode = inode
+        local.checked_at = now
+        return local.connection
+
+    def _query(self, sql: str, parameters: tuple = ()) -> List[tuple]:
+        return self._connection().execute(sql, parameters).fetchall()
+
+    def _cards(self, rows: List[tuple]) -> List[Dict]:
+        cards = []
+        for temple_id, card in rows:
+            card = _loads(card)
+            card["_id"] = temple_id
+            card["images"] = self._images(temple_id, limit=1)
+            cards.append(card)
+        return cards
+
+    def _images(self, temple_id: str, limit: int = -1) -> List[str]:
+        rows = self._query(
+            "SELECT mime, data FROM images WHERE temple_id = ? ORDER BY position LIMIT ?",
+            (temple_id, limit)
+        )
+        return [_join_image(mime, data) for mime, data in rows]
+
+    def _where(self, filters: Optional[Dict]) -> Optional[tuple]:
+        """SQL for a filter, or None if the snapshot cannot answer it"""
+        return _sql_filter(filters or {})
+
+    def temple(self, temple_id: Optional[str] = None, slug: Optional[str] = None) -> Optional[Dict]:
+        """Full temple document by id or slug"""
+        column, value = ("id", temple_id) if temple_id else ("slug", slug)
+        rows = self._query(f"SELECT id, detail FROM temples WHERE {column} = ?", (value,))
+        if not rows:
+            return None
+        temple_id, detail = rows[0]
+        temple = _loads(detail)
+        temple["_id"] = temple_id
+        temple["images"] = self._images(temple_id)
+        return temple
+
+    def temples_page(self, filters: Optional[Dict], sort_by: str, skip: int, limit: int) -> List[Dict]:
+        where = self._where(filters)
+        if where is None:
+            return []
+        order = SNAPSHOT_SORTS.get(sort_by, SNAPSHOT_SORTS["Name"])
+        return self._cards(self._query(
+            f"SELECT id, card FROM temples WHERE {where[0]} ORDER BY {order} LIMIT ? OFFSET ?",
+            where[1] + (limit, skip)
+        ))
+
+    def count_temples(self, filters: Optional[Dict] = None) -> int:
+        where = self._where(filters)
+        if where is None:
+            return 0
+        return self._query(f"SELECT COUNT(*) FROM temples WHERE {where[0]}", where[1])[0][0]
+
+    def all_temples(self) -> List[Dict]:
+        """Every temple document without its images, with ``image_count``"""
+        temples = []
+        for temple_id, image_count, detail in self._query("SELECT id, image_count, detail FROM temples ORDER BY name, id"):
+            temple = _loads(detail)
+            temple["_id"] = temple_id
+            temple["image_count"] = image_count
+            temples.append(temple)
+        return temples
+
+    def recent_temples(self, n: int, featured_first: bool = False) -> List[Dict]:
+        order = "featured DESC, created_at DESC, id" if featured_first else "created_at DESC, id"
+        return self._cards(self._query(f"SELECT id, card FROM temples ORDER BY {order} LIMIT ?", (n,)))
+
+    def search(self, query: str, limit: int = 50) -> List[Dict]:
+        """Temples whose name, location or description has words starting
+        with every word of the query, best matches first"""
+        words = re.findall(r"\w+", query.lower())
+        if not words:
+            return []
+        match = " ".join(f'"{word}"*' for word in words)
+        rows = self._query(
+            "SELECT t.id, t.card FROM temples_fts f JOIN temples t ON t.rowid = f.rowid "
+            "WHERE temples_fts MATCH ? ORDER BY bm25(temples_fts, 10, 5, 1) LIMIT ?",
+            (match, limit)
+        )
+        return self._cards(rows)
+
+    def image_count(self) -> int:
+        return self._query("SELECT COALESCE(SUM(image_count), 0) FROM temples")[0][0]
+
+if __name__ == "__main__":
+    from models import SNAPSHOT_PATH, get_db
+
+    database = get_db()
+    if database is None:
+        raise SystemExit("MongoDB is not reachable")
+    print(f"{refresh_snapshot(database, SNAPSHOT_PATH)} temples written to {SNAPSHOT_PATH}")
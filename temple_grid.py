@@ -0,0 +1,94 @@
+"""
+Temple card grid rendered by a single custom Streamlit component
+
+All cards on a page are sent as one JSON payload and drawn by
+``frontend/temple_grid/index.html``, instead of several markdown, image and
+button elements per temple. The component returns the temple that was clicked.
+"""
+
+import os
+from typing import Callable, Dict, List, Optional
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+from models import card_image
+from utils import rerun
+
+_temple_grid = components.declare_component(
+    "temple_grid",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend", "temple_grid")
+)
+
+PLACEHOLDER_IMAGE = "https://via.placeholder.com/300x200?text=No+Image"
+
+def temple_card_summary(temple: Dict) -> Dict:
+    """Reduce a temple document to what its card displays"""
+    images = temple.get('images') or []
+    meta = (temple.get('image_meta') or [None])[0] if images else None
+    description = temple.get('description') or 'No description available.'
+    if len(description) > 100:
+        description = description[:100] + "..."
+    location = temple.get('location', 'Unknown')
+    if temple.get('distance_km') is not None:
+        location = f"{location} · {temple['distance_km']:.1f} km away"
+    return {
+        'id': str(temple['_id']),
+        'slug': temple.get('slug'),
+        'name': temple.get('name', 'Unknown Temple'),
+        'location': location,
+        'summary': description,
+        'thumbnail': card_image(images[0], temple) if images else PLACEHOLDER_IMAGE,
+        # Reserved size and blurred preview until the lazy thumbnail loads
+        'width': meta['width'] if meta else None,
+        'height': meta['height'] if meta else None,
+        'placeholder': meta['lqip'] if meta else None
+    }
+
+def _handlers() -> Dict[str, Callable]:
+    return st.session_state.setdefault('_temple_grid_handlers', {})
+
+def _consume_click(key: str) -> Optional[Dict]:
+    """Return the grid's latest click if it has not been handled yet"""
+    click = st.session_state.get(key)
+    if not click or click.get('nonce') == st.session_state.get(f'{key}_handled'):
+        return None
+    st.session_state[f'{key}_handled'] = click['nonce']
+    return click
+
+def dispatch_grid_clicks() -> None:
+    """Run the ``on_select`` handlers of grids clicked since the last run.
+
+    Call this before routing: like a widget callback, it lets the handler
+    switch pages before anything is drawn, so a click costs a single run.
+    """
+    for key, on_select in list(_handlers().items()):
+        click = _consume_click(key)
+        if click:
+            on_select(click['id'], click.get('slug'))
+
+def temple_grid(temples: List[Dict], key: str,
+                on_select: Optional[Callable[[str, Optional[str]], None]] = None,
+                button_label: str = "View Details") -> Optional[Dict]:
+    """Render temple cards in one component.
+
+    Thumbnails load lazily as cards scroll into view.
+    ``on_select(temple_id, slug)`` is called once per click. Returns the last
+    clicked ``{'id', 'slug'}`` (or None).
+    """
+    if on_select:
+        _handlers()[key] = on_select
+        # Clicks inside a fragment skip the app-level dispatch, handle them here
+        page = st.session_state.get('page')
+        click = _consume_click(key)
+        if click:
+            on_select(click['id'], click.get('slug'))
+            if st.session_state.get('page') != page:
+                rerun()
+
+    return _temple_grid(
+        temples=[temple_card_summary(temple) for temple in temples],
+        button_label=button_label,
+        key=key,
+        default=None
+    )
@@ -7,38 +7,152 @@ from typing import Dict, List, Optional
 import base64
 from PIL import Image
 import io
-from datetime import datetime
+from datetime import datetime, time
+from frozen import thaw
 from models import (
     get_all_temples,
     get_temple_by_id,
+    get_temple_by_slug,
     create_temple,
     update_temple,
     delete_temple,
     search_temples,
+    fuzzy_search_temples,
+    fuzzy_search_filter,
+    search_ids_filter,
+    get_temples_page,
+    count_temples,
+    get_temple_facets,
+    get_recent_temples,
+    find_temples_near,
+    get_map_clusters,
+    image_src,
     format_timing,
-    get_temple_stats,
-    get_all_users
+    clock_time,
+    current_minute,
+    is_open_at,
+    open_at_filter,
+    timing_schedules,
+    get_all_users,
+    get_temple_stats
+)
+from async_models import (
+    count_temple_images_async,
+    gather_queries,
+    get_featured_temples_async,
+    get_temple_facets_async,
+    get_temple_stats_async,
 )
 from auth import is_admin, require_auth
+from geolocation import browser_location
+from locations import (
+    MAX_MAP_ZOOM,
+    MIN_MAP_ZOOM,
+    geo_point,
+    lat_lon_to_tile,
+    region_filter,
+    tile_to_lat_lon,
+)
+from prefetch import prefetch
+from utils import (
+    image_placeholder,
+    lazy_image_html,
+    navigate,
+    rerun,
+    set_query_params,
+    timed_render,
+)
+from temple_grid import temple_grid
+
+# Temple cards rendered per "load more" batch on the temple list
+TEMPLE_PAGE_SIZE = 12
+
+# Radius choices for the home page's nearby temples
+NEARBY_RADII_KM = [10, 50, 200, 1000]
+
+# Initial map view, roughly centred on India
+DEFAULT_MAP_VIEW = {"lat": 22.5, "lon": 79.0, "zoom": 4}
+
+# Shown in place of the statistics when they cannot be loaded in time
+EMPTY_STATS = {"total_temples": 0, "total_users": 0, "admin_users": 0}
+
+def open_temple(temple_id: str, slug: Optional[str] = None, page: str = "temple_detail"):
+    """Select a temple and route to one of its pages.
+    
+    Meant to be used as a widget ``on_click`` callback so the new page renders
+    in the same script run instead of needing an extra ``rerun()``.
+    """
+    st.session_state.selected_temple = str(temple_id) if temple_id else None
+    st.session_state.selected_temple_slug = slug
+    st.session_state.page = page
+
+def parse_coordinates(latitude: str, longitude: str) -> Optional[Dict]:
+    """GeoJSON point from the optional latitude/longitude form fields.
+    
+    Returns None when both are blank and raises ValueError when they are invalid.
+    """
+    if not latitude.strip() and not longitude.strip():
+        return None
+    try:
+        return geo_point(float(latitude), float(longitude))
+    except ValueError:
+        raise ValueError("Please enter latitude and longitude as decimal degrees, e.g. 9.9195 and 78.1193")
 
 def show_home_page():
     """Display the home page with featured temples"""
     st.markdown("<h1 style='text-align: center;'>Welcome to Alayatales 🛕</h1>", unsafe_allow_html=True)
     st.markdown("<p style='text-align: center; font-size: 18px;'>Discover and explore sacred temples around the world</p>", unsafe_allow_html=True)
     
+    # Stats, featured temples and the image count don't depend on each other,
+    # so their queries run concurrently; all of them are served stale-while-
+    # revalidate, so usually none of them waits for the database
+    data = gather_queries(
+        {
+            'stats': get_temple_stats_async(),
+            'featured_temples': get_featured_temples_async(),
+            'image_count': count_temple_images_async(),
+            'facets': get_temple_facets_async()
+        },
+        defaults={
+            'stats': EMPTY_STATS,
+            'featured_temples': [],
+            'image_count': 0,
+            'facets': {"cities": []}
+        }
+    )
+    stats = data['stats']
+    
     # Quick stats
-    stats = get_temple_stats()
     col1, col2, col3, col4 = st.columns(4)
     with col1:
         st.metric("🛕 Total Temples", stats['total_temples'])
     with col2:
-        st.metric("📍 Locations", len(stats.get('temples_by_location', [])))
+        st.metric("📍 Locations", len(data['facets']['cities']))
     with col3:
         st.metric("👥 Community Members", stats['total_users'])
     with col4:
-        st.metric("📸 Images", sum(len(t.get('images', [])) for t in get_all_temples()))
+        st.metric("📸 Images", data['image_count'])
+    
+    st.markdown("---")
     
+    show_home_search(data['featured_temples'])
+    
+    st.markdown("---")
+    show_nearby_temples()
+    
+    # Call to action
     st.markdown("---")
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col2:
+        st.button("View All Temples", use_container_width=True, on_click=navigate, args=("temples",))
+
+@st.fragment
+@timed_render("home search")
+def show_home_search(featured_temples: List[Dict]):
+    """Search box and results grid, rerun on its own as a fragment"""
+    # A card or button in this fragment switched pages; redraw the whole app
+    if st.session_state.page != "home":
+        rerun()
     
     # Search bar
     col1, col2, col3 = st.columns([1, 3, 1])
@@ -48,17 +162,11 @@ def show_home_page():
     # Quick action buttons
     col1, col2, col3 = st.columns(3)
     with col1:
-        if st.button("🛕 Browse All Temples", use_container_width=True):
-            st.session_state.page = "temples"
-            st.rerun()
+        st.button("🛕 Browse All Temples", use_container_width=True, on_click=navigate, args=("temples",))
     with col2:
-        if st.button("ℹ️ Learn More", use_container_width=True):
-            st.session_state.page = "about"
-            st.rerun()
+        st.button("ℹ️ Learn More", use_container_width=True, on_click=navigate, args=("about",))
     with col3:
-        if st.button("❓ Need Help?", use_container_width=True):
-            st.session_state.page = "help"
-            st.rerun()
+        st.button("❓ Need Help?", use_container_width=True, on_click=navigate, args=("help",))
     
     st.markdown("---")
         
@@ -67,29 +175,54 @@ def show_home_page():
         temples = search_temples(search_query)
         st.markdown(f"### 🔍 Search Results for '{search_query}'")
         if not temples:
-            st.info("No temples found matching your search. Try different keywords.")
-            temples = get_all_temples()[:6]  # Show featured temples as fallback
-            st.markdown("### ✨ Featured Temples")
+            # Probably misspelt; look for close matches instead
+            temples = fuzzy_search_temples(search_query)
+            if temples:
+                st.caption("No exact matches. Showing temples with similar names or locations.")
+            else:
+                st.info("No temples found matching your search. Try different keywords.")
+                temples = featured_temples  # Show featured temples as fallback
+                st.markdown("### ✨ Featured Temples")
     else:
-        temples = get_all_temples()[:6]  # Show only 6 featured temples on home
+        temples = featured_temples
         st.markdown("### ✨ Featured Temples")
     
     if temples:
         # Display temples in a grid
-        cols = st.columns(3)
-        for idx, temple in enumerate(temples):
-            with cols[idx % 3]:
-                display_temple_card(temple)
+        temple_grid(temples, key="home_grid", on_select=open_temple)
     else:
         st.info("No temples found. Please check back later!")
+
+@st.fragment
+@timed_render("nearby temples")
+def show_nearby_temples():
+    """Temples closest to the visitor, once they share their location"""
+    # A card in this fragment switched pages; redraw the whole app
+    if st.session_state.page != "home":
+        rerun()
     
-    # Call to action
-    st.markdown("---")
-    col1, col2, col3 = st.columns([1, 2, 1])
+    st.markdown("### 📍 Temples Near You")
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        position = browser_location(key="home_location")
     with col2:
-        if st.button("View All Temples", use_container_width=True):
-            st.session_state.page = "temples"
-            st.rerun()
+        radius_km = st.selectbox(
+            "Within",
+            NEARBY_RADII_KM,
+            index=2,
+            format_func=lambda km: f"{km} km",
+            label_visibility="collapsed"
+        )
+    
+    if not position:
+        st.caption("Share your location to see the temples closest to you.")
+        return
+    
+    temples = find_temples_near(position['lat'], position['lon'], radius_km)
+    if temples:
+        temple_grid(temples, key="nearby_grid", on_select=open_temple)
+    else:
+        st.info(f"No temples found within {radius_km} km of you.")
 
 def show_temple_list():
     """Display all temples in a list/grid format"""
@@ -100,90 +233,192 @@ def show_temple_list():
     with col1:
         search_query = st.text_input("Search", placeholder="Search by name or location...")
     with col2:
-        # Get unique locations for filter
-        all_temples = get_all_temples()
-        locations = list(set([t.get('location', '') for t in all_temples if t.get('location')]))
-        locations.insert(0, "All Locations")
-        selected_location = st.selectbox("Filter by Location", locations)
+        # Countries, states and cities with their counts, from the cached facets;
+        # sorting by region path lists every region right above its contents
+        facets = get_temple_facets()
+        regions = {
+            item['value']: f"{icon} {item['label']} ({item['count']})"
+            for name, icon in (("countries", "🌏"), ("states", "📍"), ("cities", "🏙️"))
+            for item in facets[name]
+        }
+        selected_location = st.selectbox(
+            "Filter by Location",
+            ["All Locations"] + sorted(regions),
+            format_func=lambda path: regions.get(path, path)
+        )
     with col3:
         sort_by = st.selectbox("Sort by", ["Name", "Location", "Recently Added"])
     
+    # Visiting hours, answered by the opening-hours index
+    col1, col2 = st.columns([3, 2])
+    with col1:
+        visiting_hours = st.radio("Visiting Hours", ["Any time", "Open now", "Open at"], horizontal=True)
+    with col2:
+        visit_time = st.time_input("Visit time", value=time(7, 0), disabled=visiting_hours != "Open at")
+    
     # Get filtered temples
+    # Searches go through the cached search ids shared with the home page
     if search_query:
-        temples = search_temples(search_query)
+        filters = search_ids_filter(search_query)
     elif selected_location and selected_location != "All Locations":
-        temples = [t for t in all_temples if t.get('location') == selected_location]
+        filters = region_filter(selected_location)
     else:
-        temples = all_temples
+        filters = {}
+    
+    if visiting_hours != "Any time":
+        minute = current_minute() if visiting_hours == "Open now" else visit_time.hour * 60 + visit_time.minute
+        filters = {"$and": [filters, open_at_filter(minute)]} if filters else open_at_filter(minute)
     
-    # Sort temples
-    if sort_by == "Name":
-        temples.sort(key=lambda x: x.get('name', ''))
-    elif sort_by == "Location":
-        temples.sort(key=lambda x: x.get('location', ''))
-    elif sort_by == "Recently Added":
-        temples.sort(key=lambda x: x.get('created_at', datetime.min), reverse=True)
+    # Start again from the first batch whenever the filters change
+    list_state = (search_query, selected_location, sort_by, visiting_hours, visit_time)
+    if st.session_state.get('temple_list_state') != list_state:
+        st.session_state.temple_list_state = list_state
+        st.session_state.temple_list_limit = TEMPLE_PAGE_SIZE
+    limit = st.session_state.temple_list_limit
+    
+    # Only the batches the user has asked for are fetched and rendered
+    total = count_temples(filters)
+    if search_query and not total:
+        # Probably misspelt; fall back to close matches on name and location
+        fuzzy_filter = fuzzy_search_filter(search_query)
+        if fuzzy_filter is not None:
+            filters = {"$and": [fuzzy_filter, filters["$and"][1]]} if "$and" in filters else fuzzy_filter
+            total = count_temples(filters)
+            if total:
+                st.caption("No exact matches. Showing temples with similar names or locations.")
+    temples = get_temples_page(filters, sort_by=sort_by, limit=limit)
     
     # Display temples
     if temples:
-        st.markdown(f"**Found {len(temples)} temples**")
+        st.markdown(f"**Found {total} temples** (showing {len(temples)})")
+        
+        # Display in grid; the grid keeps one key, so appending a batch
+        # updates the same component instead of creating new widgets
+        temple_grid(temples, key="temple_list_grid", on_select=open_temple)
         
-        # Display in grid
-        cols = st.columns(3)
-        for idx, temple in enumerate(temples):
-            with cols[idx % 3]:
-                display_temple_card(temple)
+        if len(temples) < total:
+            st.button(
+                f"⬇️ Load more ({total - len(temples)} remaining)",
+                key="temple_list_load_more",
+                use_container_width=True,
+                on_click=load_more_temples
+            )
     else:
         st.info("No temples found matching your criteria.")
 
-def display_temple_card(temple: Dict):
-    """Display a single temple card"""
-    with st.container():
-        # Create a card-like container
-        st.markdown("""
-        <div style='background-color: #f8f9fa; padding: 1rem; border-radius: 10px; margin-bottom: 1rem;'>
-        """, unsafe_allow_html=True)
-        
-        # Display image if available
-        if temple.get('images') and len(temple['images']) > 0:
-            # If image is base64 encoded
-            if temple['images'][0].startswith('data:image'):
-                st.markdown(f"""
-                <img src="{temple['images'][0]}" style="width: 100%; height: 200px; object-fit: cover; border-radius: 5px;">
-                """, unsafe_allow_html=True)
-            else:
-                # If image is a URL or file path
-                try:
-                    st.image(temple['images'][0], width=300)
-                except:
-                    st.image("https://via.placeholder.com/300x200?text=Temple+Image", width=300)
-        else:
-            st.image("https://via.placeholder.com/300x200?text=No+Image", width=300)
-        
-        # Temple info
-        st.markdown(f"### {temple.get('name', 'Unknown Temple')}")
-        st.markdown(f"📍 **Location:** {temple.get('location', 'Unknown')}")
-        
-        # Description (truncated)
-        description = temple.get('description', 'No description available.')
-        if len(description) > 100:
-            description = description[:100] + "..."
-        st.markdown(description)
-        
-        # View details button
-        temple_id = str(temple['_id'])
-        if st.session_state.get('debug_mode', False):
-            st.info(f"Debug: Temple ID for button: {temple_id}")
-            
-        if st.button(f"View Details", key=f"view_{temple_id}"):
-            st.session_state.selected_temple = temple_id
-            st.session_state.page = "temple_detail"
-            st.rerun()
-        
-        st.markdown("</div>", unsafe_allow_html=True)
+def load_more_temples():
+    """Append the next batch of cards to the temple list"""
+    st.session_state.temple_list_limit = (
+        st.session_state.get('temple_list_limit', TEMPLE_PAGE_SIZE) + TEMPLE_PAGE_SIZE
+    )
+
+def pan_map(columns: float, rows: float):
+    """Move the map centre by a number of tiles at the current zoom"""
+    view = st.session_state.map_view
+    x, y = lat_lon_to_tile(view['lat'], view['lon'], view['zoom'])
+    lat, lon = tile_to_lat_lon(x + columns, y + rows, view['zoom'])
+    view['lat'], view['lon'] = lat, (lon + 180) % 360 - 180
+
+def focus_map(lat: float, lon: float, zoom: int):
+    """Centre the map on a point and zoom in"""
+    st.session_state.map_view = {"lat": lat, "lon": lon, "zoom": min(zoom, MAX_MAP_ZOOM)}
+    st.session_state.map_zoom = st.session_state.map_view['zoom']
+
+def set_map_zoom():
+    st.session_state.map_view['zoom'] = st.session_state.map_zoom
+
+def show_temple_map():
+    """Temple map drawn from server-side clusters of the current viewport"""
+    import pydeck as pdk
+    
+    st.markdown("## 🗺️ Temple Map")
+    
+    if 'map_view' not in st.session_state:
+        st.session_state.map_view = dict(DEFAULT_MAP_VIEW)
+    view = st.session_state.map_view
+    if 'map_zoom' not in st.session_state:
+        st.session_state.map_zoom = view['zoom']
+    
+    # Viewport controls; the map itself only shows what the server clustered
+    col1, col2, col3, col4, col5 = st.columns([4, 1, 1, 1, 1])
+    with col1:
+        st.slider("Zoom", MIN_MAP_ZOOM, MAX_MAP_ZOOM, key="map_zoom", on_change=set_map_zoom)
+    for column, label, move in ((col2, "⬅️", (-1, 0)), (col3, "⬆️", (0, -1)),
+                                (col4, "⬇️", (0, 1)), (col5, "➡️", (1, 0))):
+        with column:
+            st.button(label, key=f"map_pan_{label}", use_container_width=True, on_click=pan_map, args=move)
+    
+    clusters = get_map_clusters(view['lat'], view['lon'], view['zoom'])
+    
+    points = [
+        {
+            "lat": cluster['lat'],
+            "lon": cluster['lon'],
+            "count": cluster['count'],
+            "label": cluster.get('name') or f"{cluster['count']} temples",
+            "text": str(cluster['count']) if cluster['count'] > 1 else "",
+            # Marker area grows with the number of temples in the cluster
+            "radius": 8 + 4 * cluster['count'] ** 0.5
+        }
+        for cluster in clusters
+    ]
+    st.pydeck_chart(pdk.Deck(
+        layers=[
+            pdk.Layer(
+                "ScatterplotLayer",
+                data=points,
+                get_position="[lon, lat]",
+                get_radius="radius",
+                radius_units="pixels",
+                get_fill_color=[102, 126, 234, 200],
+                pickable=True
+            ),
+            pdk.Layer(
+                "TextLayer",
+                data=points,
+                get_position="[lon, lat]",
+                get_text="text",
+                get_size=14,
+                get_color=[255, 255, 255]
+            )
+        ],
+        initial_view_state=pdk.ViewState(latitude=view['lat'], longitude=view['lon'], zoom=view['zoom']),
+        tooltip={"text": "{label}"}
+    ))
+    st.caption(
+        f"{sum(cluster['count'] for cluster in clusters)} temples in view, "
+        f"sent as {len(clusters)} clusters"
+    )
+    
+    # Drill down into a cluster, or open a temple that stands alone
+    groups = sorted((c for c in clusters if c['count'] > 1), key=lambda c: -c['count'])
+    temples = sorted((c for c in clusters if c['count'] == 1), key=lambda c: c.get('name') or '')
+    col1, col2 = st.columns(2)
+    with col1:
+        if groups and view['zoom'] < MAX_MAP_ZOOM:
+            group = st.selectbox(
+                "Zoom into a cluster",
+                groups,
+                format_func=lambda c: f"{c['count']} temples near {c['lat']:.2f}, {c['lon']:.2f}"
+            )
+            st.button(
+                "🔍 Zoom In",
+                on_click=focus_map,
+                args=(group['lat'], group['lon'], view['zoom'] + 2)
+            )
+    with col2:
+        if temples:
+            temple = st.selectbox(
+                "Temples in view", temples, format_func=lambda c: c.get('name') or "Unnamed temple"
+            )
+            st.button("View Details", key="map_view_temple", on_click=open_temple, args=(temple['_id'], temple['slug']))
 
-def show_temple_detail(temple_id: str):
-    """Display detailed view of a single temple"""
+def show_temple_detail(temple_id: Optional[str], slug: Optional[str] = None):
+    """Display detailed view of a single temple.
+    
+    Shared links only carry the slug, so the temple is looked up by slug when
+    no ObjectId has been selected yet.
+    """
     # Show success message if any
     if st.session_state.get('show_success_message'):
         st.success(st.session_state.show_success_message)
@@ -191,41 +426,38 @@ def show_temple_detail(temple_id: str):
     
     # Debug information (remove in production)
     if st.session_state.get('debug_mode', False):
-        st.info(f"Debug: Looking for temple with ID: {temple_id}")
+        st.info(f"Debug: Looking for temple with ID: {temple_id} / slug: {slug}")
     
     try:
-        temple = get_temple_by_id(temple_id)
+        temple = get_temple_by_id(temple_id) if temple_id else get_temple_by_slug(slug)
         
         if not temple:
             st.error("Temple not found!")
-            st.info(f"Temple ID: {temple_id}")
-            if st.button("Back to Temples"):
-                st.session_state.page = "temples"
-                st.rerun()
+            st.info(f"Temple ID: {temple_id or slug}")
+            set_query_params()
+            st.button("Back to Temples", on_click=navigate, args=("temples",))
             return
     except Exception as e:
         st.error(f"Error loading temple: {str(e)}")
-        if st.button("Back to Temples"):
-            st.session_state.page = "temples"
-            st.rerun()
+        st.button("Back to Temples", on_click=navigate, args=("temples",))
         return
     
+    # Remember the resolved temple and mirror its slug into the URL so it can be shared
+    temple_id = temple['_id']
+    st.session_state.selected_temple = temple_id
+    st.session_state.selected_temple_slug = temple.get('slug')
+    set_query_params(temple=temple.get('slug'))
+    
     # Navigation buttons
     col1, col2, col3 = st.columns([1, 1, 1])
     with col1:
-        if st.button("← Back to Temples"):
-            st.session_state.page = "temples"
-            st.rerun()
+        st.button("← Back to Temples", on_click=navigate, args=("temples",))
     with col2:
         if st.session_state.authenticated and st.session_state.user.get('role') == 'admin':
-            if st.button("📊 Back to Admin"):
-                st.session_state.page = "admin"
-                st.rerun()
+            st.button("📊 Back to Admin", on_click=navigate, args=("admin",))
     with col3:
         if st.session_state.authenticated and st.session_state.user.get('role') == 'admin':
-            if st.button("✏️ Edit Temple"):
-                st.session_state.page = "edit_temple"
-                st.rerun()
+            st.button("✏️ Edit Temple", on_click=navigate, args=("edit_temple",))
     
     # Temple name and location
     st.markdown(f"# {temple.get('name', 'Unknown Temple')}")
@@ -233,33 +465,7 @@ def show_temple_detail(temple_id: str):
     
     # Image gallery
     if temple.get('images') and len(temple['images']) > 0:
-        st.markdown("### 📸 Image Gallery")
-        
-        # Main image
-        selected_image = st.select_slider(
-            "Select image",
-            options=range(len(temple['images'])),
-            format_func=lambda x: f"Image {x + 1}"
-        )
-        
-        # Display selected image
-        if temple['images'][selected_image].startswith('data:image'):
-            st.markdown(f"""
-            <img src="{temple['images'][selected_image]}" style="width: 100%; max-height: 500px; object-fit: contain; border-radius: 10px;">
-            """, unsafe_allow_html=True)
-        else:
-            try:
-                st.image(temple['images'][selected_image], width=600)
-            except:
-                st.image("https://via.placeholder.com/600x400?text=Image+Not+Available", width=600)
-        
-        # Thumbnail gallery
-        if len(temple['images']) > 1:
-            cols = st.columns(min(len(temple['images']), 5))
-            for idx, img in enumerate(temple['images'][:5]):
-                with cols[idx]:
-                    if st.button(f"", key=f"thumb_{idx}", help=f"Image {idx + 1}"):
-                        pass  # Image selection is handled by select_slider
+        show_image_gallery(temple['images'], temple.get('image_meta', []))
     
     # Temple information
     col1, col2 = st.columns([2, 1])
@@ -270,7 +476,10 @@ def show_temple_detail(temple_id: str):
     
     with col2:
         st.markdown("### ⏰ Timings")
-        timings = temple.get('timings', [])
+        open_now = is_open_at(temple, current_minute())
+        if open_now is not None:
+            st.markdown("🟢 **Open now**" if open_now else "🔴 **Closed now**")
+        timings = timing_schedules(temple.get('timings'))
         if timings:
             for idx, timing in enumerate(timings):
                 st.markdown(f"**Schedule {idx + 1}:**")
@@ -286,10 +495,13 @@ def show_temple_detail(temple_id: str):
         st.markdown("### Admin Actions")
         col1, col2 = st.columns(2)
         with col1:
-            if st.button("✏️ Edit Temple", use_container_width=True):
-                st.session_state.selected_temple = temple_id
-                st.session_state.page = "edit_temple"
-                st.rerun()
+            st.button(
+                "✏️ Edit Temple",
+                use_container_width=True,
+                key="edit_temple_admin_action",
+                on_click=open_temple,
+                args=(temple_id, temple.get('slug'), "edit_temple")
+            )
         with col2:
             if st.button("🗑️ Delete Temple", use_container_width=True, type="secondary"):
                 if st.session_state.get(f'confirm_delete_{temple_id}', False):
@@ -297,16 +509,54 @@ def show_temple_detail(temple_id: str):
                         st.success("Temple deleted successfully!")
                         st.session_state.page = "temples"
                         st.session_state.selected_temple = None
+                        st.session_state.selected_temple_slug = None
                         # Clear confirmation state
                         if f'confirm_delete_{temple_id}' in st.session_state:
                             del st.session_state[f'confirm_delete_{temple_id}']
-                        st.rerun()
+                        rerun()
                     else:
                         st.error("Failed to delete temple")
                 else:
                     st.session_state[f'confirm_delete_{temple_id}'] = True
                     st.warning("⚠️ Click 'Delete Temple' again to confirm deletion. This action cannot be undone!")
 
+@st.fragment
+@timed_render("image gallery")
+def show_image_gallery(images: List[str], image_meta: Optional[List[Dict]] = None):
+    """Image gallery, rerun on its own as a fragment"""
+    image_meta = image_meta or []
+    st.markdown("### 📸 Image Gallery")
+    
+    # Main image
+    selected_image = st.select_slider(
+        "Select image",
+        options=range(len(images)),
+        format_func=lambda x: f"Image {x + 1}"
+    )
+    
+    # Display selected image
+    image = images[selected_image]
+    if image.startswith('data:image'):
+        meta = image_meta[selected_image] if selected_image < len(image_meta) else None
+        st.markdown(lazy_image_html(
+            image_src(image),
+            meta,
+            style="width: 100%; height: auto; max-height: 500px; object-fit: contain; border-radius: 10px;"
+        ), unsafe_allow_html=True)
+    else:
+        try:
+            st.image(image, width=600)
+        except Exception:
+            st.image("https://via.placeholder.com/600x400?text=Image+Not+Available", width=600)
+    
+    # Thumbnail gallery
+    if len(images) > 1:
+        cols = st.columns(min(len(images), 5))
+        for idx, img in enumerate(images[:5]):
+            with cols[idx]:
+                if st.button(f"", key=f"thumb_{idx}", help=f"Image {idx + 1}"):
+                    pass  # Image selection is handled by select_slider
+
 def show_add_temple():
     """Display form to add a new temple"""
     st.markdown("## ➕ Add New Temple")
@@ -320,7 +570,13 @@ def show_add_temple():
         st.markdown("### Basic Information")
         name = st.text_input("Temple Name *", placeholder="Enter temple name")
         location = st.text_input("Location *", placeholder="Enter location")
+        col1, col2 = st.columns(2)
+        with col1:
+            latitude = st.text_input("Latitude", placeholder="e.g. 9.9195", help="Optional, used for nearby search")
+        with col2:
+            longitude = st.text_input("Longitude", placeholder="e.g. 78.1193", help="Optional, used for nearby search")
         description = st.text_area("Description *", placeholder="Enter temple description", height=150)
+        featured = st.checkbox("⭐ Feature on home page", value=False)
         
         # Timings
         st.markdown("### Timings")
@@ -355,6 +611,7 @@ def show_add_temple():
         
         # Process uploaded images
         images = []
+        image_meta = []
         if uploaded_files:
             # Limit number of images
             max_images = 5
@@ -391,6 +648,7 @@ def show_add_temple():
                     # Convert to base64
                     base64_image = base64.b64encode(img_buffer.getvalue()).decode()
                     images.append(f"data:image/jpeg;base64,{base64_image}")
+                    image_meta.append(image_placeholder(image))
                     
                     # Show compression info
                     original_size = len(uploaded_file.getvalue())
@@ -406,13 +664,16 @@ def show_add_temple():
         col1, col2, col3 = st.columns([1, 1, 1])
         with col1:
             if st.form_submit_button("🔄 Clear Form", use_container_width=True):
-                st.rerun()
+                rerun()
         with col2:
             submit_button = st.form_submit_button("➕ Add Temple", use_container_width=True, type="primary")
         with col3:
-            if st.form_submit_button("❌ Cancel", use_container_width=True):
-                st.session_state.page = "admin"
-                st.rerun()
+            st.form_submit_button(
+                "❌ Cancel",
+                use_container_width=True,
+                on_click=navigate,
+                args=("admin",)
+            )
         
         # Show document size estimate
         if images:
@@ -438,12 +699,21 @@ def show_add_temple():
 
         if submit_button:
             if name and location and description:
+                try:
+                    geo = parse_coordinates(latitude, longitude)
+                except ValueError as e:
+                    st.warning(str(e))
+                    return
+                
                 temple_data = {
                     'name': name,
                     'location': location,
+                    'geo': geo,
                     'description': description,
+                    'featured': featured,
                     'timings': timings,
-                    'images': images
+                    'images': images,
+                    'image_meta': image_meta
                 }
                 
                 temple_id = create_temple(temple_data)
@@ -451,10 +721,9 @@ def show_add_temple():
                     st.success("🎉 Temple added successfully!")
                     st.balloons()  # Celebration animation
                     st.info("Redirecting to temple details...")
-                    st.session_state.selected_temple = temple_id
-                    st.session_state.page = "temple_detail"
+                    open_temple(temple_id)
                     st.session_state.show_success_message = f"Temple '{name}' has been added successfully!"
-                    st.rerun()
+                    rerun()
                 else:
                     st.error("❌ Failed to add temple. Please check your data and try again.")
                     st.error("If the problem persists, contact the administrator.")
@@ -479,11 +748,18 @@ def show_edit_temple(temple_id: str):
         st.markdown("### Basic Information")
         name = st.text_input("Temple Name *", value=temple.get('name', ''))
         location = st.text_input("Location *", value=temple.get('location', ''))
+        lon_value, lat_value = (temple.get('geo') or {}).get('coordinates', ["", ""])
+        col1, col2 = st.columns(2)
+        with col1:
+            latitude = st.text_input("Latitude", value=str(lat_value), help="Optional, used for nearby search")
+        with col2:
+            longitude = st.text_input("Longitude", value=str(lon_value), help="Optional, used for nearby search")
         description = st.text_area("Description *", value=temple.get('description', ''), height=150)
+        featured = st.checkbox("⭐ Feature on home page", value=temple.get('featured', False))
         
         # Timings
         st.markdown("### Timings")
-        existing_timings = temple.get('timings', [])
+        existing_timings = timing_schedules(temple.get('timings'))
         num_timings = st.number_input(
             "Number of timing schedules",
             min_value=1,
@@ -499,29 +775,15 @@ def show_edit_temple(temple_id: str):
             col1, col2 = st.columns(2)
             with col1:
                 # Parse existing time or use default
-                try:
-                    mo_time = datetime.strptime(existing.get('morningOpening', '06:00 AM'), "%I:%M %p").time()
-                except:
-                    mo_time = datetime.strptime('06:00 AM', "%I:%M %p").time()
-                
-                try:
-                    mc_time = datetime.strptime(existing.get('morningClosing', '12:00 PM'), "%I:%M %p").time()
-                except:
-                    mc_time = datetime.strptime('12:00 PM', "%I:%M %p").time()
+                mo_time = clock_time(existing.get('morningOpening'), '06:00 AM')
+                mc_time = clock_time(existing.get('morningClosing'), '12:00 PM')
                 
                 morning_open = st.time_input(f"Morning Opening", value=mo_time, key=f"mo_{i}")
                 morning_close = st.time_input(f"Morning Closing", value=mc_time, key=f"mc_{i}")
             
             with col2:
-                try:
-                    eo_time = datetime.strptime(existing.get('eveningOpening', '04:00 PM'), "%I:%M %p").time()
-                except:
-                    eo_time = datetime.strptime('04:00 PM', "%I:%M %p").time()
-                
-                try:
-                    ec_time = datetime.strptime(existing.get('eveningClosing', '08:00 PM'), "%I:%M %p").time()
-                except:
-                    ec_time = datetime.strptime('08:00 PM', "%I:%M %p").time()
+                eo_time = clock_time(existing.get('eveningOpening'), '04:00 PM')
+                ec_time = clock_time(existing.get('eveningClosing'), '08:00 PM')
                 
                 evening_open = st.time_input(f"Evening Opening", value=eo_time, key=f"eo_{i}")
                 evening_close = st.time_input(f"Evening Closing", value=ec_time, key=f"ec_{i}")
@@ -538,19 +800,23 @@ def show_edit_temple(temple_id: str):
         st.info("Current images will be kept. Upload new images to add more.")
         
         # Show existing images
+        existing_meta = temple.get('image_meta', [])
         if temple.get('images'):
             st.markdown("**Current Images:**")
             cols = st.columns(min(len(temple['images']), 3))
             for idx, img in enumerate(temple['images'][:3]):
                 with cols[idx]:
                     if img.startswith('data:image'):
-                        st.markdown(f"""
-                        <img src="{img}" style="width: 100%; height: 100px; object-fit: cover; border-radius: 5px;">
-                        """, unsafe_allow_html=True)
+                        meta = existing_meta[idx] if idx < len(existing_meta) else None
+                        st.markdown(lazy_image_html(
+                            image_src(img, "card"),
+                            meta,
+                            style="width: 100%; height: 100px; object-fit: cover; border-radius: 5px;"
+                        ), unsafe_allow_html=True)
                     else:
                         try:
                             st.image(img, width=150)
-                        except:
+                        except Exception:
                             st.text("Image preview unavailable")
         
         uploaded_files = st.file_uploader(
@@ -562,6 +828,7 @@ def show_edit_temple(temple_id: str):
         
         # Process uploaded images
         new_images = []
+        new_image_meta = []
         if uploaded_files:
             # Check total image limit
             current_image_count = len(temple.get('images', []))
@@ -604,6 +871,7 @@ def show_edit_temple(temple_id: str):
                         # Convert to base64
                         base64_image = base64.b64encode(img_buffer.getvalue()).decode()
                         new_images.append(f"data:image/jpeg;base64,{base64_image}")
+                        new_image_meta.append(image_placeholder(image))
                         
                         # Show compression info
                         original_size = len(uploaded_file.getvalue())
@@ -618,23 +886,38 @@ def show_edit_temple(temple_id: str):
         # Submit buttons
         col1, col2, col3 = st.columns([1, 1, 1])
         with col1:
-            if st.form_submit_button("Cancel", use_container_width=True):
-                st.session_state.page = "temple_detail"
-                st.rerun()
+            st.form_submit_button(
+                "Cancel",
+                use_container_width=True,
+                on_click=navigate,
+                args=("temple_detail",)
+            )
         with col2:
             submit_button = st.form_submit_button("Update Temple", use_container_width=True, type="primary")
         
         if submit_button:
             if name and location and description:
+                try:
+                    geo = parse_coordinates(latitude, longitude)
+                except ValueError as e:
+                    st.warning(str(e))
+                    return
+                
                 # Combine existing and new images
                 all_images = temple.get('images', []) + new_images
+                # Legacy temples may lack metadata; keep it aligned with images
+                padding = [None] * (len(temple.get('images', [])) - len(existing_meta))
+                all_image_meta = existing_meta + padding + new_image_meta
                 
                 update_data = {
                     'name': name,
                     'location': location,
+                    'geo': geo,
                     'description': description,
+                    'featured': featured,
                     'timings': timings,
-                    'images': all_images
+                    'images': all_images,
+                    'image_meta': all_image_meta
                 }
                 
                 if update_temple(temple_id, update_data):
@@ -643,7 +926,7 @@ def show_edit_temple(temple_id: str):
                     st.info("Redirecting to temple details...")
                     st.session_state.page = "temple_detail"
                     st.session_state.show_success_message = f"Temple '{name}' has been updated successfully!"
-                    st.rerun()
+                    rerun()
                 else:
                     st.error("❌ Failed to update temple. Please check your data and try again.")
                     st.error("If the problem persists, contact the administrator.")
@@ -669,7 +952,7 @@ def show_admin_dashboard():
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("Test Database Connection"):
-                    from models import get_db, get_all_temples
+                    from models import get_db
                     db = get_db()
                     if db is not None:
                         st.success("✅ Database connection successful")
@@ -685,12 +968,20 @@ def show_admin_dashboard():
                     from models import create_sample_temples
                     if create_sample_temples():
                         st.success("✅ Sample temples created successfully!")
-                        st.rerun()
+                        rerun()
                     else:
                         st.error("❌ Failed to create sample temples")
     
-    # Statistics
-    stats = get_temple_stats()
+    # Statistics and recent temples are fetched together up front
+    data = prefetch(
+        {
+            'stats': get_temple_stats,
+            'recent_temples': get_recent_temples,
+            'facets': get_temple_facets
+        },
+        defaults={'stats': EMPTY_STATS, 'recent_temples': [], 'facets': {"states": []}}
+    )
+    stats = data['stats']
     
     # Display stats in columns
     col1, col2, col3, col4 = st.columns(4)
@@ -710,28 +1001,47 @@ def show_admin_dashboard():
     st.markdown("---")
     
     # Temples by location chart
-    if stats['temples_by_location']:
-        st.markdown("### Temples by Location")
-        locations = [item['_id'] for item in stats['temples_by_location']]
-        counts = [item['count'] for item in stats['temples_by_location']]
+    if data['facets']['states']:
+        st.markdown("### Temples by State")
+        states = [item['label'] for item in data['facets']['states']]
+        counts = [item['count'] for item in data['facets']['states']]
         
         import plotly.express as px
-        fig = px.bar(x=locations, y=counts, labels={'x': 'Location', 'y': 'Number of Temples'})
+        fig = px.bar(x=states, y=counts, labels={'x': 'State', 'y': 'Number of Temples'})
         st.plotly_chart(fig)
     
+    show_admin_management()
+    
+    # Recent Temples
+    st.markdown("---")
+    st.markdown("### Recent Temples")
+    recent_temples = data['recent_temples']
+    
+    if recent_temples:
+        temple_grid(recent_temples, key="admin_recent_grid", on_select=open_temple, button_label="View")
+    else:
+        st.info("No temples added yet")
+
+@st.fragment
+@timed_render("admin management")
+def show_admin_management():
+    """Quick actions and the users/temples/export panels they toggle.
+    
+    Runs as a fragment, so opening a panel only reruns this section.
+    """
+    # A button in this fragment switched pages; redraw the whole app
+    if st.session_state.page != "admin":
+        rerun()
+    
     # Quick Actions
     st.markdown("### Quick Actions")
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        if st.button("➕ Add New Temple", use_container_width=True):
-            st.session_state.page = "add_temple"
-            st.rerun()
+        st.button("➕ Add New Temple", use_container_width=True, on_click=navigate, args=("add_temple",))
     
     with col2:
-        if st.button("🛕 View All Temples", use_container_width=True):
-            st.session_state.page = "temples"
-            st.rerun()
+        st.button("🛕 View All Temples", use_container_width=True, on_click=navigate, args=("temples",))
     
     with col3:
         if st.button("👥 Manage Users", use_container_width=True):
@@ -748,9 +1058,7 @@ def show_admin_dashboard():
         if st.button("📊 Export Data", use_container_width=True):
             st.session_state.show_export = True
     with col3:
-        if st.button("⚙️ Settings", use_container_width=True):
-            st.session_state.page = "settings"
-            st.rerun()
+        st.button("⚙️ Settings", use_container_width=True, on_click=navigate, args=("settings",))
     
     # User Management Section
     if st.session_state.get('show_users', False):
@@ -791,27 +1099,31 @@ def show_admin_dashboard():
                     
                     with col1:
                         st.write(f"**Description:** {temple.get('description', 'No description')[:100]}...")
-                        st.write(f"**Images:** {len(temple.get('images', []))} uploaded")
+                        st.write(f"**Images:** {temple.get('image_count', 0)} uploaded")
                         st.write(f"**Created:** {str(temple.get('created_at', 'Unknown'))[:10]}")
                     
                     with col2:
-                        if st.button("👁️ View", key=f"admin_view_{temple['_id']}"):
-                            st.session_state.selected_temple = str(temple['_id'])
-                            st.session_state.page = "temple_detail"
-                            st.rerun()
+                        st.button(
+                            "👁️ View",
+                            key=f"admin_view_{temple['_id']}",
+                            on_click=open_temple,
+                            args=(temple['_id'], temple.get('slug'))
+                        )
                     
                     with col3:
-                        if st.button("✏️ Edit", key=f"admin_edit_{temple['_id']}"):
-                            st.session_state.selected_temple = str(temple['_id'])
-                            st.session_state.page = "edit_temple"
-                            st.rerun()
+                        st.button(
+                            "✏️ Edit",
+                            key=f"admin_edit_{temple['_id']}",
+                            on_click=open_temple,
+                            args=(temple['_id'], temple.get('slug'), "edit_temple")
+                        )
                     
                     with col4:
                         if st.button("🗑️ Delete", key=f"admin_delete_{temple['_id']}"):
                             if st.session_state.get(f'confirm_admin_delete_{temple["_id"]}', False):
                                 if delete_temple(temple['_id']):
                                     st.success("Temple deleted successfully!")
-                                    st.rerun()
+                                    rerun()
                                 else:
                                     st.error("Failed to delete temple")
                             else:
@@ -833,12 +1145,8 @@ def show_admin_dashboard():
                 try:
                     import json
                     temples = get_all_temples()
-                    # Remove images for export to reduce size
-                    export_data = []
-                    for temple in temples:
-                        temple_copy = temple.copy()
-                        temple_copy.pop('images', None)  # Remove images
-                        export_data.append(temple_copy)
+                    # Temples come without their images, which keeps the export small
+                    export_data = [thaw(temple) for temple in temples]
                     
                     json_data = json.dumps(export_data, indent=2, default=str)
                     st.download_button(
@@ -878,24 +1186,3 @@ def show_admin_dashboard():
                     st.success(f"✅ Ready to export {len(users)} users")
                 except Exception as e:
                     st.error(f"Export failed: {str(e)}")
-    
-    # Recent Temples
-    st.markdown("---")
-    st.markdown("### Recent Temples")
-    temples = get_all_temples()
-    recent_temples = sorted(temples, key=lambda x: x.get('created_at', datetime.min), reverse=True)[:5]
-    
-    if recent_temples:
-        for temple in recent_temples:
-            col1, col2, col3 = st.columns([3, 2, 1])
-            with col1:
-                st.markdown(f"**{temple.get('name', 'Unknown')}**")
-            with col2:
-                st.markdown(f"📍 {temple.get('location', 'Unknown')}")
-            with col3:
-                if st.button("View", key=f"view_admin_{temple['_id']}"):
-                    st.session_state.selected_temple = str(temple['_id'])
-                    st.session_state.page = "temple_detail"
-                    st.rerun()
-    else:
-        st.info("No temples added yet")
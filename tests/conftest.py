@@ -0,0 +1,84 @@
+"""
+Shared fixtures: the app runs under Streamlit's AppTest against an in-memory
+mongomock database, with every on-disk cache in a temporary directory.
+"""
+
+import inspect
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Read by models at import time
+_scratch = tempfile.mkdtemp(prefix="alayatales-tests-")
+os.environ.setdefault("SNAPSHOT_PATH", os.path.join(_scratch, "snapshot.sqlite3"))
+os.environ.setdefault("SNAPSHOT_REFRESH_SECONDS", "0")
+os.environ.setdefault("IMAGE_CACHE_DIR", os.path.join(_scratch, "images"))
+os.environ.setdefault("CACHE_BACKEND", "memory")
+
+import mongomock
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1 import element_tree
+
+import models
+
+# AppTest 1.28 cannot map a selectbox value shown through format_func back to
+# its option; fall back to the default index instead of failing the whole run
+_selectbox_index = element_tree.Selectbox.index.fget
+
+def _index_or_default(self):
+    try:
+        return _selectbox_index(self)
+    except ValueError:
+        return self.proto.default
+
+element_tree.Selectbox.index = property(_index_or_default)
+
+# Newer pymongo releases than the pinned one pass ``sort`` to bulk updates,
+# which mongomock's bulk builder does not accept yet
+_add_update = mongomock.collection.BulkOperationBuilder.add_update
+if "sort" not in inspect.signature(_add_update).parameters:
+    def _add_update_without_sort(self, *args, sort=None, **kwargs):
+        return _add_update(self, *args, **kwargs)
+
+    mongomock.collection.BulkOperationBuilder.add_update = _add_update_without_sort
+
+APP_PATH = os.path.join(ROOT, "app.py")
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """The database every models function talks to, empty for each test"""
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(models, "MongoClient", lambda *args, **kwargs: client)
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    models.db_breaker.record_success()
+    for cached in (models._cached_featured_temples, models._cached_recent_temples, models._temples_page,
+                   models._count_temples, models._temple_stats, models._count_temple_images):
+        cached.clear()
+    yield client[models.get_config("DB_NAME", "alayatales")]
+    st.cache_resource.clear()
+
+@pytest.fixture
+def outage(mongo):
+    """Snapshot the seeded database, then open the circuit breaker as if
+    MongoDB had just gone down"""
+    from snapshot import export_snapshot
+
+    def start() -> None:
+        export_snapshot(mongo, models.SNAPSHOT_PATH)
+        models.db_breaker.trip()
+
+    yield start
+    models.db_breaker.record_success()
+
+@pytest.fixture
+def app(mongo, monkeypatch):
+    """Factory for a fresh AppTest of the whole app"""
+    # Use the plain button navigation the tests can click
+    monkeypatch.setitem(sys.modules, "streamlit_option_menu", None)
+    return lambda: AppTest.from_file(APP_PATH, default_timeout=30)
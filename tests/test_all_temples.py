@@ -0,0 +1,24 @@
+"""All temples are shared without their images, and still listed from the
+snapshot while the database is down"""
+
+import models
+
+IMAGE = "data:image/png;base64," + "A" * 4000
+
+def test_all_temples_leave_out_images(mongo):
+    models.create_sample_temples()
+    mongo.temples.update_one({"name": "Lotus Temple"}, {"$set": {"images": [IMAGE, IMAGE]}})
+    temples = {temple["name"]: temple for temple in models.get_all_temples()}
+    assert len(temples) == 3
+    assert not [temple for temple in temples.values() if "images" in temple]
+    assert temples["Lotus Temple"]["image_count"] == 2
+    assert temples["Golden Temple"]["image_count"] == 1
+
+def test_all_temples_come_from_the_snapshot_on_a_cold_process(mongo, outage):
+    models.create_sample_temples()
+    outage()
+    # Nothing cached yet, as after a restart during the outage
+    models._shared_all_temples.clear()
+    temples = models.get_all_temples()
+    assert sorted(temple["name"] for temple in temples) == ["Golden Temple", "Lotus Temple", "Meenakshi Temple"]
+    assert all(temple["image_count"] == 1 and "images" not in temple for temple in temples)
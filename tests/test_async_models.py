@@ -0,0 +1,70 @@
+"""Home page queries are gathered concurrently, and a failed or slow one falls
+back to its default instead of blanking the page"""
+
+import threading
+
+from streamlit.testing.v1 import AppTest
+
+import models
+
+def _gathered_page():
+    import time
+
+    import streamlit as st
+
+    from async_models import gather_queries, run_in_thread
+
+    def slow(value):
+        time.sleep(0.2)
+        return value
+
+    def broken():
+        raise RuntimeError("stats unavailable")
+
+    started = time.perf_counter()
+    st.session_state.results = gather_queries(
+        {
+            "first": run_in_thread(lambda: slow(1)),
+            "second": run_in_thread(lambda: slow(2)),
+            "broken": run_in_thread(broken),
+            "late": run_in_thread(lambda: slow(3)),
+        },
+        defaults={"broken": {}, "late": 0},
+        deadline=0.5 if st.session_state.get("patient") else 0.1,
+    )
+    st.session_state.elapsed = time.perf_counter() - started
+
+def test_queries_overlap_and_failures_use_defaults(mongo):
+    at = AppTest.from_function(_gathered_page, default_timeout=30)
+    at.session_state["patient"] = True
+    at.run()
+    assert not at.exception
+    assert at.session_state["results"] == {"first": 1, "second": 2, "broken": {}, "late": 3}
+    # Three 200 ms queries took about as long as one
+    assert at.session_state["elapsed"] < 0.5
+    assert [error.value for error in at.error] == ["Error loading broken: stats unavailable"]
+    assert set(at.session_state["query_timings"]) == {"first", "second", "broken", "late"}
+
+def test_slow_query_is_abandoned_at_the_deadline(mongo):
+    at = AppTest.from_function(_gathered_page, default_timeout=30)
+    at.run()
+    assert at.session_state["results"] == {"first": None, "second": None, "broken": {}, "late": 0}
+    assert at.session_state["elapsed"] < 0.2
+    assert "Error loading late: timed out after 0.1 s" in [error.value for error in at.error]
+
+def test_home_page_reads_run_in_worker_threads(app, mongo, monkeypatch):
+    models.create_sample_temples()
+    threads = []
+    count_temple_images = models.count_temple_images
+
+    def counted_images():
+        threads.append(threading.current_thread().name)
+        return count_temple_images()
+
+    monkeypatch.setattr(models, "count_temple_images", counted_images)
+    at = app()
+    at.run()
+    assert not at.exception
+    assert not at.error, [error.value for error in at.error]
+    assert threads and threads[0].startswith("alayatales-prefetch")
+    assert set(at.session_state["query_timings"]) >= {"stats", "featured_temples", "image_count", "facets"}
@@ -0,0 +1,227 @@
+"""Every cache backend keeps, expires, evicts and clears entries per namespace"""
+
+import os
+import time
+
+import fakeredis
+import pytest
+
+import revalidate
+from cache_backends import DiskBackend, MemoryBackend, RedisBackend, deserialize, serialize
+from revalidate import stale_while_revalidate
+
+class FakeRedis:
+    """The commands ``RedisBackend`` sends, kept in dicts; counts round trips"""
+
+    def __init__(self):
+        self.values = {}
+        self.sorted_sets = {}
+        self.round_trips = 0
+        self.down = False
+
+    def _check(self):
+        self.round_trips += 1
+        if self.down:
+            raise ConnectionError("server unreachable")
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def get(self, key):
+        self._check()
+        return self._get(key)
+
+    def incr(self, key):
+        self._check()
+        self.values[key] = str(int(self.values.get(key) or 0) + 1).encode()
+        return int(self.values[key])
+
+    def _get(self, key):
+        return self.values.get(key)
+
+    def _set(self, key, value, ex=None):
+        self.values[key] = bytes(value)
+
+    def _zadd(self, key, mapping, xx=False):
+        members = self.sorted_sets.setdefault(key, {})
+        for member, score in mapping.items():
+            if not xx or member in members:
+                members[member] = score
+
+    def _expire(self, key, seconds):
+        pass
+
+    def _zrange(self, key, start, stop):
+        members = sorted(self.sorted_sets.get(key, {}).items(), key=lambda item: item[1])
+        stop = len(members) + stop if stop < 0 else stop
+        return [member for member, _ in members[start:stop + 1]]
+
+    def _delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+    def _zrem(self, key, *members):
+        for member in members:
+            self.sorted_sets.get(key, {}).pop(member, None)
+
+class FakePipeline:
+    def __init__(self, server):
+        self.server = server
+        self.commands = []
+
+    def __getattr__(self, name):
+        method = getattr(self.server, f"_{name}")
+        return lambda *args, **kwargs: self.commands.append((method, args, kwargs))
+
+    def execute(self):
+        self.server._check()
+        return [method(*args, **kwargs) for method, args, kwargs in self.commands]
+
+@pytest.fixture
+def fake_redis():
+    return FakeRedis()
+
+def fakeredis_backends(server, count=2):
+    """Replicas sharing an in-process server that speaks the real protocol"""
+    return [RedisBackend("redis://fake", client=fakeredis.FakeRedis(server=server)) for _ in range(count)]
+
+@pytest.fixture(params=["memory", "disk", "redis", "fakeredis"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBackend()
+    if request.param == "disk":
+        return DiskBackend(str(tmp_path))
+    if request.param == "fakeredis":
+        return fakeredis_backends(fakeredis.FakeServer(), count=1)[0]
+    return RedisBackend("redis://fake", client=FakeRedis())
+
+def read(backend, namespace, key):
+    value = backend.get(namespace, key)
+    return bytes(value) if value is not None else None
+
+def test_backend_keeps_entries_per_namespace(backend):
+    backend.set("temples", "a", b"one", 60, 10)
+    backend.set("users", "a", b"two", 60, 10)
+    assert read(backend, "temples", "a") == b"one"
+    assert read(backend, "users", "a") == b"two"
+    assert read(backend, "temples", "b") is None
+
+    backend.clear("temples")
+    assert read(backend, "temples", "a") is None
+    assert read(backend, "users", "a") == b"two"
+
+def test_backend_evicts_least_recently_used(backend):
+    for key in "abc":
+        backend.set("temples", key, key.encode(), 60, 2)
+        # The disk backend orders entries by file time
+        time.sleep(0.01)
+    assert read(backend, "temples", "a") is None
+    assert read(backend, "temples", "b") == b"b"
+    assert read(backend, "temples", "c") == b"c"
+
+def test_memory_and_disk_entries_expire(tmp_path):
+    for backend in (MemoryBackend(), DiskBackend(str(tmp_path))):
+        backend.set("temples", "a", b"one", -1, 10)
+        assert backend.get("temples", "a") is None
+
+def test_disk_backend_is_shared_between_processes(tmp_path):
+    DiskBackend(str(tmp_path)).set("temples", "a", b"one", 60, 10)
+    assert DiskBackend(str(tmp_path)).get("temples", "a") == b"one"
+    assert not [name for _, _, names in os.walk(tmp_path) for name in names if name.endswith(".tmp")]
+
+def test_serialize_keeps_images_as_raw_bytes_for_binary_backends():
+    image = "data:image/png;base64," + "A" * 4000
+    value = [{"name": "Meenakshi Temple", "images": [image]}]
+    binary = serialize(value, binary=True)
+    assert len(binary) < len(serialize(value))
+    assert deserialize(binary) == value
+    assert deserialize(serialize(value)) == value
+
+def test_redis_read_is_one_round_trip(fake_redis):
+    backend = RedisBackend("redis://fake", client=fake_redis)
+    backend.set("temples", "a", b"one", 60, 10)
+    fake_redis.round_trips = 0
+    assert read(backend, "temples", "a") == b"one"
+    assert read(backend, "temples", "b") is None
+    assert fake_redis.round_trips == 2
+
+def test_redis_clear_reaches_other_replicas(fake_redis):
+    first = RedisBackend("redis://fake", client=fake_redis)
+    second = RedisBackend("redis://fake", client=fake_redis)
+    first.set("temples", "a", b"one", 60, 10)
+    assert read(second, "temples", "a") == b"one"
+    second.clear("temples")
+    assert read(first, "temples", "a") is None
+
+def test_unreachable_redis_falls_back_to_memory(fake_redis):
+    backend = RedisBackend("redis://fake", client=fake_redis)
+    backend.set("temples", "a", b"one", 60, 10)
+    fake_redis.down = True
+    fake_redis.round_trips = 0
+
+    # One failed command, then no more waits on the server
+    assert read(backend, "temples", "a") is None
+    backend.set("temples", "a", b"local", 60, 10)
+    assert read(backend, "temples", "a") == b"local"
+    backend.clear("temples")
+    assert fake_redis.round_trips == 1
+
+    # Back up: the clear made during the outage reaches the server too
+    fake_redis.down = False
+    backend.breaker.opened_at -= backend.breaker.reset_timeout
+    assert read(backend, "temples", "a") is None
+    assert backend.breaker.state == "closed"
+
+def test_decorator_shares_results_through_the_backend(tmp_path, monkeypatch):
+    calls = []
+
+    def make(replica):
+        @stale_while_revalidate(f"test-shared-{tmp_path.name}", soft_ttl=60, hard_ttl=120)
+        def temple_names():
+            calls.append(replica)
+            return ["Golden Temple"]
+        return temple_names
+
+    monkeypatch.setattr(revalidate, "_backend", DiskBackend(str(tmp_path)))
+    assert make("first")() == ["Golden Temple"]
+    assert make("second")() == ["Golden Temple"]
+    assert calls == ["first"]
+
+def check_shared_server(first, second):
+    """Entries, eviction and clears made by one replica are seen by the other"""
+    first.set("temples", "a", serialize(["Golden Temple"], binary=True), 60, 2)
+    assert deserialize(second.get("temples", "a")) == ["Golden Temple"]
+    for key in "bc":
+        first.set("temples", key, b"x", 60, 2)
+    assert second.get("temples", "a") is None
+    second.clear("temples")
+    assert first.get("temples", "c") is None
+    assert first.breaker.state == "closed"
+
+def test_fakeredis_server_is_shared_between_replicas():
+    check_shared_server(*fakeredis_backends(fakeredis.FakeServer()))
+
+def test_unreachable_fakeredis_server_falls_back_to_memory():
+    server = fakeredis.FakeServer()
+    first, second = fakeredis_backends(server)
+    first.set("temples", "a", b"one", 60, 10)
+    server.connected = False
+    assert first.get("temples", "a") is None
+    assert first.breaker.state == "open"
+    first.clear("temples")
+
+    server.connected = True
+    first.breaker.opened_at -= first.breaker.reset_timeout
+    assert read(first, "temples", "a") is None
+    # The clear made during the outage reached the other replica too
+    assert read(second, "temples", "a") is None
+
+@pytest.mark.skipif(not os.environ.get("TEST_REDIS_URL"), reason="set TEST_REDIS_URL to run against a local Redis server")
+def test_local_redis_server():
+    first = RedisBackend(os.environ["TEST_REDIS_URL"], prefix=f"alayatales:test:{os.getpid()}")
+    second = RedisBackend(os.environ["TEST_REDIS_URL"], prefix=f"alayatales:test:{os.getpid()}")
+    try:
+        check_shared_server(first, second)
+    finally:
+        for key in first.client.scan_iter(f"{first.prefix}:*"):
+            first.client.delete(key)
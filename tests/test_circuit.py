@@ -0,0 +1,78 @@
+"""The circuit breaker lets one trial through at a time, and an unreachable
+server leaves the app without a connection instead of a dead client"""
+
+import time
+
+from pymongo.errors import ServerSelectionTimeoutError
+
+import models
+from circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+def half_open(breaker):
+    breaker.trip()
+    breaker.opened_at = time.monotonic() - breaker.reset_timeout
+
+def test_half_open_hands_out_a_single_trial():
+    breaker = CircuitBreaker("test", reset_timeout=30.0)
+    half_open(breaker)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    half_open(breaker)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow() and breaker.allow()
+
+def test_unresolved_trial_is_given_up():
+    breaker = CircuitBreaker("test", reset_timeout=30.0)
+    half_open(breaker)
+    assert breaker.allow()
+    breaker.trial_at -= breaker.reset_timeout
+    assert breaker.allow()
+    assert not breaker.allow()
+
+class UnreachableClient:
+    created = 0
+
+    def __init__(self, *args, **kwargs):
+        UnreachableClient.created += 1
+        self.admin = self
+
+    def command(self, name):
+        raise ServerSelectionTimeoutError("no servers")
+
+    def close(self):
+        pass
+
+def test_failed_ping_returns_no_connection(mongo, monkeypatch):
+    monkeypatch.setattr(models, "MongoClient", UnreachableClient)
+    UnreachableClient.created = 0
+
+    assert models.get_database_connection() is None
+    assert models.db_breaker.state == OPEN
+    assert models.is_read_only()
+
+    # While open, callers get None without trying the server again
+    assert models.get_database_connection() is None
+    assert models.get_db() is None
+    assert UnreachableClient.created == 1
+
+    # The half-open trial tries again and fails; nobody else gets through
+    half_open(models.db_breaker)
+    assert models.get_database_connection() is None
+    assert UnreachableClient.created == 2
+    assert models.db_breaker.state == OPEN
+
+def test_successful_trial_closes_the_circuit(mongo):
+    assert models.get_database_connection() is not None
+    half_open(models.db_breaker)
+    assert models.get_db() is not None
+    assert models.db_breaker.state == CLOSED
+    assert not models.is_read_only()
@@ -0,0 +1,68 @@
+"""Widgets inside a fragment rerun only that fragment, not the whole page"""
+
+import pytest
+import streamlit.testing.v1.local_script_runner as local_script_runner
+from streamlit.runtime.fragment import MemoryFragmentStorage
+from streamlit.testing.v1 import AppTest
+
+import models
+
+class FragmentReruns:
+    """Makes AppTest rerun like the browser does after a widget change inside
+    a fragment: only the fragments, keeping the ones stored by earlier runs.
+
+    AppTest 1.37 starts every run from scratch, so the fragment storage is
+    shared between runs, and after ``scope_to_fragments`` runs are scoped
+    to the fragments stored so far.
+    """
+
+    def __init__(self, monkeypatch):
+        self.storage = MemoryFragmentStorage()
+        self.fragment_ids = []
+        rerun_data = local_script_runner.RerunData
+
+        def scoped_rerun_data(**kwargs):
+            if self.fragment_ids:
+                kwargs.update(fragment_id_queue=list(self.fragment_ids), is_fragment_scoped_rerun=True)
+            return rerun_data(**kwargs)
+
+        monkeypatch.setattr(local_script_runner, "MemoryFragmentStorage", lambda: self.storage)
+        monkeypatch.setattr(local_script_runner, "RerunData", scoped_rerun_data)
+
+    def scope_to_fragments(self) -> None:
+        self.fragment_ids = list(self.storage._fragments)
+
+@pytest.fixture
+def fragment_reruns(monkeypatch):
+    return FragmentReruns(monkeypatch)
+
+def _gallery_page():
+    from temple_pages import show_image_gallery
+    from utils import track_script_run
+    track_script_run()
+    show_image_gallery(["https://example.com/gopuram.jpg", "https://example.com/mandapam.jpg"])
+
+def test_gallery_slider_reruns_only_the_gallery(mongo, fragment_reruns):
+    at = AppTest.from_function(_gallery_page, default_timeout=30)
+    at.run()
+    assert at.session_state["total_script_runs"] == 1
+    fragment_reruns.scope_to_fragments()
+
+    at.select_slider[0].set_value(1).run()
+    assert not at.exception
+    assert at.select_slider[0].value == 1
+    # The script around the fragment did not run again
+    assert at.session_state["total_script_runs"] == 1
+
+def test_home_search_reruns_only_its_fragments(app, mongo, fragment_reruns):
+    models.create_sample_temples()
+    at = app()
+    at.run()
+    at.run()
+    assert at.session_state["total_script_runs"] == 2
+    fragment_reruns.scope_to_fragments()
+
+    at.text_input[0].input("Meenakshi").run()
+    assert not at.exception
+    assert any("Search Results for 'Meenakshi'" in markdown.value for markdown in at.markdown)
+    assert at.session_state["total_script_runs"] == 2
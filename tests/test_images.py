@@ -0,0 +1,101 @@
+"""Temple images are linked by URL from the static image cache, not inlined"""
+
+import base64
+import io
+import os
+from datetime import datetime
+
+import pytest
+from PIL import Image
+from streamlit.testing.v1 import AppTest
+
+import models
+
+def data_url(size=(1200, 900), fmt="PNG"):
+    output = io.BytesIO()
+    Image.effect_noise(size, 40).convert("RGB").save(output, fmt)
+    mime = "image/png" if fmt == "PNG" else "image/jpeg"
+    return f"data:{mime};base64,{base64.b64encode(output.getvalue()).decode()}"
+
+@pytest.fixture
+def served_cache(mongo, tmp_path, monkeypatch):
+    """Image cache inside a static folder, as in a deployment"""
+    static = tmp_path / "static"
+    monkeypatch.setattr(models, "STATIC_DIR", str(static))
+    monkeypatch.setattr(models, "IMAGE_CACHE_DIR", str(static / "images"))
+    models._card_files.clear()
+    models._card_digests.clear()
+    return static
+
+def test_data_images_are_served_from_static_files(served_cache):
+    image = data_url()
+    url = models.image_src(image)
+    assert url.startswith("/app/static/images/") and url.endswith(".original.png")
+    with open(served_cache / url[len("/app/static/"):], "rb") as file:
+        assert file.read() == base64.b64decode(image.split(",", 1)[1])
+
+    card = models.card_image(image)
+    assert card.endswith(".card.jpg")
+    with Image.open(served_cache / card[len("/app/static/"):]) as thumbnail:
+        assert thumbnail.size == (533, 400)
+
+def test_links_are_left_alone(served_cache):
+    assert models.image_src("https://example.com/temple.jpg") == "https://example.com/temple.jpg"
+
+def test_unserved_cache_falls_back_to_data_urls(mongo, tmp_path, monkeypatch):
+    monkeypatch.setattr(models, "IMAGE_CACHE_DIR", str(tmp_path / "elsewhere"))
+    image = data_url()
+    assert models.image_src(image) == image
+    assert models.image_src(image, "card").startswith("data:image/jpeg;base64,")
+
+def _gallery():
+    import streamlit as st
+    from temple_pages import show_image_gallery
+    show_image_gallery(st.session_state.images)
+
+def test_gallery_links_data_images_and_uses_st_image_for_links(served_cache):
+    at = AppTest.from_function(_gallery, default_timeout=30)
+    at.session_state["images"] = [data_url()]
+    at.run()
+    html = [markdown.value for markdown in at.markdown if "<img" in markdown.value]
+    assert len(html) == 1 and 'src="/app/static/images/' in html[0] and "base64" not in html[0]
+
+    at = AppTest.from_function(_gallery, default_timeout=30)
+    at.session_state["images"] = ["https://example.com/temple.jpg"]
+    at.run()
+    assert not at.exception
+    assert not [markdown for markdown in at.markdown if "<img" in markdown.value]
+    assert at.get("imgs")
+
+def test_card_files_are_remembered_by_content_hash(served_cache):
+    image = data_url()
+    card = models.card_image(image)
+    # Equal images share one entry, which holds the path and not the image
+    assert models.card_image(image[:-1] + image[-1]) == card
+    assert list(models._card_files.values()) == [card[len("/app/static/images/"):]]
+
+    # A card file evicted from the cache is written again
+    os.remove(served_cache / card[len("/app/static/"):])
+    assert models.card_image(image) == card
+    assert os.path.exists(served_cache / card[len("/app/static/"):])
+
+def test_unchanged_temples_skip_hashing_their_card_image(served_cache, monkeypatch):
+    image = data_url()
+    temple = {"_id": "t1", "updated_at": datetime(2026, 1, 1)}
+    card = models.card_image(image, temple)
+    hashed = []
+    content_hash = models.ImageCache.content_hash
+    monkeypatch.setattr(models.ImageCache, "content_hash", staticmethod(lambda data: hashed.append(1) or content_hash(data)))
+
+    assert models.card_image(image, temple) == card
+    assert hashed == []
+
+    # An edit bumps updated_at, and the new image is hashed
+    edited = data_url(fmt="JPEG")
+    assert models.card_image(edited, dict(temple, updated_at=datetime(2026, 1, 2))) != card
+    assert hashed
+
+def test_relative_cache_dir_is_taken_from_the_app_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert models.app_path("static/images") == os.path.join(models.STATIC_DIR, "images")
+    assert models.app_path(str(tmp_path / "images")) == str(tmp_path / "images")
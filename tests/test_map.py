@@ -0,0 +1,18 @@
+"""The map lists single temples, named or not, without errors"""
+
+import temple_pages
+
+def test_map_lists_temples_without_a_name(app, monkeypatch):
+    # mongomock has no $geoWithin, so hand the page its clusters directly
+    clusters = [
+        {"lat": 9.92, "lon": 78.12, "count": 1, "_id": "a", "name": "Meenakshi Temple", "slug": "meenakshi-temple"},
+        {"lat": 28.55, "lon": 77.26, "count": 1, "_id": "b", "name": None, "slug": None},
+        {"lat": 31.62, "lon": 74.88, "count": 3},
+    ]
+    monkeypatch.setattr(temple_pages, "get_map_clusters", lambda lat, lon, zoom: clusters)
+    at = app()
+    at.session_state["page"] = "map"
+    at.run()
+    assert not at.exception
+    options = [box for box in at.selectbox if box.label == "Temples in view"][0].options
+    assert options == ["Unnamed temple", "Meenakshi Temple"]
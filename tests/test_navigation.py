@@ -0,0 +1,24 @@
+"""Navigation must cost one script execution per click"""
+
+def test_nav_click_runs_script_once(app):
+    at = app()
+    at.run()
+    assert not at.exception
+    before = at.session_state.total_script_runs
+
+    at.button(key="nav_🛕 All Temples").click().run()
+
+    assert not at.exception
+    assert at.session_state.page == "temples"
+    assert at.session_state.total_script_runs == before + 1
+    assert at.session_state.runs_this_action == 1
+
+def test_each_nav_click_is_its_own_action(app):
+    at = app()
+    at.run()
+    for label, page in (("🗺️ Map", "map"), ("ℹ️ About", "about"), ("🏠 Home", "home")):
+        before = at.session_state.total_script_runs
+        at.button(key=f"nav_{label}").click().run()
+        assert at.session_state.page == page
+        assert at.session_state.total_script_runs == before + 1
+        assert at.session_state.runs_this_action == 1
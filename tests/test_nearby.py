@@ -0,0 +1,39 @@
+"""Nearby temples: the $geoNear query returns what a full Python scan would"""
+
+import os
+import random
+
+import mongomock
+import pytest
+
+from benchmarks.nearby import compare, naive_nearby, seed
+from locations import geo_point
+
+def test_naive_scan_reads_coordinates_only_and_sorts_by_distance():
+    db = mongomock.MongoClient().alayatales
+    db.temples.insert_many([
+        {"_id": "far", "geo": geo_point(28.61, 77.21), "images": ["data:image/jpeg;base64,AAAA"]},
+        {"_id": "near", "geo": geo_point(9.92, 78.12)},
+        {"_id": "nowhere"},
+    ])
+    assert naive_nearby(db, 9.9, 78.1, 5000, 5) == ["near", "far"]
+    assert naive_nearby(db, 9.9, 78.1, 100, 5) == ["near"]
+
+# $geoNear needs a real server, e.g. TEST_MONGODB_URI=mongodb://localhost:27017/
+TEST_MONGODB_URI = os.environ.get("TEST_MONGODB_URI")
+
+@pytest.mark.skipif(not TEST_MONGODB_URI, reason="set TEST_MONGODB_URI to run against a real MongoDB")
+def test_geo_near_matches_python_scan():
+    from pymongo import MongoClient
+    from schema import sync_indexes
+
+    client = MongoClient(TEST_MONGODB_URI)
+    name = f"alayatales_test_{os.getpid()}"
+    try:
+        db = client[name]
+        seed(db, 2000, random.Random(1))
+        sync_indexes(db)
+        for radius_km in (50, 500, 5000):
+            assert compare(db, 20.5937, 78.9629, radius_km, 6, repeats=1)["match"]
+    finally:
+        client.drop_database(name)
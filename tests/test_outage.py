@@ -0,0 +1,29 @@
+"""Public pages keep working from the snapshot while the database is down"""
+
+import models
+
+def search_temple_list(at, query):
+    at.session_state["page"] = "temples"
+    at.run()
+    at.text_input[0].input(query).run()
+
+def test_misspelt_search_during_outage_falls_back_instead_of_failing(app, mongo, outage):
+    models.create_sample_temples()
+    outage()
+    at = app()
+    search_temple_list(at, "Meenakshee")
+    assert not at.exception
+    assert not [error.value for error in at.error if "An error occurred" in error.value]
+
+def test_search_and_opening_hours_during_outage_are_answered_from_the_snapshot(app, mongo, outage):
+    models.create_sample_temples()
+    mongo.temples.update_one({"name": "Meenakshi Temple"}, {"$set": {"open_intervals": [{"open": 300, "close": 1260}]}})
+    outage()
+    at = app()
+    search_temple_list(at, "Meenakshi")
+    assert any("Found 1 temples" in markdown.value for markdown in at.markdown)
+
+    at.radio[0].set_value("Open at").run()
+    assert not at.exception
+    assert any("Found 1 temples" in markdown.value for markdown in at.markdown)
+    assert not [info.value for info in at.info if "No temples found" in info.value]
@@ -0,0 +1,60 @@
+"""Pages that prefetch their data render without errors"""
+
+import models
+from search import SearchCache
+
+def login_as_admin(at):
+    at.session_state["authenticated"] = True
+    at.session_state["user"] = {"_id": "admin", "name": "Admin", "email": "admin@example.com", "role": "admin"}
+
+def test_admin_dashboard_and_settings_show_cached_stats(app, mongo):
+    models.create_sample_temples()
+    for page in ("admin", "settings"):
+        at = app()
+        login_as_admin(at)
+        at.session_state["page"] = page
+        at.run()
+        assert not at.exception
+        assert not at.error, [error.value for error in at.error]
+        assert "3" in [metric.value for metric in at.metric]
+
+def test_home_prefetch_runs_with_the_session_context(app, mongo, caplog, monkeypatch):
+    models.create_sample_temples()
+
+    def broken_facets(epoch):
+        raise RuntimeError("facets unavailable")
+
+    monkeypatch.setattr(models, "_cached_temple_facets", broken_facets)
+    at = app()
+    at.run()
+    assert not at.exception
+    # The worker's st.error reaches the page instead of being dropped
+    assert any("facets unavailable" in error.value for error in at.error)
+    assert "missing ScriptRunContext" not in caplog.text
+
+def test_temple_list_search_shares_the_search_cache(app, mongo, monkeypatch):
+    models.create_sample_temples()
+    cache = SearchCache()
+    monkeypatch.setattr(models, "get_search_cache", lambda: cache)
+    models.search_temples("Meenakshi")
+    misses = cache.misses
+
+    at = app()
+    at.session_state["page"] = "temples"
+    at.run()
+    at.text_input[0].input("Meenakshi").run()
+    assert not at.exception
+    assert any("Found 1 temples" in markdown.value for markdown in at.markdown)
+    # Answered from the ids the home page search cached
+    assert cache.misses == misses
+    assert cache.hits
+
+def test_temple_list_search_uses_the_snapshot_in_an_outage(app, mongo, outage):
+    models.create_sample_temples()
+    outage()
+    at = app()
+    at.session_state["page"] = "temples"
+    at.run()
+    at.text_input[0].input("Meenakshi").run()
+    assert not at.exception
+    assert any("Found 1 temples" in markdown.value for markdown in at.markdown)
@@ -0,0 +1,100 @@
+"""Schema migrations: index steps, batched backfills and the migration lock"""
+
+import time
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+
+import models
+import schema
+from schema import INDEX_MANIFEST, MIGRATIONS, SCHEMA_VERSION, MigrationInProgress, migrate
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient().alayatales
+
+def index_keys(db, collection):
+    return {tuple(info["key"]) for info in db[collection].index_information().values()} - {(("_id", 1),)}
+
+def test_migrate_reaches_latest_version_with_every_index(db):
+    assert migrate(db) == SCHEMA_VERSION
+    for index in INDEX_MANIFEST:
+        assert tuple(index["keys"]) in index_keys(db, index["collection"])
+
+def test_index_steps_only_create_their_own_indexes(db):
+    versions = {number for number, _, _ in MIGRATIONS}
+    assert {index["since"] for index in INDEX_MANIFEST} <= versions
+    schema.index_step(4)(db)
+    expected = {tuple(index["keys"]) for index in INDEX_MANIFEST if index["since"] == 4}
+    assert index_keys(db, "temples") == expected
+
+def test_backfills_write_in_batches(db, monkeypatch):
+    monkeypatch.setattr(schema, "BATCH_SIZE", 2)
+    db.temples.insert_many([{"name": "Shiva Temple", "location": "Madurai, Tamil Nadu"} for _ in range(5)])
+    db.temples.insert_one({"name": "Shiva Temple", "slug": "shiva-temple"})
+    # Called directly: mongomock ignores the partial filter of the unique slug
+    # index, so building it would reject the legacy temples that have no slug
+    schema.backfill_slugs(db)
+    schema.backfill_search_keys(db)
+    schema.backfill_locations(db)
+    slugs = sorted(temple["slug"] for temple in db.temples.find())
+    assert slugs == ["shiva-temple"] + [f"shiva-temple-{n}" for n in range(2, 7)]
+    assert db.temples.count_documents({"search_keys": {"$exists": False}}) == 0
+    assert db.temples.count_documents({"city": "Madurai"}) == 5
+
+def test_waiting_on_another_migration_raises_instead_of_returning_old_version(db):
+    db[schema.SCHEMA_COLLECTION].insert_one({
+        "_id": schema.LOCK_DOC_ID, "owner": "elsewhere", "expires_at": datetime.utcnow() + timedelta(minutes=5)
+    })
+    with pytest.raises(MigrationInProgress):
+        migrate(db, wait_seconds=0)
+    assert schema.get_schema_version(db) == 0
+
+def hold_lock(db, owner="elsewhere"):
+    db[schema.SCHEMA_COLLECTION].replace_one(
+        {"_id": schema.LOCK_DOC_ID},
+        {"_id": schema.LOCK_DOC_ID, "owner": owner, "expires_at": datetime.utcnow() + timedelta(minutes=5)},
+        upsert=True
+    )
+
+def test_long_backfills_renew_the_lock_between_batches(db, monkeypatch):
+    monkeypatch.setattr(schema, "BATCH_SIZE", 2)
+    monkeypatch.setattr(schema, "LOCK_RENEW_SECONDS", 0)
+    renewals = []
+    renew_lock = schema._renew_lock
+    monkeypatch.setattr(schema, "_renew_lock", lambda *args: renewals.append(args) or renew_lock(*args))
+    db[schema.SCHEMA_COLLECTION].insert_one({"_id": schema.VERSION_DOC_ID, "version": 11})
+    db.temples.insert_many([{"name": "Shiva Temple", "location": "Madurai"} for _ in range(5)])
+    assert migrate(db) == SCHEMA_VERSION
+    # Once before each of the two steps, and after each full batch of five temples
+    assert len(renewals) == 4
+
+def test_backfill_stops_when_the_lock_is_lost(db, monkeypatch):
+    monkeypatch.setattr(schema, "BATCH_SIZE", 2)
+    monkeypatch.setattr(schema, "LOCK_RENEW_SECONDS", 0)
+    db[schema.SCHEMA_COLLECTION].insert_one({"_id": schema.VERSION_DOC_ID, "version": 11})
+    db.temples.insert_many([{"name": "Shiva Temple", "location": "Madurai"} for _ in range(5)])
+    search_keys = schema.backfill_search_keys
+
+    def taken_over(db):
+        # The lock expired and another process took it
+        hold_lock(db)
+        search_keys(db)
+
+    monkeypatch.setattr(schema, "MIGRATIONS", [(12, "Compute phonetic search keys", taken_over)])
+    with pytest.raises(MigrationInProgress):
+        migrate(db)
+    assert schema.get_schema_version(db) == 11
+
+def test_page_does_not_wait_for_another_process_migration(mongo, monkeypatch):
+    hold_lock(mongo)
+    calls = []
+    monkeypatch.setattr(schema, "migrate", lambda db, wait_seconds=30.0: calls.append(wait_seconds) or migrate(db, wait_seconds))
+    monkeypatch.setattr(models, "_schema_retry_at", [0.0])
+    started = time.monotonic()
+    assert models.init_database() is not None
+    assert models.init_database() is not None
+    assert time.monotonic() - started < 1
+    # Asked once without waiting, then left alone until the retry time
+    assert calls == [0]
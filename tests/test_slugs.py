@@ -0,0 +1,19 @@
+"""Slugs stay readable for names in Indic scripts"""
+
+import models
+from utils import generate_slug
+
+def test_latin_names_keep_their_slugs():
+    assert generate_slug("Test Temple Name!") == "test-temple-name"
+    assert generate_slug("  Golden   Temple - Amritsar ") == "golden-temple-amritsar"
+
+def test_indic_names_are_romanized():
+    assert generate_slug("శ్రీ వెంకటేశ్వర") == "shrii-venkateshvara"
+    assert generate_slug("மீனாட்சி அம்மன்") == "miinaatchi-amman"
+
+def test_indic_temples_get_distinct_slugs(mongo):
+    first = models.create_temple({"name": "శ్రీ వెంకటేశ్వర", "location": "Tirupati"})
+    second = models.create_temple({"name": "శ్రీ కాళహస్తి", "location": "Srikalahasti"})
+    slugs = sorted(temple["slug"] for temple in mongo.temples.find())
+    assert first and second
+    assert slugs == ["shrii-kaalahasti", "shrii-venkateshvara"]
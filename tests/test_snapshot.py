@@ -0,0 +1,63 @@
+"""The snapshot answers the temple list's filters like MongoDB does"""
+
+import pytest
+
+import models
+from locations import region_filter
+import schema
+from snapshot import SnapshotStore, export_snapshot, refresh_snapshot
+
+@pytest.fixture
+def store(mongo, tmp_path):
+    models.create_sample_temples()
+    # Golden Temple opens early, Lotus Temple only in the afternoon
+    mongo.temples.update_one({"name": "Golden Temple"}, {"$set": {"open_intervals": [{"open": 240, "close": 1320}]}})
+    mongo.temples.update_one({"name": "Lotus Temple"}, {"$set": {"open_intervals": [{"open": 840, "close": 1080}]}})
+    path = str(tmp_path / "snapshot.sqlite3")
+    export_snapshot(mongo, path)
+    return SnapshotStore(path)
+
+def names(temples):
+    return sorted(temple["name"] for temple in temples)
+
+@pytest.mark.parametrize("filters", [
+    models.search_filter("meenakshi"),
+    models.search_filter("Madurai"),
+    models.search_filter("Meenatchi"),
+    models.search_filter("lotus temple"),
+    models.search_filter("nowhere"),
+    models.open_at_filter(7 * 60),
+    models.open_at_filter(15 * 60),
+    {"$and": [models.search_filter("temple"), models.open_at_filter(15 * 60)]},
+    {"$and": [region_filter("india/punjab/"), models.open_at_filter(7 * 60)]},
+])
+def test_snapshot_matches_mongodb(mongo, store, filters):
+    expected = names(mongo.temples.find(filters))
+    assert names(store.temples_page(filters, "Name", 0, 50)) == expected
+    assert store.count_temples(filters) == len(expected)
+
+def test_fuzzy_filter_selects_ids(mongo, store):
+    temple = mongo.temples.find_one({"name": "Lotus Temple"})
+    filters = {"_id": {"$in": [temple["_id"]]}}
+    assert names(store.temples_page(filters, "Name", 0, 50)) == ["Lotus Temple"]
+
+def test_unknown_filter_finds_nothing(store):
+    assert store.count_temples({"featured": True}) == 0
+
+def test_snapshot_is_in_wal_mode(store):
+    assert store._query("PRAGMA journal_mode") == [("wal",)]
+
+def test_schema_migration_rewrites_the_snapshot(mongo, store):
+    # A backfill changes documents without touching updated_at
+    mongo.temples.update_many({}, {"$set": {"location": "Backfilled"}})
+    refresh_snapshot(mongo, store.path)
+    assert "Backfilled" not in [temple["location"] for temple in store.all_temples()]
+
+    version = schema.get_schema_version(mongo)
+    mongo[schema.SCHEMA_COLLECTION].update_one(
+        {"_id": schema.VERSION_DOC_ID}, {"$set": {"version": version + 1}}, upsert=True
+    )
+    assert refresh_snapshot(mongo, store.path) == 3
+    assert [temple["location"] for temple in store.all_temples()] == ["Backfilled"] * 3
+    # Only changed temples are copied again afterwards
+    assert refresh_snapshot(mongo, store.path) == 0
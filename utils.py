@@ -7,11 +7,14 @@ import re
 import json
 import base64
 import hashlib
+import time
+from functools import wraps
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 import streamlit as st
 from PIL import Image
 import io
+from search import transliterate
 
 def validate_email(email: str) -> bool:
     """Validate email format"""
@@ -109,6 +112,41 @@ def generate_thumbnail(image_data: bytes, size: tuple = (150, 150)) -> str:
     except Exception:
         return ""
 
+def image_placeholder(image: Image.Image, size: int = 16) -> Dict[str, Any]:
+    """Image dimensions plus a tiny blurred JPEG (LQIP) to show while the real image loads"""
+    tiny = image.copy()
+    tiny.thumbnail((size, size))
+    if tiny.mode != 'RGB':
+        tiny = tiny.convert('RGB')
+    
+    output = io.BytesIO()
+    tiny.save(output, format='JPEG', quality=40)
+    return {
+        'width': image.width,
+        'height': image.height,
+        'lqip': f"data:image/jpeg;base64,{base64.b64encode(output.getvalue()).decode()}"
+    }
+
+def image_placeholder_from_data_url(data_url: str) -> Optional[Dict[str, Any]]:
+    """Compute ``image_placeholder`` for a base64 ``data:image`` URL"""
+    try:
+        encoded = data_url.split(',', 1)[1]
+        return image_placeholder(Image.open(io.BytesIO(base64.b64decode(encoded))))
+    except Exception:
+        return None
+
+def lazy_image_html(src: str, meta: Optional[Dict] = None, style: str = "") -> str:
+    """``<img>`` tag that loads lazily, reserves its size and shows the LQIP meanwhile.
+    
+    ``src`` should be a URL (see ``models.image_src``): a data URL arrives with
+    the page, so there is nothing left to load lazily.
+    """
+    attributes = f'src="{src}" loading="lazy" decoding="async"'
+    if meta:
+        attributes += f' width="{meta["width"]}" height="{meta["height"]}"'
+        style += f" background-image: url('{meta['lqip']}'); background-size: cover;"
+    return f'<img {attributes} style="{style.strip()}">'
+
 def calculate_reading_time(text: str) -> int:
     """Calculate estimated reading time in minutes"""
     words = len(text.split())
@@ -154,11 +192,71 @@ def format_datetime(dt: datetime, format_type: str = "default") -> str:
 
 def generate_slug(text: str) -> str:
     """Generate URL-friendly slug from text"""
+    # Romanize Indic scripts first: stripping punctuation would also strip
+    # their vowel signs and viramas, leaving unreadable consonant runs
+    text = transliterate(text)
     # Convert to lowercase and replace spaces with hyphens
     slug = re.sub(r'[^\w\s-]', '', text.lower())
     slug = re.sub(r'[-\s]+', '-', slug)
     return slug.strip('-')
 
+def get_query_param(name: str) -> Optional[str]:
+    """Read a single URL query parameter across Streamlit versions"""
+    if hasattr(st, 'query_params'):
+        return st.query_params.get(name)
+    values = st.experimental_get_query_params().get(name)
+    return values[0] if values else None
+
+def set_query_params(**params: str) -> None:
+    """Replace the URL query parameters, dropping any that are None"""
+    params = {key: value for key, value in params.items() if value is not None}
+    if hasattr(st, 'query_params'):
+        st.query_params.clear()
+        st.query_params.update(params)
+    else:
+        st.experimental_set_query_params(**params)
+
+# Navigation helpers
+def navigate(page: str) -> None:
+    """Switch to another page.
+    
+    Use as a widget ``on_click`` callback: callbacks run before the script, so
+    the target page renders in the same run without an extra ``st.rerun()``.
+    """
+    st.session_state.page = page
+
+def rerun() -> None:
+    """Rerun the script, counting the extra run against the current action"""
+    st.session_state._rerun_requested = True
+    st.rerun()
+
+def track_script_run() -> int:
+    """Count script executions caused by the latest user action.
+    
+    A run requested through ``rerun()`` belongs to the action that triggered
+    it; any other run starts a new action. Returns the runs for this action.
+    """
+    if st.session_state.pop('_rerun_requested', False):
+        st.session_state.runs_this_action = st.session_state.get('runs_this_action', 0) + 1
+    else:
+        st.session_state.runs_this_action = 1
+    st.session_state.total_script_runs = st.session_state.get('total_script_runs', 0) + 1
+    return st.session_state.runs_this_action
+
+def timed_render(name: str):
+    """Record how long a page region takes to render, in milliseconds"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings = st.session_state.setdefault('render_timings', {})
+                timings[name] = (time.perf_counter() - start) * 1000
+        return wrapper
+    return decorator
+
 def validate_image_file(file) -> Dict[str, Any]:
     """Validate uploaded image file"""
     if not file: